@@ -0,0 +1,83 @@
+"""
+Move old consultations in terminal statuses out of the live table.
+
+Archived consultations keep their ids and column values in
+``ArchivedConsultation``, so the live table and its indexes only hold what
+scheduling still needs. Rows move in chunks, each in its own short
+transaction; on PostgreSQL a chunk locks only its own rows and skips rows
+locked by a concurrent write. The statistics table is left alone: it
+counts archived consultations too.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import ArchivedConsultation, Consultation, ConsultationTombstone
+from .signals import consultations_archived
+
+COLUMNS = [field.attname for field in Consultation._meta.concrete_fields]
+
+
+def archivable(before):
+    """Consultations in an archive status that started before ``before``."""
+    return Consultation.objects.filter(
+        status__in=Consultation.ARCHIVE_STATUSES, start_time__lt=before
+    )
+
+
+def cutoff(days):
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_chunk(before, chunk_size):
+    """Archive up to ``chunk_size`` consultations; return how many moved."""
+    with transaction.atomic():
+        rows = list(
+            archivable(before)
+            .select_for_update(skip_locked=True)
+            .order_by("start_time", "id")
+            .values(*COLUMNS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        ArchivedConsultation.objects.bulk_create(
+            [ArchivedConsultation(**row) for row in rows]
+        )
+        delete_rows([row["id"] for row in rows])
+        consultations_archived.send(sender=Consultation, rows=rows)
+    return len(rows)
+
+
+def delete_rows(ids):
+    """
+    Delete the consultations ``ids`` with a plain DELETE. ``QuerySet.delete()``
+    would send post_delete, which takes the rows out of the statistics and
+    records sync tombstones; archived rows are neither.
+    """
+    connection = connections[router.db_for_write(Consultation)]
+    table = connection.ops.quote_name(Consultation._meta.db_table)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def archive(before, chunk_size=1000, pause=0):
+    """Archive everything ``archivable(before)``, yielding each chunk's size."""
+    while True:
+        moved = archive_chunk(before, chunk_size)
+        if not moved:
+            return
+        yield moved
+        if pause:
+            time.sleep(pause)
+
+
+def prune_tombstones(days):
+    """Delete tombstones older than ``days``; return how many."""
+    deleted, _ = ConsultationTombstone.objects.filter(
+        deleted_at__lt=cutoff(days)
+    ).delete()
+    return deleted
@@ -0,0 +1,156 @@
+"""
+Async counterparts of the consultation list, retrieve and change_status
+endpoints, served under ``/api/async/`` for ASGI deployments.
+
+Requests are handled on the event loop and query through the async ORM, so
+an ASGI server does not hop to a worker thread for every request. Filtering,
+ordering and pagination use ``ConsultationViewSet``'s backends, so both
+paths accept the same query parameters. Consultations are always rendered
+by ``ConsultationValuesSerializer``; ``?fields=``/``?expand=`` apply as on
+the list endpoint.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.request import Request
+
+from mis.db import routers
+
+from .authentication import AsyncJWTAuthentication
+from .exceptions import Conflict
+from .models import Consultation
+from .pagination import ConsultationCursorPagination
+from .serializers import ConsultationValuesSerializer
+from .views import ConsultationViewSet
+
+
+class AsyncConsultationView(View):
+    authentication = AsyncJWTAuthentication()
+    # Read from a replica unless the user has just written something.
+    replica_reads = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Authentication is by bearer token only, as on the DRF views.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authentication.aauthenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+            self.request = Request(request, parsers=[JSONParser(), FormParser()])
+            self.request.user = result[0]
+            replica = self.replica_reads and not await routers.ais_pinned(
+                self.request.user.pk
+            )
+            with routers.replica_reads(replica):
+                return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.error_response(exc)
+
+    def get_queryset(self):
+        return Consultation.objects.for_user(self.request.user)
+
+    def get_viewset(self, action):
+        return ConsultationViewSet(
+            request=self.request, action=action, format_kwarg=None, kwargs={}
+        )
+
+    def get_values_serializer(self):
+        serializer = ConsultationValuesSerializer.from_query_params(
+            self.request.query_params
+        )
+        return serializer or ConsultationValuesSerializer()
+
+    def error_response(self, exc):
+        detail = exc.detail
+        if not isinstance(detail, (dict, list)):
+            detail = {"detail": detail}
+        response = JsonResponse(detail, status=exc.status_code, safe=False)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = self.authentication.authenticate_header(
+                request=None
+            )
+        return response
+
+
+class ConsultationListView(AsyncConsultationView):
+    replica_reads = True
+
+    async def get(self, request):
+        viewset = self.get_viewset("list")
+        serializer = self.get_values_serializer()
+        queryset = (
+            viewset.filter_queryset(viewset.get_queryset())
+            .prefetch_related(None)
+            .values(*serializer.get_columns())
+        )
+        paginator = ConsultationCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, self.request, viewset)
+        return JsonResponse(
+            paginator.get_paginated_data(
+                [serializer.to_representation(row) for row in page]
+            )
+        )
+
+
+class ConsultationDetailView(AsyncConsultationView):
+    replica_reads = True
+
+    async def get(self, request, pk):
+        serializer = self.get_values_serializer()
+        row = (
+            await self.get_queryset()
+            .filter(pk=pk)
+            .values(*serializer.get_columns(), "version")
+            .afirst()
+        )
+        if row is None:
+            raise NotFound()
+        response = JsonResponse(serializer.to_representation(row))
+        response["ETag"] = Consultation.make_etag(row["id"], row["version"])
+        return response
+
+
+class ConsultationChangeStatusView(AsyncConsultationView):
+    async def post(self, request, pk):
+        new_status = self.request.data.get("status")
+        if not new_status:
+            return JsonResponse(
+                {"detail": "Status is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if new_status not in dict(Consultation.STATUS_CHOICES):
+            return JsonResponse(
+                {"detail": "Invalid status value"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        consultation = await self.get_queryset().filter(pk=pk).afirst()
+        if consultation is None:
+            raise NotFound()
+
+        viewset = self.get_viewset("change_status")
+        expected_version = viewset.check_if_match(consultation)
+        if new_status != consultation.status:
+            if not Consultation.can_transition(consultation.status, new_status):
+                raise Conflict(
+                    f"Cannot change status from {consultation.status} to {new_status}"
+                )
+            # Statistics receivers are synchronous, so the write itself runs
+            # in a worker thread.
+            changed = await sync_to_async(consultation.transition)(
+                new_status, expected_version
+            )
+            if not changed:
+                raise Conflict()
+
+        serializer = ConsultationValuesSerializer()
+        response = JsonResponse(serializer.to_representation(vars(consultation)))
+        response["ETag"] = consultation.etag
+        return response
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    What authentication and permissions read from authenticated users
+    (``FIELDS``), by user id and auth version (``User.get_auth_version``), in
+    process memory and, if ``CACHE_SHARED``, in the shared cache.
+
+    Tokens carry the auth version they were issued for, so a token issued
+    after a change of role, ``is_active`` or password never reads what was
+    cached before it, even if the change skipped signals. Entries are dropped
+    by ``receivers.invalidate_cached_user`` whenever a user is saved or
+    deleted. Other processes only lose their in-process copy after
+    ``AUTH_USER_CACHE_LOCAL_TTL`` seconds, which bounds how long they may act
+    on a stale role or ``is_active`` flag. The in-process copy keeps the
+    ``AUTH_USER_CACHE_LOCAL_SIZE`` most recently used users.
+    """
+
+    # Other fields are deferred on the users built from the cache.
+    FIELDS = ("id", "username", "is_superuser", "is_staff", "is_active", "role")
+
+    def __init__(self):
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(user_id, version):
+        return f"auth:user:{user_id}:{version}"
+
+    @classmethod
+    def field_names(cls):
+        # In model order, as Model.from_db() expects.
+        return [
+            f.attname
+            for f in get_user_model()._meta.concrete_fields
+            if f.attname in cls.FIELDS
+        ]
+
+    @classmethod
+    def values(cls, user):
+        return tuple(getattr(user, name) for name in cls.field_names())
+
+    @classmethod
+    def build(cls, values):
+        """A new user from cached ``values``: requests never share one."""
+        return get_user_model().from_db(DEFAULT_DB_ALIAS, cls.field_names(), values)
+
+    def get_local(self, user_id, version):
+        with self.lock:
+            entry = self.local.get((user_id, version))
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.local[user_id, version]
+                return None
+            self.local.move_to_end((user_id, version))
+            return entry[1]
+
+    def set_local(self, user_id, version, values):
+        expires = time.monotonic() + settings.AUTH_USER_CACHE_LOCAL_TTL
+        with self.lock:
+            self.local[user_id, version] = (expires, values)
+            self.local.move_to_end((user_id, version))
+            while len(self.local) > settings.AUTH_USER_CACHE_LOCAL_SIZE:
+                self.local.popitem(last=False)
+
+    def get(self, user_id, version):
+        values = self.get_local(user_id, version)
+        if values is None and settings.CACHE_SHARED:
+            values = cache.get(self.key(user_id, version))
+            if values is not None:
+                self.set_local(user_id, version, values)
+        return None if values is None else self.build(values)
+
+    async def aget(self, user_id, version):
+        values = self.get_local(user_id, version)
+        if values is None and settings.CACHE_SHARED:
+            values = await cache.aget(self.key(user_id, version))
+            if values is not None:
+                self.set_local(user_id, version, values)
+        return None if values is None else self.build(values)
+
+    def set(self, user):
+        version, values = user.get_auth_version(), self.values(user)
+        if settings.CACHE_SHARED:
+            cache.set(self.key(user.pk, version), values, settings.AUTH_USER_CACHE_TTL)
+        self.set_local(user.pk, version, values)
+
+    async def aset(self, user):
+        version, values = user.get_auth_version(), self.values(user)
+        if settings.CACHE_SHARED:
+            await cache.aset(
+                self.key(user.pk, version), values, settings.AUTH_USER_CACHE_TTL
+            )
+        self.set_local(user.pk, version, values)
+
+    def invalidate(self, user_id, versions):
+        if settings.CACHE_SHARED:
+            cache.delete_many([self.key(user_id, version) for version in versions])
+        with self.lock:
+            for version in versions:
+                self.local.pop((user_id, version), None)
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that reads the user from ``user_cache``, so a warm
+    request does not query the users table.
+
+    The profile id claims of the token are set on the returned user as
+    ``doctor_id``/``patient_id``. A token issued before the last change of
+    the user's auth version is served from the database until it expires.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, validated_token = result
+        return self.with_claims(user, validated_token), validated_token
+
+    @staticmethod
+    def with_claims(user, validated_token):
+        user.doctor_id = validated_token.get("doctor_id")
+        user.patient_id = validated_token.get("patient_id")
+        return user
+
+    @staticmethod
+    def get_auth_version(validated_token):
+        return validated_token.get("auth_version", "")
+
+    def get_user(self, validated_token):
+        version = self.get_auth_version(validated_token)
+        user = user_cache.get(self.get_user_id(validated_token), version)
+        if user is None:
+            user = super().get_user(validated_token)
+            if user.get_auth_version() == version:
+                user_cache.set(user)
+        else:
+            self.check_user(user, validated_token)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            # The claim is a string; cache keys use the primary key's type.
+            return self.user_model._meta.pk.to_python(
+                validated_token[api_settings.USER_ID_CLAIM]
+            )
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    def check_user(self, user, validated_token):
+        """The checks ``JWTAuthentication.get_user`` runs after the lookup."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    ``CachedJWTAuthentication`` for async views.
+
+    Token parsing and validation never touch the database; only the user
+    lookup does on a cache miss, and it goes through the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = await self.aget_user(validated_token)
+        return self.with_claims(user, validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = self.get_auth_version(validated_token)
+        user = await user_cache.aget(user_id, version)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                ) from e
+            if user.get_auth_version() == version:
+                await user_cache.aset(user)
+        self.check_user(user, validated_token)
+        return user
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .exceptions import DoubleBooking, is_double_booking
+from .models import Clinic, Consultation, Doctor, Patient
+from .serializers import ConsultationBulkItemSerializer
+from .signals import consultations_bulk_created, consultations_status_changed
+
+RELATIONS = (
+    ("doctor_id", Doctor, "Doctor does not exist."),
+    ("patient_id", Patient, "Patient does not exist."),
+    ("clinic", Clinic, "Clinic does not exist."),
+)
+
+
+def create_consultations(items):
+    """
+    Validate ``items`` one by one and insert the valid ones in one transaction.
+
+    Referenced doctors, patients and clinics are checked with one query per
+    model for the whole batch. If the batch trips the double-booking guard,
+    items are retried one by one so that only the overlapping ones fail.
+
+    Returns ``(created, errors)``: lists of ``{"index", "id"}`` and
+    ``{"index", "errors"}`` dicts keyed by the position of the item in
+    ``items``.
+    """
+    errors = {}
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = ConsultationBulkItemSerializer(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+
+    for field, model, message in RELATIONS:
+        ids = {data[field] for data in valid.values() if data[field] is not None}
+        existing = set(model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        for index, data in list(valid.items()):
+            if data[field] is not None and data[field] not in existing:
+                errors[index] = {field: [message]}
+                del valid[index]
+
+    consultations = [
+        Consultation(
+            doctor_id=data["doctor_id"],
+            patient_id=data["patient_id"],
+            clinic_id=data["clinic"],
+            start_time=data["start_time"],
+            end_time=data["end_time"],
+            status=data["status"],
+            notes=data["notes"],
+        )
+        for data in valid.values()
+    ]
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Consultation.objects.bulk_create(consultations, batch_size=500)
+        except IntegrityError:
+            # Some items are double bookings: insert one by one so only they fail.
+            for index, consultation in zip(list(valid), consultations):
+                consultation.pk = None
+                try:
+                    with transaction.atomic():
+                        Consultation.objects.bulk_create([consultation])
+                except IntegrityError as e:
+                    if not is_double_booking(e):
+                        raise
+                    errors[index] = {"non_field_errors": [DoubleBooking.default_detail]}
+                    del valid[index]
+            consultations = [c for c in consultations if c.pk is not None]
+        if consultations:
+            consultations_bulk_created.send(
+                sender=Consultation, instances=consultations
+            )
+
+    created = [
+        {"index": index, "id": consultation.pk}
+        for index, consultation in zip(valid, consultations)
+    ]
+    errors = [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+    return created, errors
+
+
+def change_status(queryset, new_status, ids=None):
+    """
+    Move the consultations of ``queryset`` (optionally narrowed to ``ids``)
+    to ``new_status`` with one conditional UPDATE.
+
+    ``queryset`` must already be scoped to what the caller may modify: ids
+    outside of it are reported as forbidden, rows whose status may not move
+    to ``new_status`` (see ``Consultation.TRANSITIONS``) as skipped.
+    """
+    queryset = queryset.order_by()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+
+    max_size = settings.CONSULTATION_BULK_MAX_SIZE
+    fields = ("id", "doctor_id", "patient_id", "clinic_id", "start_time", "status")
+    with transaction.atomic():
+        # Locked until the UPDATE, so it changes exactly the rows allowed here
+        # and the signal gets the statuses replaced.
+        rows = queryset.select_for_update(of=("self",)).values(*fields)
+        current = {row["id"]: row for row in rows[: max_size + 1]}
+        if len(current) > max_size:
+            raise ValidationError(
+                {"filter": f"Filter matches more than {max_size} consultations"}
+            )
+
+        updated = sorted(
+            pk
+            for pk, row in current.items()
+            if Consultation.can_transition(row["status"], new_status)
+        )
+        if updated:
+            Consultation.objects.filter(
+                pk__in=updated, status__in=Consultation.sources_for(new_status)
+            ).update(
+                status=new_status,
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+            consultations_status_changed.send(
+                sender=Consultation,
+                rows=[current[pk] for pk in updated],
+                status=new_status,
+            )
+    return {
+        "updated": updated,
+        "skipped": sorted(current.keys() - set(updated)),
+        "forbidden": sorted(set(ids or ()) - current.keys()),
+    }
@@ -0,0 +1,181 @@
+"""
+Per-scope response cache and conditional GET for consultation reads.
+
+Every scope of consultations a user can see (all of them for admins, one
+doctor's or one patient's otherwise) has a version in the cache, and so
+does the "directory" of doctors, patients and clinics nested in the
+responses. Writes bump the versions they affect (see ``receivers``); a
+cached response is stored under the versions it was built with, so it is
+never served after a relevant change. Versions are microsecond timestamps,
+which also gives ``Last-Modified``.
+
+Versions only invalidate what every process sees, so the cache is off
+unless ``CACHE_SHARED`` (Redis): with a per-process cache, other workers
+would keep serving and answering 304 for responses a write made stale.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from mis.db import routers
+
+from .models import Doctor, Patient
+
+PREFIX = "consult-cache"
+ALL = ("all",)
+DIRECTORY = ("directory",)
+
+
+def version_key(scope):
+    return ":".join([PREFIX, "version", *map(str, scope)])
+
+
+def profile_key(user_id):
+    return f"{PREFIX}:profile:{user_id}"
+
+
+def enabled():
+    return bool(settings.CONSULTATION_CACHE_TTL and settings.CACHE_SHARED)
+
+
+def bump(*scopes):
+    """
+    Move ``scopes`` to a new version now and again once the transaction
+    commits, so a response built from not yet committed data in between is
+    not served either.
+    """
+    if not enabled():
+        return
+    keys = [version_key(scope) for scope in scopes]
+
+    def set_versions():
+        now = time.time_ns() // 1000
+        cache.set_many({key: now for key in keys}, timeout=None)
+
+    set_versions()
+    transaction.on_commit(set_versions)
+
+
+def bump_consultations(rows):
+    """Bump the scopes of consultations given as ``doctor_id``/``patient_id``."""
+    scopes = {ALL}
+    for row in rows:
+        if "doctor_id" in row:
+            scopes.add(("doctor", row["doctor_id"]))
+        if "patient_id" in row:
+            scopes.add(("patient", row["patient_id"]))
+    bump(*scopes)
+
+
+def bump_directory():
+    bump(DIRECTORY)
+
+
+def forget_profile(user_id):
+    cache.delete(profile_key(user_id))
+
+
+def get_scope(user):
+    """The scope ``Consultation.objects.for_user(user)`` returns, or ``None``."""
+    if user.is_admin():
+        return ALL
+    profile_id = getattr(user, f"{user.role}_id", None)
+    if profile_id is not None:
+        return (user.role, profile_id)
+    key = profile_key(user.pk)
+    scope = cache.get(key)
+    if scope is None:
+        model = {"doctor": Doctor, "patient": Patient}.get(user.role)
+        if model is None:
+            return None
+        pk = model.objects.filter(user=user).values_list("pk", flat=True).first()
+        if pk is None:
+            return None
+        scope = (user.role, pk)
+        cache.set(key, scope, settings.CONSULTATION_CACHE_TTL)
+    return tuple(scope)
+
+
+def get_versions(scope):
+    keys = [version_key(scope), version_key(DIRECTORY)]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() // 1000 for key in keys if key not in versions}
+    if missing:
+        # Unknown (or evicted) versions start now, which invalidates anything
+        # cached under earlier versions.
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return tuple(versions[key] for key in keys)
+
+
+def key_etag(key):
+    return '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+def cached_read(request, build, get_etag):
+    """
+    Serve a GET through the cache, answering 304 when the client is current.
+
+    ``build()`` returns the uncached DRF response. ``get_etag(key, versions,
+    data)`` returns the ETag of the response, ``data`` being ``None`` when
+    it is asked before the response is built; it may then return ``None``.
+    """
+    if not enabled():
+        return build()
+    scope = get_scope(request.user)
+    if scope is None:
+        return build()
+    versions = get_versions(scope)
+    uri = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = ":".join([PREFIX, "response", *map(str, scope + versions), uri])
+    last_modified = max(versions) // 10**6
+
+    entry = cache.get(key)
+    etag = entry["etag"] if entry else get_etag(key, versions, None)
+    if etag is not None:
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            # 304, or 412 for a failed If-Match/If-Unmodified-Since.
+            response = Response(status=not_modified.status_code)
+            return add_headers(response, etag, last_modified)
+
+    if entry:
+        response = Response(entry["data"])
+    else:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        if (
+            routers.reading_from_replica()
+            and time.time() - max(versions) / 10**6 < settings.REPLICA_PIN_SECONDS
+        ):
+            # The replica may not have caught up with the latest change yet:
+            # neither cached nor tagged with the current versions.
+            return response
+        etag = get_etag(key, versions, response.data)
+        cache.set(
+            key,
+            {"etag": etag, "data": response.data},
+            settings.CONSULTATION_CACHE_TTL,
+        )
+    return add_headers(response, etag, last_modified)
+
+
+def add_headers(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # Clients may keep the response but must revalidate it; it depends on
+    # the bearer token.
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
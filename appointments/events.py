@@ -0,0 +1,327 @@
+"""
+Publish/subscribe of consultation changes for the event stream.
+
+``publish()`` is called by ``receivers`` and hands the events to the broker
+once the transaction commits. A broker assigns event ids, keeps the last
+``EVENT_HISTORY_SIZE`` events for clients resuming with ``Last-Event-ID``
+and fans events out to the subscriptions of this process whose scope (see
+``caching.get_scope``) they touch.
+
+``InProcessBroker`` only reaches subscribers of the process that wrote the
+change; with several processes, ``RedisBroker`` shares events through a
+Redis stream read by one task per process.
+"""
+
+import abc
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .caching import ALL
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("id", "doctor_id", "patient_id", "clinic_id", "status", "start_time")
+
+
+class Event:
+    __slots__ = ("id", "type", "data", "scopes")
+
+    def __init__(self, type, data, scopes, id=None):
+        self.id = id
+        self.type = type
+        # JSON, encoded once however many subscribers get the event.
+        self.data = data
+        self.scopes = scopes
+
+    @classmethod
+    def for_consultation(cls, type, row, old=None, **extra):
+        """
+        A ``type`` event about the consultation with the column values
+        ``row``; ``old`` are its values before the change, if any.
+        """
+        data = {field: row.get(field) for field in FIELDS}
+        data.update(extra)
+        scopes = {ALL}
+        for values in (row, old or {}):
+            if values.get("doctor_id") is not None:
+                scopes.add(("doctor", values["doctor_id"]))
+            if values.get("patient_id") is not None:
+                scopes.add(("patient", values["patient_id"]))
+        return cls(type, json.dumps(data, cls=DjangoJSONEncoder), sorted(scopes))
+
+    @classmethod
+    def reset(cls, id=None):
+        """Tells the client it missed events and has to reload."""
+        return cls("reset", "{}", [], id=id)
+
+    def encode(self):
+        """The event in ``text/event-stream`` format."""
+        message = f"event: {self.type}\ndata: {self.data}\n\n"
+        if self.id is not None:
+            message = f"id: {self.id}\n{message}"
+        return message.encode()
+
+
+def publish(events):
+    """Publish ``events`` once the current transaction commits."""
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(events))
+
+
+@functools.cache
+def get_broker():
+    return import_string(settings.EVENT_BROKER)()
+
+
+def deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.put(event)
+
+
+class Subscription:
+    """Events of ``scope`` for one client, in a queue of the client's loop."""
+
+    def __init__(self, broker, scope):
+        self.broker = broker
+        self.scope = tuple(scope)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.EVENT_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client does not keep up: drop what it has not read yet and
+            # tell it to reload instead.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event.reset(event.id))
+
+    async def get(self, timeout):
+        """The next event, ``None`` after ``timeout`` seconds without one."""
+        try:
+            async with asyncio.timeout(timeout):
+                return await self.queue.get()
+        except TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(abc.ABC):
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, scope):
+        subscription = Subscription(self, scope)
+        with self.lock:
+            self.subscriptions.setdefault(subscription.scope, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.scope, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.scope, None)
+
+    def dispatch(self, events, loop=None):
+        """
+        Deliver ``events`` to the subscriptions of this process (only to
+        those on ``loop`` if given), from any thread.
+        """
+        for event in events:
+            with self.lock:
+                targets = [
+                    subscription
+                    for scope in event.scopes
+                    for subscription in self.subscriptions.get(tuple(scope), ())
+                    if loop is None or subscription.loop is loop
+                ]
+            by_loop = {}
+            for subscription in targets:
+                by_loop.setdefault(subscription.loop, []).append(subscription)
+            # One wakeup per loop rather than per subscriber.
+            for target_loop, subscriptions in by_loop.items():
+                try:
+                    target_loop.call_soon_threadsafe(deliver, subscriptions, event)
+                except RuntimeError:
+                    # The loop is closed; its clients are gone.
+                    for subscription in subscriptions:
+                        self.unsubscribe(subscription)
+
+    @abc.abstractmethod
+    def publish(self, events):
+        """Give ``events`` ids, keep them and dispatch them to subscribers."""
+
+    @abc.abstractmethod
+    def sort_key(self, event_id):
+        """Order of event ids; raises ``ValueError`` for a malformed one."""
+
+    @abc.abstractmethod
+    async def history(self, last_event_id):
+        """
+        Events after ``last_event_id``, or just a reset event if some of them
+        are no longer kept (or the id is unknown).
+        """
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        super().__init__()
+        self.events = deque(maxlen=settings.EVENT_HISTORY_SIZE)
+        # Ids continue from the clock, so ids of a previous run of the
+        # process are older than any of this one.
+        self.ids = itertools.count(time.time_ns() // 1000)
+
+    def publish(self, events):
+        with self.lock:
+            for event in events:
+                event.id = next(self.ids)
+                self.events.append(event)
+        self.dispatch(events)
+
+    def sort_key(self, event_id):
+        return int(event_id)
+
+    async def history(self, last_event_id):
+        with self.lock:
+            events = list(self.events)
+        latest = events[-1].id if events else None
+        try:
+            last = self.sort_key(last_event_id)
+        except ValueError:
+            return [Event.reset(latest)]
+        if last == latest:
+            return []
+        if not events or not events[0].id - 1 <= last < latest:
+            return [Event.reset(latest)]
+        return [event for event in events if event.id > last]
+
+
+class RedisBroker(Broker):
+    """
+    Events are appended to the ``EVENT_BROKER_STREAM`` Redis stream, capped
+    at about ``EVENT_HISTORY_SIZE`` entries; stream entry ids are event ids.
+    """
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the redis package")
+        if not settings.EVENT_BROKER_URL:
+            raise ImproperlyConfigured("RedisBroker requires EVENT_BROKER_URL")
+        self.stream = settings.EVENT_BROKER_STREAM
+        self.client = redis.Redis.from_url(settings.EVENT_BROKER_URL)
+        self.async_clients = {}
+        self.listeners = {}
+
+    def publish(self, events):
+        pipeline = self.client.pipeline(transaction=False)
+        for event in events:
+            pipeline.xadd(
+                self.stream,
+                {
+                    "type": event.type,
+                    "data": event.data,
+                    "scopes": json.dumps(event.scopes),
+                },
+                maxlen=settings.EVENT_HISTORY_SIZE,
+                approximate=True,
+            )
+        # Delivered by the listeners, this process's included.
+        pipeline.execute()
+
+    def subscribe(self, scope):
+        subscription = super().subscribe(scope)
+        loop = subscription.loop
+        listener = self.listeners.get(loop)
+        if listener is None or listener.done():
+            self.listeners[loop] = loop.create_task(self.listen())
+        return subscription
+
+    def get_async_client(self):
+        # Async connections belong to the loop they were opened on.
+        loop = asyncio.get_running_loop()
+        if loop not in self.async_clients:
+            import redis.asyncio
+
+            self.async_clients[loop] = redis.asyncio.Redis.from_url(
+                settings.EVENT_BROKER_URL
+            )
+        return self.async_clients[loop]
+
+    def sort_key(self, event_id):
+        millis, _, sequence = str(event_id).partition("-")
+        return int(millis), int(sequence or 0)
+
+    @staticmethod
+    def to_event(entry_id, fields):
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
+        return Event(
+            fields["type"],
+            fields["data"],
+            [tuple(scope) for scope in json.loads(fields["scopes"])],
+            id=entry_id.decode(),
+        )
+
+    async def listen(self):
+        loop = asyncio.get_running_loop()
+        client = self.get_async_client()
+        last_id = None
+        while True:
+            try:
+                if last_id is None:
+                    latest = await client.xrevrange(self.stream, count=1)
+                    last_id = latest[0][0].decode() if latest else "0-0"
+                response = await client.xread(
+                    {self.stream: last_id},
+                    count=settings.EVENT_QUEUE_SIZE,
+                    block=int(settings.EVENT_HEARTBEAT_SECONDS * 1000),
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reading %s failed, retrying", self.stream)
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response:
+                events = [self.to_event(*entry) for entry in entries]
+                if events:
+                    last_id = events[-1].id
+                    self.dispatch(events, loop)
+
+    async def history(self, last_event_id):
+        client = self.get_async_client()
+        first = await client.xrange(self.stream, count=1)
+        latest = await client.xrevrange(self.stream, count=1)
+        reset = Event.reset(latest[0][0].decode() if latest else None)
+        try:
+            last = self.sort_key(last_event_id)
+        except ValueError:
+            return [reset]
+        if not first or self.sort_key(first[0][0].decode()) > last:
+            return [reset]
+        entries = await client.xrange(
+            self.stream,
+            min=f"({last[0]}-{last[1]}",
+            count=settings.EVENT_HISTORY_SIZE,
+        )
+        return [self.to_event(*entry) for entry in entries]
@@ -0,0 +1,34 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The consultation was modified by another request."
+    default_code = "conflict"
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The consultation does not match If-Match."
+    default_code = "precondition_failed"
+
+
+class DoubleBooking(Conflict):
+    default_detail = "The doctor already has a consultation at this time."
+    default_code = "double_booking"
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "The sync token has expired, download the list again."
+    default_code = "sync_token_expired"
+
+
+# Exclusion constraint in Consultation.Meta (PostgreSQL) / triggers of
+# migration 0005 (SQLite).
+OVERLAP_CONSTRAINT = "consult_doctor_no_overlap"
+
+
+def is_double_booking(error):
+    return OVERLAP_CONSTRAINT in str(error)
@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedConsultation, Consultation
+
+COLUMNS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "start_time",
+    "end_time",
+    "status",
+    "doctor_id",
+    "patient_id",
+    "clinic_id",
+    "notes",
+    "version",
+)
+
+
+def export_queryset(date_from=None, date_to=None, clinic_id=None, since=None):
+    """
+    Consultations to export, archived ones included, in ``(updated_at, id)``
+    order.
+
+    ``date_from``/``date_to`` bound ``start_time`` (inclusive days) and
+    ``since`` is an ``(updated_at, id)`` watermark: only rows created or
+    changed after it are returned.
+    """
+    querysets = []
+    for model in (Consultation, ArchivedConsultation):
+        queryset = model.objects.order_by()
+        if date_from is not None:
+            queryset = queryset.filter(start_time__gte=_day_start(date_from))
+        if date_to is not None:
+            queryset = queryset.filter(
+                start_time__lt=_day_start(date_to, next_day=True)
+            )
+        if clinic_id is not None:
+            queryset = queryset.filter(clinic_id=clinic_id)
+        if since is not None:
+            updated_at, pk = since
+            queryset = queryset.filter(
+                Q(updated_at__gte=updated_at),
+                Q(updated_at__gt=updated_at) | Q(id__gt=pk),
+            )
+        querysets.append(queryset.values_list(*COLUMNS))
+    live, archived = querysets
+    return live.union(archived, all=True).order_by("updated_at", "id")
+
+
+def iter_chunks(queryset, chunk_size):
+    """Rows of ``queryset`` in lists of at most ``chunk_size``."""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CSVWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes every chunk as its own row group, so memory stays bounded."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("created_at", pa.timestamp("us", tz="UTC")),
+                ("updated_at", pa.timestamp("us", tz="UTC")),
+                ("start_time", pa.timestamp("us", tz="UTC")),
+                ("end_time", pa.timestamp("us", tz="UTC")),
+                ("status", pa.string()),
+                ("doctor_id", pa.int64()),
+                ("patient_id", pa.int64()),
+                ("clinic_id", pa.int64()),
+                ("notes", pa.string()),
+                ("version", pa.int64()),
+            ]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = [list(column) for column in zip(*rows)]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CSVWriter, "parquet": ParquetWriter}
+
+
+def export(path, fmt, queryset, chunk_size=2000):
+    """
+    Stream ``queryset`` into ``path`` and return ``(rows, last)`` where
+    ``last`` is the ``(updated_at, id)`` of the last exported row or ``None``.
+
+    The file is written next to ``path`` and renamed into place only once
+    complete, so an interrupted export never leaves a truncated file behind.
+    """
+    updated_at, pk = COLUMNS.index("updated_at"), COLUMNS.index("id")
+    tmp_path = f"{path}.part"
+    writer = WRITERS[fmt](tmp_path)
+    rows, last = 0, None
+    try:
+        for chunk in iter_chunks(queryset, chunk_size):
+            writer.write(chunk)
+            rows += len(chunk)
+            last = (chunk[-1][updated_at], chunk[-1][pk])
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, path)
+    return rows, last
+
+
+def next_watermark(since, last):
+    """
+    The watermark after exporting from ``since`` up to ``last``.
+
+    A transaction may commit after a later one, so the watermark never moves
+    past ``CONSULTATION_SYNC_LAG_SECONDS`` ago: rows of the last seconds are
+    exported again by the next run and consumers keep the latest by id.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.CONSULTATION_SYNC_LAG_SECONDS)
+    watermark = last or since
+    if watermark is not None and watermark[0] > horizon:
+        watermark = (horizon, 0)
+    return watermark
+
+
+def read_watermark(path):
+    """The ``(updated_at, id)`` stored by ``write_watermark``, or ``None``."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    # Files of earlier versions hold created_at: every row was updated after
+    # it (updated_at was added later), so nothing is skipped.
+    updated_at = parse_datetime(data.get("updated_at") or data["created_at"])
+    if updated_at is None:
+        raise ValueError(f"Invalid watermark in {path}")
+    return updated_at, int(data["id"])
+
+
+def write_watermark(path, watermark):
+    updated_at, pk = watermark
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": updated_at.isoformat(), "id": pk}, f)
+    os.replace(tmp_path, path)
+
+
+def _day_start(day, next_day=False):
+    if next_day:
+        day += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
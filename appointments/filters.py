@@ -0,0 +1,34 @@
+from django.db.models import Q
+from rest_framework import filters
+
+from .models import normalize_search_text
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    Search over normalized name columns of related rows.
+
+    Every entry of ``search_fields`` has the form ``<relation>__<column>``.
+    Each search term becomes ``<relation>_id IN (SELECT id ... WHERE <column>
+    LIKE '%term%')`` so the lookup runs against the related table's trigram
+    index instead of joining and upper-casing name columns row by row.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = [normalize_search_text(term) for term in self.get_search_terms(request)]
+        terms = [term for term in terms if term]
+        if not search_fields or not terms:
+            return queryset
+
+        for term in terms:
+            condition = Q()
+            for search_field in search_fields:
+                relation, column = search_field.split("__", 1)
+                related = queryset.model._meta.get_field(relation).related_model
+                matches = related._default_manager.filter(
+                    **{f"{column}__contains": term}
+                ).values("pk")
+                condition |= Q(**{f"{relation}__in": matches})
+            queryset = queryset.filter(condition)
+        return queryset
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import archive
+
+
+class Command(BaseCommand):
+    help = "Move old completed and paid consultations to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.CONSULTATION_ARCHIVE_AFTER_DAYS,
+            help="Archive consultations that started more than this many days ago",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between chunks, e.g. to let replicas catch up",
+        )
+
+    def handle(self, *args, **options):
+        if options["older_than_days"] < 0:
+            raise CommandError("--older-than-days must not be negative")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        before = archive.cutoff(options["older_than_days"])
+        total = 0
+        for moved in archive.archive(before, options["chunk_size"], options["pause"]):
+            total += moved
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Archived {total} consultations so far")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} consultations"))
+
+        pruned = archive.prune_tombstones(settings.CONSULTATION_TOMBSTONE_DAYS)
+        self.stdout.write(f"Deleted {pruned} expired sync tombstones")
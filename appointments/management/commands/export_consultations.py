@@ -0,0 +1,75 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from appointments import export
+
+
+def date_arg(value):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+class Command(BaseCommand):
+    help = "Export consultations to CSV or Parquet in bounded memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write")
+        parser.add_argument(
+            "--format",
+            choices=sorted(export.WRITERS),
+            help="Output format (default: from the output file extension)",
+        )
+        parser.add_argument("--date-from", type=date_arg, help="YYYY-MM-DD")
+        parser.add_argument("--date-to", type=date_arg, help="YYYY-MM-DD")
+        parser.add_argument("--clinic", type=int, help="Clinic id")
+        parser.add_argument(
+            "--watermark",
+            help=(
+                "JSON file with the last exported (updated_at, id). Only "
+                "consultations created or changed since are exported and the "
+                "file is advanced afterwards."
+            ),
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        fmt = options["format"] or os.path.splitext(output)[1].lstrip(".").lower()
+        if fmt not in export.WRITERS:
+            raise CommandError(
+                f"Unknown format {fmt!r}, use --format {'/'.join(export.WRITERS)}"
+            )
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError(
+                    "Parquet export requires pyarrow, install the parquet extra: "
+                    "poetry install -E parquet"
+                )
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        since = None
+        if options["watermark"]:
+            try:
+                since = export.read_watermark(options["watermark"])
+            except (ValueError, KeyError) as e:
+                raise CommandError(f"Invalid watermark: {e}")
+
+        queryset = export.export_queryset(
+            date_from=options["date_from"],
+            date_to=options["date_to"],
+            clinic_id=options["clinic"],
+            since=since,
+        )
+        rows, last = export.export(output, fmt, queryset, options["chunk_size"])
+        watermark = export.next_watermark(since, last)
+        if options["watermark"] and watermark is not None:
+            export.write_watermark(options["watermark"], watermark)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {rows} consultations"))
@@ -0,0 +1,281 @@
+import random
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+
+from appointments import stats
+from appointments.models import Clinic, Consultation, Doctor, Patient, User
+
+FIRST_NAMES = (
+    ("Александр", "Алексей", "Дмитрий", "Иван", "Максим", "Михаил", "Сергей"),
+    ("Анна", "Елена", "Мария", "Наталья", "Ольга", "Светлана", "Татьяна"),
+)
+MIDDLE_NAMES = (
+    ("Александрович", "Андреевич", "Викторович", "Игоревич", "Петрович"),
+    ("Александровна", "Андреевна", "Викторовна", "Игоревна", "Петровна"),
+)
+LAST_NAMES = (
+    ("Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов", "Фёдоров"),
+    ("Иванова", "Смирнова", "Кузнецова", "Попова", "Васильева", "Соколова"),
+)
+SPECIALIZATIONS = (
+    "Терапевт",
+    "Хирург",
+    "Кардиолог",
+    "Невролог",
+    "Педиатр",
+    "Офтальмолог",
+    "Дерматолог",
+)
+# Consultations start on a 30-minute grid within working hours.
+SLOT = timedelta(minutes=30)
+DURATIONS = (15, 20, 30)
+PAST_STATUSES = (("paid", 60), ("completed", 35), ("confirmed", 5))
+FUTURE_STATUSES = (("pending", 40), ("confirmed", 60))
+
+
+class Command(BaseCommand):
+    help = "Generate a large synthetic dataset for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clinics", type=int, default=20)
+        parser.add_argument("--doctors", type=int, default=500)
+        parser.add_argument("--patients", type=int, default=50000)
+        parser.add_argument("--consultations", type=int, default=100000)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Calendar days the consultations are spread over",
+        )
+        parser.add_argument(
+            "--future-days",
+            type=int,
+            default=30,
+            help="How many of --days lie after today",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prefix", default="load", help="Username prefix of generated users"
+        )
+        parser.add_argument(
+            "--password", default="loadtest", help="Password of every generated user"
+        )
+
+    def handle(self, *args, **options):
+        for name in ("clinics", "doctors", "patients"):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be positive")
+        if options["consultations"] < 0:
+            raise CommandError("--consultations must not be negative")
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(
+                f"Users prefixed {options['prefix']!r} exist, pass another --prefix"
+            )
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.password = make_password(options["password"])
+        self.prefix = options["prefix"]
+
+        days = self.working_days(options["days"], options["future_days"])
+        working_hours = datetime.combine(
+            date.min, settings.WORKING_DAY_END
+        ) - datetime.combine(date.min, settings.WORKING_DAY_START)
+        slots_per_day = working_hours // SLOT
+        capacity = len(days) * options["doctors"] * slots_per_day
+        if options["consultations"] > capacity:
+            raise CommandError(
+                f"{options['doctors']} doctors have only {capacity} free slots "
+                f"in {options['days']} days, raise --doctors or --days"
+            )
+
+        clinics = Clinic.objects.bulk_create(
+            [
+                Clinic(
+                    name=f"Клиника {i + 1}",
+                    legal_address=f"ул. Ленина, {i + 1}",
+                    physical_address=f"ул. Ленина, {i + 1}",
+                )
+                for i in range(options["clinics"])
+            ]
+        )
+        doctors = self.create_doctors(options["doctors"], clinics)
+        patients = self.create_patients(options["patients"])
+        self.stdout.write(
+            f"Created {len(clinics)} clinics, {len(doctors)} doctors, "
+            f"{len(patients)} patients"
+        )
+
+        created = self.create_consultations(
+            options["consultations"], days, slots_per_day, doctors, patients
+        )
+        stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} consultations"))
+
+    def working_days(self, days, future_days):
+        today = timezone.localdate()
+        first = today - timedelta(days=days - future_days - 1)
+        return [
+            first + timedelta(days=i)
+            for i in range(days)
+            if (first + timedelta(days=i)).weekday() < 5
+        ]
+
+    def make_users(self, role, count):
+        users = []
+        for i in range(count):
+            gender = self.rng.randrange(2)
+            users.append(
+                User(
+                    username=f"{self.prefix}_{role}_{i}",
+                    password=self.password,
+                    role=role,
+                    first_name=self.rng.choice(FIRST_NAMES[gender]),
+                    middle_name=self.rng.choice(MIDDLE_NAMES[gender]),
+                    last_name=self.rng.choice(LAST_NAMES[gender]),
+                )
+            )
+        return User.objects.bulk_create(users, batch_size=self.batch_size)
+
+    def create_doctors(self, count, clinics):
+        # bulk_create() bypasses Doctor/Patient.save(), so search_name is set here.
+        doctors = Doctor.objects.bulk_create(
+            [
+                Doctor(
+                    user=user,
+                    specialization=self.rng.choice(SPECIALIZATIONS),
+                    search_name=user.get_search_name(),
+                )
+                for user in self.make_users("doctor", count)
+            ],
+            batch_size=self.batch_size,
+        )
+        links, self.doctor_clinics = [], {}
+        for doctor in doctors:
+            chosen = self.rng.sample(clinics, min(len(clinics), self.rng.randint(1, 3)))
+            self.doctor_clinics[doctor.pk] = [clinic.pk for clinic in chosen]
+            links.extend(
+                Doctor.clinics.through(doctor_id=doctor.pk, clinic_id=clinic.pk)
+                for clinic in chosen
+            )
+        Doctor.clinics.through.objects.bulk_create(links, batch_size=self.batch_size)
+        return doctors
+
+    def create_patients(self, count):
+        return Patient.objects.bulk_create(
+            [
+                Patient(
+                    user=user,
+                    phone=f"+7900{self.rng.randrange(10**7):07d}",
+                    email=f"{user.username}@example.com",
+                    search_name=user.get_search_name(),
+                )
+                for user in self.make_users("patient", count)
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def create_consultations(self, count, days, slots_per_day, doctors, patients):
+        """
+        Insert ``count`` consultations on distinct (doctor, day, slot) cells,
+        so no doctor is double booked, in start time order.
+        """
+        now = timezone.now()
+        tz = timezone.get_current_timezone()
+        doctor_ids = [doctor.pk for doctor in doctors]
+        patient_ids = [patient.pk for patient in patients]
+        cells_per_day = len(doctor_ids) * slots_per_day
+        cells = sorted(self.rng.sample(range(len(days) * cells_per_day), count))
+
+        batch, created = [], 0
+        for cell in cells:
+            day, rest = divmod(cell, cells_per_day)
+            doctor, slot = divmod(rest, slots_per_day)
+            start = (
+                timezone.make_aware(
+                    datetime.combine(days[day], settings.WORKING_DAY_START), tz
+                )
+                + slot * SLOT
+            )
+            end = start + timedelta(minutes=self.rng.choice(DURATIONS))
+            booked_ahead = timedelta(hours=self.rng.expovariate(1 / 72))
+            doctor_id = doctor_ids[doctor]
+            status = self.pick_status(start, end, now)
+            created_at = min(start - booked_ahead, now)
+            batch.append(
+                Consultation(
+                    doctor_id=doctor_id,
+                    patient_id=self.rng.choice(patient_ids),
+                    clinic_id=self.rng.choice(self.doctor_clinics[doctor_id]),
+                    start_time=start,
+                    end_time=end,
+                    status=status,
+                    created_at=created_at,
+                    updated_at=self.last_change(status, created_at, start, end, now),
+                )
+            )
+            if len(batch) == self.batch_size:
+                created += self.insert(batch)
+                batch = []
+        if batch:
+            created += self.insert(batch)
+        return created
+
+    def pick_status(self, start, end, now):
+        if start <= now < end:
+            return Consultation.STATUS_STARTED
+        statuses = PAST_STATUSES if end <= now else FUTURE_STATUSES
+        names, weights = zip(*statuses)
+        return self.rng.choices(names, weights)[0]
+
+    @staticmethod
+    def last_change(status, created_at, start, end, now):
+        if end <= now:
+            return end
+        if status == Consultation.STATUS_STARTED:
+            return start
+        return created_at
+
+    def insert(self, consultations):
+        dates = [(c.created_at, c.updated_at) for c in consultations]
+        Consultation.objects.bulk_create(consultations)
+        self.backdate([consultation.pk for consultation in consultations], dates)
+        return len(consultations)
+
+    @staticmethod
+    def backdate(ids, values):
+        """
+        Set ``created_at`` and ``updated_at``, which ``bulk_create()`` sets
+        to now (they are ``auto_now_add``/``auto_now``), with one UPDATE
+        joined to a VALUES list per chunk; ``bulk_update()`` builds a CASE
+        per row and is several times slower.
+        """
+        connection = connections[router.db_for_write(Consultation)]
+        quote = connection.ops.quote_name
+        table = quote(Consultation._meta.db_table)
+        field = Consultation._meta.get_field("created_at")
+        rows = [
+            (
+                pk,
+                field.get_db_prep_value(created_at, connection),
+                field.get_db_prep_value(updated_at, connection),
+            )
+            for pk, (created_at, updated_at) in zip(ids, values)
+        ]
+        size = connection.ops.bulk_batch_size(["id", "created_at", "updated_at"], rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), size):
+                chunk = rows[start : start + size]
+                cursor.execute(
+                    f"UPDATE {table} SET {quote('created_at')} = v.column2, "
+                    f"{quote('updated_at')} = v.column3 "
+                    f"FROM (VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))}) AS v "
+                    f"WHERE {table}.{quote('id')} = v.column1",
+                    [param for row in chunk for param in row],
+                )
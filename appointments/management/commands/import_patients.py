@@ -0,0 +1,65 @@
+import codecs
+import csv
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments import roster
+
+
+class Command(BaseCommand):
+    help = "Import patients from a CSV or NDJSON roster"
+
+    def add_arguments(self, parser):
+        parser.add_argument("roster", help="File to read, - for standard input")
+        parser.add_argument(
+            "--format",
+            choices=roster.FORMATS,
+            help="Roster format (default: from the file extension)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Processes hashing roster passwords, 0 to hash in this one",
+        )
+        parser.add_argument(
+            "--invites",
+            help="CSV file to write the invite tokens of patients without a password",
+        )
+
+    def handle(self, *args, **options):
+        path = options["roster"]
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in roster.FORMATS:
+            raise CommandError(
+                f"Unknown format {fmt!r}, use --format {'/'.join(roster.FORMATS)}"
+            )
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options["workers"] < 0:
+            raise CommandError("--workers must not be negative")
+
+        importer = roster.RosterImport(options["batch_size"], options["workers"])
+        if path == "-":
+            lines = codecs.iterdecode(sys.stdin.buffer, "utf-8-sig")
+            importer.run(roster.read_roster(lines, fmt))
+        else:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                importer.run(roster.read_roster(f, fmt))
+
+        if options["invites"]:
+            with open(options["invites"], "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, ["line", "username", "uid", "token"])
+                writer.writeheader()
+                writer.writerows(importer.invites)
+        for error in importer.errors:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {importer.created} patients, "
+                f"{len(importer.invites)} invites, {len(importer.errors)} errors"
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from appointments import stats
+from appointments.models import ConsultationStat
+
+
+class Command(BaseCommand):
+    help = "Recompute the consultation statistics table from scratch"
+
+    def handle(self, *args, **options):
+        stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {ConsultationStat.objects.count()} statistics rows"
+            )
+        )
@@ -0,0 +1,79 @@
+# Generated by Django 4.2 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="consult_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(fields=["start_time", "id"], name="consult_start_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["doctor", "-created_at", "-id"],
+                name="consult_doctor_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["doctor", "start_time", "id"], name="consult_doctor_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["patient", "-created_at", "-id"],
+                name="consult_patient_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["patient", "start_time", "id"], name="consult_patient_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["clinic", "-created_at", "-id"],
+                name="consult_clinic_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="consult_status_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "confirmed", "started"])),
+                fields=["doctor", "start_time", "end_time"],
+                name="consult_doctor_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "confirmed", "started"])),
+                fields=["patient", "start_time", "end_time"],
+                name="consult_patient_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-18 03:34
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = (
+    ("appointments_doctor", "doctor_search_name_trgm"),
+    ("appointments_patient", "patient_search_name_trgm"),
+)
+
+
+def backfill_search_name(apps, schema_editor):
+    for model_name in ("Doctor", "Patient"):
+        model = apps.get_model("appointments", model_name)
+        profiles = list(model.objects.select_related("user"))
+        for profile in profiles:
+            user = profile.user
+            full_name = " ".join([user.last_name, user.first_name, user.middle_name])
+            profile.search_name = " ".join(
+                full_name.casefold().replace("ё", "е").split()
+            )
+        model.objects.bulk_update(profiles, ["search_name"], batch_size=1000)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, name in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+            "USING gin (search_name gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for _, name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0002_consultation_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="doctor",
+            name="search_name",
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name="patient",
+            name="search_name",
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_search_name, migrations.RunPython.noop),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
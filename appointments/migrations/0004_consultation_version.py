@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0003_search_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="consultation",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
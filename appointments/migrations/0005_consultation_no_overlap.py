@@ -0,0 +1,114 @@
+import appointments.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import IntegrityError, migrations, models
+from django.db.models import Exists, OuterRef
+
+ACTIVE_STATUSES = ["pending", "confirmed", "started"]
+ACTIVE = "('pending', 'confirmed', 'started')"
+
+# SQLite has no exclusion constraints, so the model's constraint is left out of
+# its schema; triggers give the same guarantee and raise an IntegrityError that
+# names the constraint like PostgreSQL does.
+SQLITE_TRIGGER = f"""
+CREATE TRIGGER consult_doctor_no_overlap_{{event}}
+BEFORE {{operation}} ON appointments_consultation
+WHEN NEW.status IN {ACTIVE}
+BEGIN
+    SELECT RAISE(ABORT, 'consult_doctor_no_overlap')
+    WHERE EXISTS (
+        SELECT 1 FROM appointments_consultation
+        WHERE doctor_id = NEW.doctor_id
+          AND status IN {ACTIVE}
+          AND start_time < NEW.end_time
+          AND end_time > NEW.start_time
+          {{exclude_self}}
+    );
+END
+"""
+
+SQLITE_FORWARD = [
+    SQLITE_TRIGGER.format(event="insert", operation="INSERT", exclude_self=""),
+    SQLITE_TRIGGER.format(
+        event="update",
+        operation="UPDATE OF doctor_id, start_time, end_time, status",
+        exclude_self="AND id != NEW.id",
+    ),
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS consult_doctor_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS consult_doctor_no_overlap_update",
+]
+
+
+def check_existing_overlaps(apps, schema_editor):
+    """
+    Stop with the ids of overlapping active consultations, which would make
+    adding the guard fail with an error that does not name them.
+    """
+    Consultation = apps.get_model("appointments", "Consultation")
+    active = Consultation.objects.using(schema_editor.connection.alias).filter(
+        status__in=ACTIVE_STATUSES
+    )
+    clashes = active.filter(
+        doctor_id=OuterRef("doctor_id"),
+        start_time__lt=OuterRef("end_time"),
+        end_time__gt=OuterRef("start_time"),
+    ).exclude(pk=OuterRef("pk"))
+    ids = list(
+        active.filter(Exists(clashes))
+        .order_by("doctor_id", "start_time", "pk")
+        .values_list("pk", flat=True)
+    )
+    if ids:
+        raise IntegrityError(
+            f"consult_doctor_no_overlap: {len(ids)} active consultations overlap "
+            f"another one of the same doctor: {', '.join(map(str, ids[:100]))}. "
+            "Reschedule or finish them, then migrate again."
+        )
+
+
+def add_overlap_guard(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+def remove_overlap_guard(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for statement in SQLITE_REVERSE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0004_consultation_version"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(check_existing_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="consultation",
+            constraint=appointments.constraints.PostgresExclusionConstraint(
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                expressions=[
+                    ("doctor", "="),
+                    (
+                        appointments.constraints.TsTzRange(
+                            "start_time",
+                            "end_time",
+                            django.contrib.postgres.fields.ranges.RangeBoundary(),
+                        ),
+                        "&&",
+                    ),
+                ],
+                name="consult_doctor_no_overlap",
+            ),
+        ),
+        # Added after the constraint: rebuilding the table on SQLite to add it
+        # would drop them.
+        migrations.RunPython(add_overlap_guard, remove_overlap_guard),
+    ]
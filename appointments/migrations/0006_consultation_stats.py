@@ -0,0 +1,114 @@
+# Generated by Django 4.2 on 2026-10-18 03:51
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_stats(apps, schema_editor):
+    Consultation = apps.get_model("appointments", "Consultation")
+    ConsultationStat = apps.get_model("appointments", "ConsultationStat")
+    groups = (
+        Consultation.objects.annotate(day=TruncDate("start_time"))
+        .values("day", "doctor_id", "clinic_id", "status")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    ConsultationStat.objects.bulk_create(
+        (
+            ConsultationStat(
+                day=group["day"],
+                doctor_id=group["doctor_id"],
+                clinic_id=group["clinic_id"],
+                status=group["status"],
+                count=group["total"],
+            )
+            for group in groups.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0005_consultation_no_overlap"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsultationStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("confirmed", "Подтверждена"),
+                            ("pending", "Ожидает"),
+                            ("started", "Начата"),
+                            ("completed", "Завершена"),
+                            ("paid", "Оплачена"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "clinic",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="appointments.clinic",
+                    ),
+                ),
+                (
+                    "doctor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="appointments.doctor",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="consultationstat",
+            index=models.Index(
+                fields=["doctor", "day"], name="consult_stat_doctor_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultationstat",
+            index=models.Index(
+                fields=["clinic", "day"], name="consult_stat_clinic_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="consultationstat",
+            constraint=models.UniqueConstraint(
+                fields=("day", "doctor", "clinic", "status"), name="consult_stat_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="consultationstat",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("clinic__isnull", True)),
+                fields=("day", "doctor", "status"),
+                name="consult_stat_unique_no_clinic",
+            ),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0006_consultation_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedConsultation",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField()),
+                ("start_time", models.DateTimeField()),
+                ("end_time", models.DateTimeField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("confirmed", "Подтверждена"),
+                            ("pending", "Ожидает"),
+                            ("started", "Начата"),
+                            ("completed", "Завершена"),
+                            ("paid", "Оплачена"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("notes", models.TextField(blank=True)),
+                ("version", models.PositiveIntegerField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "clinic",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_consultations",
+                        to="appointments.clinic",
+                    ),
+                ),
+                (
+                    "doctor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="archived_consultations",
+                        to="appointments.doctor",
+                    ),
+                ),
+                (
+                    "patient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="archived_consultations",
+                        to="appointments.patient",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="archivedconsultation",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="archive_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedconsultation",
+            index=models.Index(
+                fields=["doctor", "-created_at", "-id"],
+                name="archive_doctor_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedconsultation",
+            index=models.Index(
+                fields=["patient", "-created_at", "-id"],
+                name="archive_patient_created_idx",
+            ),
+        ),
+    ]
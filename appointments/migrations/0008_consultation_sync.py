@@ -0,0 +1,112 @@
+# Generated by Django 4.2 on 2026-10-18 05:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from importlib import import_module
+
+no_overlap = import_module("appointments.migrations.0005_consultation_no_overlap")
+
+
+def restore_overlap_guard(apps, schema_editor):
+    # Adding or removing a column rebuilds the table on SQLite, dropping the
+    # triggers of 0005.
+    if schema_editor.connection.vendor == "sqlite":
+        no_overlap.remove_overlap_guard(apps, schema_editor)
+        no_overlap.add_overlap_guard(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0007_archived_consultation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsultationTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("consultation_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="archivedconsultation",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(migrations.RunPython.noop, restore_overlap_guard),
+        migrations.AddField(
+            model_name="consultation",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(restore_overlap_guard, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(fields=["updated_at", "id"], name="consult_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["doctor", "updated_at", "id"], name="consult_doctor_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultation",
+            index=models.Index(
+                fields=["patient", "updated_at", "id"],
+                name="consult_patient_updated_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="consultationtombstone",
+            name="doctor",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="appointments.doctor",
+            ),
+        ),
+        migrations.AddField(
+            model_name="consultationtombstone",
+            name="patient",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="appointments.patient",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultationtombstone",
+            index=models.Index(
+                fields=["deleted_at", "id"], name="tombstone_deleted_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultationtombstone",
+            index=models.Index(
+                fields=["doctor", "deleted_at", "id"],
+                name="tombstone_doctor_deleted_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="consultationtombstone",
+            index=models.Index(
+                fields=["patient", "deleted_at", "id"],
+                name="tombstone_patient_deleted_idx",
+            ),
+        ),
+    ]
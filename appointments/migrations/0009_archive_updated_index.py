@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0008_consultation_sync"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivedconsultation",
+            index=models.Index(fields=["updated_at", "id"], name="archive_updated_idx"),
+        ),
+    ]
@@ -1,5 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.fields import RangeBoundary, RangeOperators
+
+from .constraints import PostgresExclusionConstraint, TsTzRange
+from .signals import consultations_status_changed
+
+
+def normalize_search_text(value):
+    return " ".join(value.casefold().replace("ё", "е").split())
 
 
 class User(AbstractUser):
@@ -11,6 +22,16 @@ class User(AbstractUser):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="patient")
     middle_name = models.CharField(max_length=150, blank=True)
 
+    # Profile ids from the access token claims, set on authentication by
+    # authentication.CachedJWTAuthentication; None if the token has none.
+    doctor_id = None
+    patient_id = None
+
+    # Fields get_auth_version() depends on.
+    AUTH_FIELDS = ("password", "is_active", "role")
+    # Their values as last read from or written to the database.
+    _loaded_auth_values = None
+
     def is_admin(self):
         return self.role == "admin"
 
@@ -20,6 +41,54 @@ class User(AbstractUser):
     def is_patient(self):
         return self.role == "patient"
 
+    def get_search_name(self):
+        return normalize_search_text(
+            " ".join([self.last_name, self.first_name, self.middle_name])
+        )
+
+    def get_auth_version(self, values=None):
+        """
+        A hash of the fields authentication and permissions depend on (or of
+        their ``values``), carried by tokens: it changes with the role,
+        ``is_active`` or the password.
+        """
+        if values is None:
+            values = [getattr(self, name) for name in self.AUTH_FIELDS]
+        value = ":".join(map(str, values))
+        return salted_hmac("appointments.User.get_auth_version", value).hexdigest()[:16]
+
+    def get_loaded_auth_version(self):
+        if self._loaded_auth_values is None:
+            return None
+        return self.get_auth_version(self._loaded_auth_values)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(cls.AUTH_FIELDS) <= set(field_names):
+            instance._remember_auth_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the previous values.
+        if not self.get_deferred_fields() & set(self.AUTH_FIELDS):
+            self._remember_auth_values()
+
+    def _remember_auth_values(self):
+        self._loaded_auth_values = [getattr(self, name) for name in self.AUTH_FIELDS]
+
+    def profile_lookup(self, role):
+        """
+        Filter arguments for rows of the user's ``role`` ("doctor" or
+        "patient") profile: on the foreign key column when the profile id is
+        known from the token, through the profile otherwise.
+        """
+        profile_id = getattr(self, f"{role}_id")
+        if profile_id is not None:
+            return {f"{role}_id": profile_id}
+        return {f"{role}__user": self}
+
 
 class Clinic(models.Model):
     name = models.CharField(max_length=255)
@@ -36,6 +105,8 @@ class Doctor(models.Model):
     )
     specialization = models.CharField(max_length=255, blank=True)
     clinics = models.ManyToManyField(Clinic, related_name="doctors", blank=True)
+    # Normalized copy of the user's full name, see receivers.sync_search_name.
+    search_name = models.CharField(max_length=500, blank=True, editable=False)
 
     @property
     def first_name(self):
@@ -54,6 +125,10 @@ class Doctor(models.Model):
         parts = [self.last_name, self.first_name, self.middle_name]
         return " ".join(p for p in parts if p)
 
+    def save(self, *args, **kwargs):
+        self.search_name = self.user.get_search_name()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.full_name} ({self.specialization})"
 
@@ -64,6 +139,7 @@ class Patient(models.Model):
     )
     phone = models.CharField(max_length=30, blank=True)
     email = models.EmailField(blank=True)
+    search_name = models.CharField(max_length=500, blank=True, editable=False)
 
     @property
     def first_name(self):
@@ -82,10 +158,31 @@ class Patient(models.Model):
         parts = [self.last_name, self.first_name, self.middle_name]
         return " ".join(p for p in parts if p)
 
+    def save(self, *args, **kwargs):
+        self.search_name = self.user.get_search_name()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.full_name
 
 
+class ConsultationQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Consultations ``user`` may see: all for admins, otherwise their own."""
+        if user.is_admin():
+            return self
+        if user.is_doctor():
+            return self.filter(**user.profile_lookup("doctor"))
+        if user.is_patient():
+            return self.filter(**user.profile_lookup("patient"))
+        return self.none()
+
+
+# Statuses that hold the doctor's time. Module level so that the conditions in
+# Consultation.Meta can use it too.
+ACTIVE_STATUSES = ("pending", "confirmed", "started")
+
+
 class Consultation(models.Model):
     STATUS_PENDING = "pending"
     STATUS_CONFIRMED = "confirmed"
@@ -100,8 +197,21 @@ class Consultation(models.Model):
         (STATUS_COMPLETED, "Завершена"),
         (STATUS_PAID, "Оплачена"),
     )
+    ACTIVE_STATUSES = ACTIVE_STATUSES
+    # Old enough consultations in these statuses move to ArchivedConsultation.
+    ARCHIVE_STATUSES = (STATUS_COMPLETED, STATUS_PAID)
+    # status -> statuses it may move to
+    TRANSITIONS = {
+        STATUS_PENDING: (STATUS_CONFIRMED,),
+        STATUS_CONFIRMED: (STATUS_PENDING, STATUS_STARTED),
+        STATUS_STARTED: (STATUS_COMPLETED,),
+        STATUS_COMPLETED: (STATUS_PAID,),
+        STATUS_PAID: (),
+    }
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also set by the QuerySet.update() writes; see sync.
+    updated_at = models.DateTimeField(auto_now=True)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     status = models.CharField(
@@ -123,9 +233,305 @@ class Consultation(models.Model):
     )
 
     notes = models.TextField(blank=True)
+    # Bumped on every write (see save()); exposed as the ETag for optimistic
+    # concurrency.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = ConsultationQuerySet.as_manager()
+
+    # Column values as last read from or written to the database.
+    _loaded_values = {}
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="consult_created_idx"),
+            models.Index(fields=["start_time", "id"], name="consult_start_idx"),
+            models.Index(
+                fields=["doctor", "-created_at", "-id"],
+                name="consult_doctor_created_idx",
+            ),
+            models.Index(
+                fields=["doctor", "start_time", "id"], name="consult_doctor_start_idx"
+            ),
+            models.Index(
+                fields=["patient", "-created_at", "-id"],
+                name="consult_patient_created_idx",
+            ),
+            models.Index(
+                fields=["patient", "start_time", "id"],
+                name="consult_patient_start_idx",
+            ),
+            models.Index(fields=["updated_at", "id"], name="consult_updated_idx"),
+            models.Index(
+                fields=["doctor", "updated_at", "id"],
+                name="consult_doctor_updated_idx",
+            ),
+            models.Index(
+                fields=["patient", "updated_at", "id"],
+                name="consult_patient_updated_idx",
+            ),
+            models.Index(
+                fields=["clinic", "-created_at", "-id"],
+                name="consult_clinic_created_idx",
+            ),
+            models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="consult_status_created_idx",
+            ),
+            # Live schedule of a doctor/patient: only active statuses matter.
+            models.Index(
+                fields=["doctor", "start_time", "end_time"],
+                name="consult_doctor_active_idx",
+                condition=models.Q(status__in=list(ACTIVE_STATUSES)),
+            ),
+            models.Index(
+                fields=["patient", "start_time", "end_time"],
+                name="consult_patient_active_idx",
+                condition=models.Q(status__in=list(ACTIVE_STATUSES)),
+            ),
+        ]
+        constraints = [
+            # A doctor's active consultations must not overlap. SQLite uses
+            # the triggers of migration 0005 instead.
+            PostgresExclusionConstraint(
+                name="consult_doctor_no_overlap",
+                expressions=[
+                    ("doctor", RangeOperators.EQUAL),
+                    (
+                        TsTzRange("start_time", "end_time", RangeBoundary()),
+                        RangeOperators.OVERLAPS,
+                    ),
+                ],
+                condition=models.Q(status__in=list(ACTIVE_STATUSES)),
+            ),
+        ]
+
+    @classmethod
+    def can_transition(cls, old_status, new_status):
+        return new_status in cls.TRANSITIONS.get(old_status, ())
+
+    @classmethod
+    def sources_for(cls, new_status):
+        return [
+            old for old, targets in cls.TRANSITIONS.items() if new_status in targets
+        ]
+
+    @staticmethod
+    def make_etag(pk, version, directory=None):
+        if directory is None:
+            return f'"{pk}-{version}"'
+        # GET responses also depend on the nested doctor/patient/clinic data.
+        return f'"{pk}-{version}.{directory}"'
+
+    @staticmethod
+    def row_etag(etag):
+        """The ``make_etag(pk, version)`` part of an ETag sent back by a client."""
+        etag = etag.strip().removeprefix("W/")
+        if "." in etag:
+            etag = etag.split(".", 1)[0] + '"'
+        return etag
+
+    @property
+    def etag(self):
+        return self.make_etag(self.pk, self.version)
+
+    def is_visible_to(self, user):
+        """Whether ``Consultation.objects.for_user(user)`` includes this one."""
+        if user.is_admin():
+            return True
+        if user.is_doctor():
+            if user.doctor_id is not None:
+                return self.doctor_id == user.doctor_id
+            return self.doctor.user_id == user.id
+        if user.is_patient():
+            if user.patient_id is not None:
+                return self.patient_id == user.patient_id
+            return self.patient.user_id == user.id
+        return False
+
+    def transition(self, new_status, expected_version=None):
+        """
+        Compare-and-set the status: ``UPDATE ... WHERE id = %s AND status = %s``.
+
+        Returns ``False`` without writing if the row no longer has the status
+        (or version) this instance was loaded with.
+        """
+        queryset = Consultation.objects.filter(pk=self.pk, status=self.status)
+        if expected_version is not None:
+            queryset = queryset.filter(version=expected_version)
+        now = timezone.now()
+        with transaction.atomic():
+            if not queryset.update(
+                status=new_status, version=F("version") + 1, updated_at=now
+            ):
+                return False
+            consultations_status_changed.send(
+                sender=Consultation, rows=[self.get_change_row()], status=new_status
+            )
+        self.status = new_status
+        self.version += 1
+        self.updated_at = now
+        self._remember_values()
+        return True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Unless the caller has claimed a version (see the API update),
+            # every write moves it on, so a stale If-Match never matches.
+            if not self._state.adding and self.version == self._loaded_values.get(
+                "version", self.version
+            ):
+                current = (
+                    Consultation.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("version", flat=True)
+                    .first()
+                )
+                if current is not None:
+                    self.version = current + 1
+                    if kwargs.get("update_fields") is not None:
+                        kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            super().save(*args, **kwargs)
+        # post_save receivers have compared against the previous values.
+        self._remember_values()
+
+    def _remember_values(self):
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields
+        }
+
+    def get_change_row(self):
+        """Row shape of ``signals.consultations_status_changed``."""
+        return {
+            "id": self.pk,
+            "doctor_id": self.doctor_id,
+            "patient_id": self.patient_id,
+            "clinic_id": self.clinic_id,
+            "start_time": self.start_time,
+            "status": self.status,
+        }
 
     def __str__(self):
         return f"Consultation #{self.pk} ({self.doctor} - {self.patient})"
+
+
+class ArchivedConsultation(models.Model):
+    """
+    A consultation moved out of the live table by the
+    ``archive_consultations`` command, with its id and column values.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Consultation.STATUS_CHOICES)
+    doctor = models.ForeignKey(
+        Doctor, on_delete=models.PROTECT, related_name="archived_consultations"
+    )
+    patient = models.ForeignKey(
+        Patient, on_delete=models.PROTECT, related_name="archived_consultations"
+    )
+    clinic = models.ForeignKey(
+        Clinic,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_consultations",
+    )
+    notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ConsultationQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="archive_created_idx"),
+            models.Index(
+                fields=["doctor", "-created_at", "-id"],
+                name="archive_doctor_created_idx",
+            ),
+            models.Index(
+                fields=["patient", "-created_at", "-id"],
+                name="archive_patient_created_idx",
+            ),
+            # Incremental exports.
+            models.Index(fields=["updated_at", "id"], name="archive_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archived consultation #{self.pk}"
+
+
+class ConsultationTombstone(models.Model):
+    """
+    A consultation that left the view of a doctor or patient (``None`` for
+    the other one), or of both when it was deleted; see ``sync``.
+    """
+
+    consultation_id = models.BigIntegerField()
+    doctor = models.ForeignKey(
+        Doctor, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    patient = models.ForeignKey(
+        Patient, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ConsultationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx"),
+            models.Index(
+                fields=["doctor", "deleted_at", "id"],
+                name="tombstone_doctor_deleted_idx",
+            ),
+            models.Index(
+                fields=["patient", "deleted_at", "id"],
+                name="tombstone_patient_deleted_idx",
+            ),
+        ]
+
+
+class ConsultationStat(models.Model):
+    """
+    Number of consultations per day (of ``start_time``), doctor, clinic and
+    status, archived ones included. Kept up to date by ``receivers``; rebuilt
+    from scratch with the ``rebuild_consultation_stats`` command.
+    """
+
+    day = models.DateField()
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="+")
+    clinic = models.ForeignKey(
+        Clinic, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    status = models.CharField(max_length=20, choices=Consultation.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "doctor", "clinic", "status"],
+                name="consult_stat_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "doctor", "status"],
+                condition=models.Q(clinic__isnull=True),
+                name="consult_stat_unique_no_clinic",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["doctor", "day"], name="consult_stat_doctor_idx"),
+            models.Index(fields=["clinic", "day"], name="consult_stat_clinic_idx"),
+        ]
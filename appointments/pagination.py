@@ -0,0 +1,221 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ConsultationCursorPagination(CursorPagination):
+    """
+    Keyset pagination over ``(<ordering field>, id)``.
+
+    Unlike DRF's ``CursorPagination`` the position stores the ``id`` tiebreaker
+    as well, so pages never fall back to an ``OFFSET`` inside a run of equal
+    timestamps.
+
+    No ``COUNT(*)`` is issued unless asked for with ``?count=exact``.
+    ``?count=estimate`` takes ``view.estimate_count()`` if the view has one
+    and it can answer, then the planner's row estimate on PostgreSQL, and
+    only then counts.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    ordering = "-created_at"
+    keyset_fields = ("created_at", "start_time")
+    count_query_param = "count"
+    count_modes = ("none", "exact", "estimate")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.get_count(queryset, request, view)
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.count = await sync_to_async(self.get_count)(queryset, request, view)
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in queryset])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        paginated = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "has_next": self.has_next,
+        }
+        if self.count is not None:
+            paginated["count"] = self.count
+        paginated["results"] = data
+        return paginated
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["has_next"] = {"type": "boolean"}
+        response_schema["properties"]["count"] = {
+            "type": "integer",
+            "description": "Only with ?count=exact or ?count=estimate",
+        }
+        return response_schema
+
+    def get_count(self, queryset, request, view=None):
+        """The total for ``?count=``, ``None`` for the default ``none``."""
+        mode = request.query_params.get(self.count_query_param, "none")
+        if mode not in self.count_modes:
+            expected = ", ".join(self.count_modes)
+            raise ValidationError(
+                {self.count_query_param: f"Expected one of: {expected}"}
+            )
+        if mode == "none":
+            return None
+        parts = queryset if isinstance(queryset, list) else [queryset]
+        if mode == "estimate":
+            estimate_count = getattr(view, "estimate_count", None)
+            estimate = estimate_count() if estimate_count else None
+            if estimate is None and connections[parts[0].db].vendor == "postgresql":
+                estimate = sum(self.planner_estimate(part) for part in parts)
+            if estimate is not None:
+                return estimate
+        return sum(part.count() for part in parts)
+
+    @staticmethod
+    def planner_estimate(queryset):
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        The unevaluated query for the requested page plus one lookahead row.
+
+        ``queryset`` may also be a list of ``.values()`` querysets with the
+        same columns, paginated as one ``UNION ALL``.
+        """
+        parts = queryset if isinstance(queryset, list) else [queryset]
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, parts[0], view)
+        self.cursor = self.decode_cursor(request)
+
+        ordering = self._invert(self.ordering) if self._reverse else self.ordering
+        if self._position is not None:
+            after = self._after(ordering, self._position)
+            parts = [part.filter(after) for part in parts]
+        if len(parts) > 1:
+            parts = [part.order_by() for part in parts]
+            queryset = parts[0].union(*parts[1:], all=True)
+        else:
+            queryset = parts[0]
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def set_page(self, results):
+        reverse, position = self._reverse, self._position
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    @property
+    def _reverse(self):
+        return bool(self.cursor and self.cursor["reverse"])
+
+    @property
+    def _position(self):
+        return self.cursor["position"] if self.cursor else None
+
+    def get_ordering(self, request, queryset, view):
+        default = field = type(self).ordering
+        if view is not None and OrderingFilter in getattr(view, "filter_backends", ()):
+            requested = OrderingFilter().get_ordering(request, queryset, view)
+            if requested:
+                field = requested[0]
+        if field.lstrip("-") not in self.keyset_fields:
+            field = default
+        tiebreaker = "-id" if field.startswith("-") else "id"
+        return (field, tiebreaker)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position(self.page[-1])
+        else:
+            position = self.cursor["position"]
+        return self.encode_cursor({"position": position, "reverse": False})
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position(self.page[0])
+        else:
+            position = self.cursor["position"]
+        return self.encode_cursor({"position": position, "reverse": True})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            if payload["o"] != self.ordering[0]:
+                raise ValueError("cursor was issued for another ordering")
+            value, pk = payload["p"]
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError("cursor position is not a datetime")
+            return {"position": (value, int(pk)), "reverse": bool(payload["r"])}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        value, pk = cursor["position"]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = {"o": self.ordering[0], "p": [value, pk], "r": int(cursor["reverse"])}
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, separators=(",", ":")).encode("ascii")
+        ).decode("ascii")
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _get_position(self, row):
+        field = self.ordering[0].lstrip("-")
+        if isinstance(row, dict):
+            return (row[field], row["id"])
+        return (getattr(row, field), row.pk)
+
+    @staticmethod
+    def _invert(ordering):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        field, tiebreaker = ordering
+        value, pk = position
+        op = "lt" if field.startswith("-") else "gt"
+        field, tiebreaker = field.lstrip("-"), tiebreaker.lstrip("-")
+        return Q(**{f"{field}__{op}": value}) | Q(
+            **{field: value, f"{tiebreaker}__{op}": pk}
+        )
@@ -29,9 +29,9 @@ class ConsultationPermission(permissions.BasePermission):
         if request.user.is_admin():
             return True
 
-        if view.action == "create" and request.user.is_patient():
+        if view.action in ["create", "bulk_create"] and request.user.is_patient():
             return True
-        if view.action in ["list", "retrieve"]:
+        if view.action in ["list", "retrieve", "sync"]:
             return True
         if view.action in ["partial_update", "update"]:
             return request.user.is_doctor() or request.user.is_admin()
@@ -40,19 +40,4 @@ class ConsultationPermission(permissions.BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        if request.user.is_admin():
-            return True
-
-        if request.user.is_patient():
-            try:
-                return obj.patient.user_id == request.user.id
-            except Exception:
-                return False
-
-        if request.user.is_doctor():
-            try:
-                return obj.doctor.user_id == request.user.id
-            except Exception:
-                return False
-
-        return False
+        return obj.is_visible_to(request.user)
@@ -0,0 +1,199 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import caching, events, stats
+from .authentication import user_cache
+from .models import (
+    Clinic,
+    Consultation,
+    ConsultationTombstone,
+    Doctor,
+    Patient,
+    User,
+)
+from .signals import (
+    consultations_archived,
+    consultations_bulk_created,
+    consultations_status_changed,
+)
+
+NAME_FIELDS = {"first_name", "last_name", "middle_name"}
+# User fields nested into consultation responses.
+DIRECTORY_FIELDS = NAME_FIELDS | {"username", "email", "role"}
+
+
+@receiver(post_save, sender=User)
+def sync_search_name(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    search_name = instance.get_search_name()
+    for model in (Doctor, Patient):
+        model.objects.filter(user=instance).exclude(search_name=search_name).update(
+            search_name=search_name
+        )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(User.AUTH_FIELDS) & set(update_fields):
+        return
+    # After the commit: until then another request may cache the old row again.
+    user_id = instance.pk
+    versions = {instance.get_auth_version(), instance.get_loaded_auth_version()}
+    versions.discard(None)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id, versions))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_responses(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not DIRECTORY_FIELDS & set(update_fields):
+        return
+    caching.forget_profile(instance.pk)
+    caching.bump_directory()
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+def invalidate_profile_responses(sender, instance, created=False, **kwargs):
+    caching.forget_profile(instance.user_id)
+    if not created:
+        caching.bump_directory()
+
+
+@receiver(post_save, sender=Clinic)
+@receiver(post_delete, sender=Clinic)
+@receiver(m2m_changed, sender=Doctor.clinics.through)
+def invalidate_clinic_responses(sender, **kwargs):
+    caching.bump_directory()
+
+
+@receiver(post_save, sender=Consultation)
+@receiver(post_delete, sender=Consultation)
+def invalidate_consultation_responses(sender, instance, **kwargs):
+    caching.bump_consultations([instance.__dict__, instance._loaded_values])
+
+
+@receiver(consultations_bulk_created, sender=Consultation)
+def invalidate_bulk_created_responses(sender, instances, **kwargs):
+    caching.bump_consultations(c.__dict__ for c in instances)
+
+
+@receiver(consultations_status_changed, sender=Consultation)
+def invalidate_status_change_responses(sender, rows, **kwargs):
+    caching.bump_consultations(rows)
+
+
+@receiver(consultations_archived, sender=Consultation)
+def invalidate_archived_responses(sender, rows, **kwargs):
+    caching.bump_consultations(rows)
+
+
+@receiver(post_delete, sender=Consultation)
+def record_deleted_consultation(sender, instance, **kwargs):
+    ConsultationTombstone.objects.create(
+        consultation_id=instance.pk,
+        doctor_id=instance.doctor_id,
+        patient_id=instance.patient_id,
+    )
+
+
+@receiver(post_save, sender=Consultation)
+def record_reassigned_consultation(sender, instance, created, **kwargs):
+    """Tombstones for the doctor or patient a consultation was taken from."""
+    if created:
+        return
+    old = instance._loaded_values
+    doctor_id, patient_id = old.get("doctor_id"), old.get("patient_id")
+    if doctor_id == instance.doctor_id:
+        doctor_id = None
+    if patient_id == instance.patient_id:
+        patient_id = None
+    if doctor_id is not None or patient_id is not None:
+        ConsultationTombstone.objects.create(
+            consultation_id=instance.pk, doctor_id=doctor_id, patient_id=patient_id
+        )
+
+
+@receiver(post_save, sender=Consultation)
+def publish_saved_consultation(sender, instance, created, **kwargs):
+    events.publish(
+        [
+            events.Event.for_consultation(
+                "created" if created else "updated",
+                instance.__dict__,
+                instance._loaded_values,
+            )
+        ]
+    )
+
+
+@receiver(post_delete, sender=Consultation)
+def publish_deleted_consultation(sender, instance, **kwargs):
+    events.publish([events.Event.for_consultation("deleted", instance.__dict__)])
+
+
+@receiver(consultations_bulk_created, sender=Consultation)
+def publish_bulk_created_consultations(sender, instances, **kwargs):
+    events.publish(
+        [events.Event.for_consultation("created", c.__dict__) for c in instances]
+    )
+
+
+@receiver(consultations_status_changed, sender=Consultation)
+def publish_status_changes(sender, rows, status, **kwargs):
+    events.publish(
+        [
+            events.Event.for_consultation(
+                "status_changed",
+                {**row, "status": status},
+                previous_status=row["status"],
+            )
+            for row in rows
+        ]
+    )
+
+
+def _stat_key(values):
+    return stats.stat_key(
+        values["start_time"], values["doctor_id"], values["clinic_id"], values["status"]
+    )
+
+
+@receiver(post_save, sender=Consultation)
+def count_saved_consultation(sender, instance, created, **kwargs):
+    new_key = _stat_key(instance.__dict__)
+    old_values = instance._loaded_values
+    if created:
+        stats.apply_deltas({new_key: 1})
+    elif all(field in old_values for field in stats.KEY_FIELDS):
+        old_key = _stat_key(old_values)
+        if old_key != new_key:
+            stats.apply_deltas({old_key: -1, new_key: 1})
+
+
+@receiver(post_delete, sender=Consultation)
+def count_deleted_consultation(sender, instance, **kwargs):
+    stats.apply_deltas({_stat_key(instance.__dict__): -1})
+
+
+@receiver(consultations_bulk_created, sender=Consultation)
+def count_bulk_created_consultations(sender, instances, **kwargs):
+    stats.apply_deltas(Counter(_stat_key(c.__dict__) for c in instances))
+
+
+@receiver(consultations_status_changed, sender=Consultation)
+def count_status_changes(sender, rows, status, **kwargs):
+    stats.record_status_change(rows, status)
+
+
+@receiver(pre_delete, sender=Clinic)
+def count_deleted_clinic(sender, instance, **kwargs):
+    stats.move_clinic_counts(instance.pk)
@@ -0,0 +1,200 @@
+"""
+Bulk import of patients from a CSV or NDJSON roster.
+
+Rows are validated and inserted in batches: one query per batch finds the
+usernames already taken and users and patients are inserted with
+``bulk_create``. Passwords given in the roster are checked against
+``AUTH_PASSWORD_VALIDATORS`` and hashed in a process pool. Rows without one
+get an unusable password and an invite token, which the patient exchanges
+for a password at ``POST /api/auth/register/accept-invite/``; with 600k
+PBKDF2 iterations per hash, that is the way to import many patients fast.
+"""
+
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.exceptions import ValidationError
+
+from .models import Patient, User
+from .serializers import RosterPatientSerializer
+from .tokens import invite_tokens
+
+FORMATS = ("csv", "ndjson")
+
+
+def read_roster(lines, fmt):
+    """
+    Yield ``(line, row)`` for every record of ``lines``, an iterable of text
+    lines. ``row`` is ``None`` if the record cannot be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+class RosterImport:
+    """
+    Import ``(line, row)`` pairs with ``run()``; afterwards ``created`` is
+    the number of patients created, ``errors`` lists ``{"line", "errors"}``
+    of rejected rows and ``invites`` lists ``{"line", "username", "uid",
+    "token"}`` for patients imported without a password.
+    """
+
+    def __init__(self, batch_size=1000, workers=0):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.serializer = RosterPatientSerializer()
+        self.usernames = set()
+        self.created = 0
+        self.errors = []
+        self.invites = []
+
+    def run(self, rows):
+        executor = None
+        if self.workers:
+            # Workers started with "spawn" have to set Django up themselves.
+            executor = ProcessPoolExecutor(self.workers, initializer=django.setup)
+        try:
+            rows = iter(rows)
+            while batch := list(islice(rows, self.batch_size)):
+                self.import_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self
+
+    def import_batch(self, batch, executor=None):
+        valid = {}
+        for line, row in batch:
+            data = self.validate(line, row)
+            if data is not None:
+                valid[line] = data
+
+        taken = set(
+            User.objects.filter(
+                username__in=[data["username"] for data in valid.values()]
+            ).values_list("username", flat=True)
+        )
+        for line, data in list(valid.items()):
+            if data["username"] in taken:
+                self.reject(line, {"username": ["A user with that username exists."]})
+                del valid[line]
+
+        passwords = [data["password"] for data in valid.values() if data["password"]]
+        if executor is not None:
+            hashes = executor.map(make_password, passwords, chunksize=16)
+        else:
+            hashes = map(make_password, passwords)
+        hashes = iter(hashes)
+
+        users = {}
+        for line, data in valid.items():
+            user = User(
+                username=data["username"],
+                first_name=data["first_name"],
+                middle_name=data["middle_name"],
+                last_name=data["last_name"],
+                email=data["email"],
+                role="patient",
+            )
+            if data["password"]:
+                user.password = next(hashes)
+            else:
+                user.set_unusable_password()
+            users[line] = user
+        self.insert(users, valid)
+
+    def validate(self, line, row):
+        if row is None:
+            self.reject(line, {"non_field_errors": ["Malformed row."]})
+            return None
+        try:
+            data = self.serializer.run_validation(row)
+        except ValidationError as e:
+            self.reject(line, e.detail)
+            return None
+        if data["username"] in self.usernames:
+            self.reject(line, {"username": ["Duplicate username in the roster."]})
+            return None
+        self.usernames.add(data["username"])
+        if data["password"]:
+            user = User(
+                username=data["username"],
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                email=data["email"],
+            )
+            try:
+                validate_password(data["password"], user)
+            except DjangoValidationError as e:
+                self.reject(line, {"password": e.messages})
+                return None
+        return data
+
+    def insert(self, users, valid):
+        try:
+            with transaction.atomic():
+                self.bulk_insert(list(users.values()), valid.values())
+        except IntegrityError:
+            # A username was registered since the batch was checked: insert
+            # one by one so that only that row fails.
+            for line, user in list(users.items()):
+                user.pk = None
+                try:
+                    with transaction.atomic():
+                        self.bulk_insert([user], [valid[line]])
+                except IntegrityError:
+                    self.reject(
+                        line, {"username": ["A user with that username exists."]}
+                    )
+                    del users[line]
+
+        self.created += len(users)
+        for line, user in users.items():
+            if not user.has_usable_password():
+                self.invites.append(
+                    {
+                        "line": line,
+                        "username": user.username,
+                        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+                        "token": invite_tokens.make_token(user),
+                    }
+                )
+
+    @staticmethod
+    def bulk_insert(users, rows):
+        User.objects.bulk_create(users)
+        # bulk_create() bypasses Patient.save(), so search_name is set here.
+        Patient.objects.bulk_create(
+            [
+                Patient(
+                    user=user,
+                    phone=data["phone"],
+                    email=data["email"],
+                    search_name=user.get_search_name(),
+                )
+                for user, data in zip(users, rows)
+            ]
+        )
+
+    def reject(self, line, errors):
+        self.errors.append({"line": line, "errors": errors})
@@ -1,11 +1,27 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.http import urlsafe_base64_decode
+from .exceptions import Conflict, DoubleBooking, is_double_booking
 from .models import Clinic, Doctor, Patient, Consultation
+from .tokens import invite_tokens
 from django.db import IntegrityError, transaction
 
 User = get_user_model()
 
 
+def validate_time_range(data, instance=None):
+    # validate that start < end, taking a missing bound from the instance
+    start = data.get("start_time", getattr(instance, "start_time", None))
+    end = data.get("end_time", getattr(instance, "end_time", None))
+    if start and end and start >= end:
+        raise serializers.ValidationError("end_time must be after start_time")
+    return data
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     role = serializers.ChoiceField(choices=User.ROLE_CHOICES)
@@ -98,11 +114,17 @@ class PatientSerializer(serializers.ModelSerializer):
 
 
 class ConsultationSerializer(serializers.ModelSerializer):
+    # The related querysets load everything the nested read-only
+    # representation needs, so the create response costs no extra queries.
     doctor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Doctor.objects.all(), source="doctor", write_only=True
+        queryset=Doctor.objects.select_related("user").prefetch_related("clinics"),
+        source="doctor",
+        write_only=True,
     )
     patient_id = serializers.PrimaryKeyRelatedField(
-        queryset=Patient.objects.all(), source="patient", write_only=True
+        queryset=Patient.objects.select_related("user"),
+        source="patient",
+        write_only=True,
     )
     doctor = DoctorSerializer(read_only=True)
     patient = PatientSerializer(read_only=True)
@@ -112,6 +134,7 @@ class ConsultationSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "created_at",
+            "updated_at",
             "start_time",
             "end_time",
             "status",
@@ -121,21 +144,307 @@ class ConsultationSerializer(serializers.ModelSerializer):
             "patient",
             "clinic",
             "notes",
+            "version",
         )
-        read_only_fields = ("created_at",)
+        read_only_fields = ("created_at", "updated_at")
 
     def validate(self, data):
-        # validate that start < end
-        start = data.get("start_time")
-        end = data.get("end_time")
-        if start and end and start >= end:
-            raise serializers.ValidationError("end_time must be after start_time")
-        return data
+        new_status = data.get("status")
+        if (
+            self.instance is not None
+            and new_status
+            and new_status != self.instance.status
+            and not Consultation.can_transition(self.instance.status, new_status)
+        ):
+            raise Conflict(
+                f"Cannot change status from {self.instance.status} to {new_status}"
+            )
+        return validate_time_range(data, self.instance)
 
     def create(self, validated_data):
         try:
-            return super().create(validated_data)
+            with transaction.atomic():
+                return super().create(validated_data)
         except IntegrityError as e:
+            if is_double_booking(e):
+                raise DoubleBooking()
             raise serializers.ValidationError(
                 {"detail": "Database integrity error", "error": str(e)}
             )
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError as e:
+            if is_double_booking(e):
+                raise DoubleBooking()
+            raise
+
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Tokens carrying the user's ``role`` and ``doctor_id``/``patient_id``, so
+    consultations are scoped on their own columns, see
+    ``User.profile_lookup``, and the ``auth_version`` the user cache is keyed
+    on. Access tokens from a refresh keep the claims.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        token["auth_version"] = user.get_auth_version()
+        token["doctor_id"] = token["patient_id"] = None
+        model = {"doctor": Doctor, "patient": Patient}.get(user.role)
+        if model is not None:
+            token[f"{user.role}_id"] = (
+                model.objects.filter(user=user).values_list("pk", flat=True).first()
+            )
+        return token
+
+
+class RosterPatientSerializer(serializers.Serializer):
+    """One row of a patient roster, see ``roster.RosterImport``."""
+
+    username = serializers.CharField(
+        max_length=150, validators=User._meta.get_field("username").validators
+    )
+    first_name = serializers.CharField(
+        max_length=150, required=False, allow_blank=True, default=""
+    )
+    middle_name = serializers.CharField(
+        max_length=150, required=False, allow_blank=True, default=""
+    )
+    last_name = serializers.CharField(
+        max_length=150, required=False, allow_blank=True, default=""
+    )
+    email = serializers.EmailField(required=False, allow_blank=True, default="")
+    phone = serializers.CharField(
+        max_length=30, required=False, allow_blank=True, default=""
+    )
+    # Without one the patient gets an invite token instead.
+    password = serializers.CharField(
+        min_length=8, required=False, allow_blank=True, default=""
+    )
+
+
+class AcceptInviteSerializer(serializers.Serializer):
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True, min_length=8)
+
+    def validate(self, data):
+        try:
+            pk = int(urlsafe_base64_decode(data["uid"]))
+            user = User.objects.get(pk=pk, role="patient")
+        except (ValueError, User.DoesNotExist):
+            user = None
+        if user is None or not invite_tokens.check_token(user, data["token"]):
+            raise serializers.ValidationError("Invalid or expired invite")
+        try:
+            validate_password(data["password"], user)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({"password": e.messages})
+        data["user"] = user
+        return data
+
+    def save(self):
+        user = self.validated_data["user"]
+        user.set_password(self.validated_data["password"])
+        user.save(update_fields=["password"])
+        return user
+
+
+class ConsultationBulkItemSerializer(serializers.Serializer):
+    """
+    One item of a bulk create. Related ids are plain integers here: they are
+    resolved for the whole batch at once by ``bulk.create_consultations``.
+    """
+
+    doctor_id = serializers.IntegerField()
+    patient_id = serializers.IntegerField()
+    clinic = serializers.IntegerField(required=False, allow_null=True, default=None)
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    status = serializers.ChoiceField(
+        choices=Consultation.STATUS_CHOICES, default=Consultation.STATUS_PENDING
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate(self, data):
+        return validate_time_range(data)
+
+
+class ConsultationBulkStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Consultation.STATUS_CHOICES)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    filter = serializers.DictField(required=False)
+
+    def validate(self, data):
+        if ("ids" in data) == ("filter" in data):
+            raise serializers.ValidationError("Provide either ids or filter")
+        max_size = settings.CONSULTATION_BULK_MAX_SIZE
+        if len(data.get("ids", ())) > max_size:
+            raise serializers.ValidationError(
+                {"ids": f"At most {max_size} ids per request"}
+            )
+        return data
+
+
+class FreeSlotsQuerySerializer(serializers.Serializer):
+    doctor = serializers.IntegerField(required=False)
+    clinic = serializers.IntegerField(required=False)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    duration = serializers.IntegerField(min_value=5, max_value=480, default=30)
+    day_start = serializers.TimeField(required=False)
+    day_end = serializers.TimeField(required=False)
+
+    def validate(self, data):
+        if ("doctor" in data) == ("clinic" in data):
+            raise serializers.ValidationError("Provide either doctor or clinic")
+        if data["date_from"] > data["date_to"]:
+            raise serializers.ValidationError("date_to must not be before date_from")
+        if (data["date_to"] - data["date_from"]).days >= settings.FREE_SLOTS_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"At most {settings.FREE_SLOTS_MAX_DAYS} days per request"
+            )
+        data.setdefault("day_start", settings.WORKING_DAY_START)
+        data.setdefault("day_end", settings.WORKING_DAY_END)
+        if data["day_start"] >= data["day_end"]:
+            raise serializers.ValidationError("day_end must be after day_start")
+        return data
+
+
+class ConsultationStatsQuerySerializer(serializers.Serializer):
+    GROUP_BY_CHOICES = ("day", "doctor", "clinic", "status")
+
+    group_by = serializers.CharField(default="status")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    doctor = serializers.IntegerField(required=False)
+    clinic = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(
+        choices=Consultation.STATUS_CHOICES, required=False
+    )
+
+    def validate_group_by(self, value):
+        group_by = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(group_by) - set(self.GROUP_BY_CHOICES)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown group(s): {', '.join(sorted(unknown))}"
+            )
+        if not group_by:
+            raise serializers.ValidationError("Provide at least one group")
+        return list(dict.fromkeys(group_by))
+
+    def validate(self, data):
+        if (
+            "date_from" in data
+            and "date_to" in data
+            and data["date_from"] > data["date_to"]
+        ):
+            raise serializers.ValidationError("date_to must not be before date_from")
+        return data
+
+
+class ConsultationValuesSerializer:
+    """
+    Lean, read-only consultation representation built from ``.values()`` rows.
+
+    Used when a client asks for ``?fields=`` or ``?expand=``: ``doctor``,
+    ``patient`` and ``clinic`` are rendered as ids unless listed in
+    ``expand``, in which case a flat profile object is rendered instead of
+    the nested ``DoctorSerializer``/``PatientSerializer`` output. No model or
+    serializer field instances are created per row.
+    """
+
+    datetime_field = serializers.DateTimeField()
+
+    columns = {
+        "id": "id",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+        "start_time": "start_time",
+        "end_time": "end_time",
+        "status": "status",
+        "doctor": "doctor_id",
+        "patient": "patient_id",
+        "clinic": "clinic_id",
+        "notes": "notes",
+        "version": "version",
+    }
+    datetime_fields = ("created_at", "updated_at", "start_time", "end_time")
+    # Columns the cursor paginator reads positions from.
+    pagination_columns = ("id", "created_at", "start_time")
+
+    expansions = {
+        "doctor": {
+            "id": "doctor_id",
+            "first_name": "doctor__user__first_name",
+            "last_name": "doctor__user__last_name",
+            "middle_name": "doctor__user__middle_name",
+            "specialization": "doctor__specialization",
+        },
+        "patient": {
+            "id": "patient_id",
+            "first_name": "patient__user__first_name",
+            "last_name": "patient__user__last_name",
+            "middle_name": "patient__user__middle_name",
+            "phone": "patient__phone",
+            "email": "patient__email",
+        },
+    }
+
+    def __init__(self, fields=None, expand=()):
+        fields = list(fields or self.columns)
+        unknown = [f for f in fields if f not in self.columns]
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown field(s): {', '.join(unknown)}"}
+            )
+        unknown = [e for e in expand if e not in self.expansions]
+        if unknown:
+            raise serializers.ValidationError(
+                {"expand": f"Unknown expansion(s): {', '.join(unknown)}"}
+            )
+        self.fields = fields
+        self.expand = [e for e in expand if e in fields]
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        """Return a serializer for ``?fields=``/``?expand=``, or ``None``."""
+        if "fields" not in query_params and "expand" not in query_params:
+            return None
+
+        def split(name):
+            return [
+                v.strip() for v in query_params.get(name, "").split(",") if v.strip()
+            ]
+
+        return cls(fields=split("fields"), expand=split("expand"))
+
+    def get_columns(self):
+        columns = {self.columns[f] for f in self.fields}
+        columns.update(self.pagination_columns)
+        for name in self.expand:
+            columns.update(self.expansions[name].values())
+        return sorted(columns)
+
+    def to_representation(self, row):
+        data = {}
+        for field in self.fields:
+            if field in self.expand:
+                data[field] = {
+                    key: row[column] for key, column in self.expansions[field].items()
+                }
+                continue
+            value = row[self.columns[field]]
+            if field in self.datetime_fields:
+                value = self.datetime_field.to_representation(value)
+            data[field] = value
+        return data
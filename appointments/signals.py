@@ -0,0 +1,16 @@
+from django.dispatch import Signal
+
+# QuerySet.update() and bulk_create() do not send post_save. Code that
+# writes consultations that way sends these instead, once per batch.
+
+# instances: the created Consultation objects (with primary keys).
+consultations_bulk_created = Signal()
+
+# rows: dicts with the id, doctor_id, patient_id, clinic_id, start_time and
+#   the previous status of every changed consultation.
+# status: the status they were moved to.
+consultations_status_changed = Signal()
+
+# rows: dicts with the column values (attnames) of consultations moved to
+#   ArchivedConsultation. They are deleted without post_delete.
+consultations_archived = Signal()
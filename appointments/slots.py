@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Consultation
+
+
+def working_windows(date_from, date_to, day_start, day_end):
+    """Aware ``(start, end)`` working hours for every day of the range."""
+    tz = timezone.get_current_timezone()
+    day = date_from
+    while day <= date_to:
+        yield (
+            timezone.make_aware(datetime.combine(day, day_start), tz),
+            timezone.make_aware(datetime.combine(day, day_end), tz),
+        )
+        day += timedelta(days=1)
+
+
+def busy_intervals(doctor_ids, start, end):
+    """
+    Active consultations of ``doctor_ids`` overlapping ``[start, end)`` as
+    ``{doctor_id: [(start, end), ...]}`` sorted by start, in one query.
+    """
+    busy = {pk: [] for pk in doctor_ids}
+    rows = (
+        Consultation.objects.filter(
+            doctor_id__in=doctor_ids,
+            status__in=Consultation.ACTIVE_STATUSES,
+            start_time__lt=end,
+            end_time__gt=start,
+        )
+        .order_by("doctor_id", "start_time")
+        .values_list("doctor_id", "start_time", "end_time")
+    )
+    for doctor_id, busy_start, busy_end in rows:
+        busy[doctor_id].append((busy_start, busy_end))
+    return busy
+
+
+def slot_grid(windows, duration, not_before=None):
+    """
+    Candidate ``(start, end)`` slots of ``duration`` inside ``windows``,
+    aligned to a grid from the start of each window and starting no earlier
+    than ``not_before``.
+    """
+    grid = []
+    for window_start, window_end in windows:
+        slot_start = window_start
+        if not_before is not None and slot_start < not_before:
+            slot_start = _next_on_grid(window_start, not_before, duration)
+        while slot_start + duration <= window_end:
+            grid.append((slot_start, slot_start + duration))
+            slot_start += duration
+    return grid
+
+
+def free_slots(busy, grid):
+    """
+    The slots of ``grid`` that do not overlap ``busy``.
+
+    Both are ``(start, end)`` pairs sorted by start and are swept once, so the
+    cost is linear in their length. Grid entries are returned as is: the grid
+    is shared by every doctor of a query and only compared here.
+    """
+    slots = []
+    i = 0
+    for slot in grid:
+        slot_start, slot_end = slot
+        while i < len(busy) and busy[i][1] <= slot_start:
+            i += 1
+        if i == len(busy) or busy[i][0] >= slot_end:
+            slots.append(slot)
+    return slots
+
+
+def _next_on_grid(origin, moment, step):
+    steps = -((origin - moment) // step)  # ceil((moment - origin) / step)
+    return origin + max(steps, 0) * step
+
+
+def isoformat(value):
+    # DRF's DateTimeField output for values already in the current timezone.
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
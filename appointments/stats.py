@@ -0,0 +1,93 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedConsultation, Consultation, ConsultationStat
+
+KEY_FIELDS = ("start_time", "doctor_id", "clinic_id", "status")
+
+
+def stat_key(start_time, doctor_id, clinic_id, status):
+    # Instances saved with raw strings still hold them after save().
+    start_time = Consultation._meta.get_field("start_time").to_python(start_time)
+    if timezone.is_naive(start_time):
+        start_time = timezone.make_aware(start_time)
+    return (timezone.localdate(start_time), doctor_id, clinic_id, status)
+
+
+def apply_deltas(deltas):
+    """Add ``{stat_key: delta}`` to the summary table, one row per key."""
+    for (day, doctor_id, clinic_id, status), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = {
+            "day": day,
+            "doctor_id": doctor_id,
+            "clinic_id": clinic_id,
+            "status": status,
+        }
+        rows = ConsultationStat.objects.filter(**lookup)
+        if rows.update(count=F("count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                ConsultationStat.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Created concurrently since the UPDATE above.
+            rows.update(count=F("count") + delta)
+
+
+def move_clinic_counts(clinic_id):
+    """
+    Count the consultations of a clinic being deleted (kept with
+    ``clinic=NULL``) under no clinic, before its rows cascade away.
+    """
+    deltas = Counter()
+    rows = ConsultationStat.objects.filter(clinic_id=clinic_id)
+    for day, doctor_id, status, count in rows.values_list(
+        "day", "doctor_id", "status", "count"
+    ):
+        deltas[(day, doctor_id, None, status)] += count
+    apply_deltas(deltas)
+
+
+def record_status_change(rows, status):
+    deltas = Counter()
+    for row in rows:
+        key = (row["start_time"], row["doctor_id"], row["clinic_id"])
+        deltas[stat_key(*key, row["status"])] -= 1
+        deltas[stat_key(*key, status)] += 1
+    apply_deltas(deltas)
+
+
+def rebuild():
+    """Recompute the whole summary table from live and archived consultations."""
+    counts = Counter()
+    for model in (Consultation, ArchivedConsultation):
+        groups = (
+            model.objects.annotate(day=TruncDate("start_time"))
+            .values("day", "doctor_id", "clinic_id", "status")
+            .annotate(total=Count("id"))
+            .order_by()
+        )
+        for group in groups.iterator(chunk_size=2000):
+            key = (group["day"], group["doctor_id"], group["clinic_id"])
+            counts[key + (group["status"],)] += group["total"]
+    with transaction.atomic():
+        ConsultationStat.objects.all().delete()
+        ConsultationStat.objects.bulk_create(
+            (
+                ConsultationStat(
+                    day=day,
+                    doctor_id=doctor_id,
+                    clinic_id=clinic_id,
+                    status=status,
+                    count=total,
+                )
+                for (day, doctor_id, clinic_id, status), total in counts.items()
+            ),
+            batch_size=2000,
+        )
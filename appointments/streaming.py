@@ -0,0 +1,160 @@
+"""
+``GET /api/consultations/stream/``: server-sent events of consultation
+changes for ASGI deployments, mounted in front of Django by ``mis.asgi``.
+
+Events are ``created``, ``updated``, ``deleted`` and ``status_changed``
+with the consultation's id, doctor_id, patient_id, clinic_id, status and
+start_time as data, limited to the consultations the caller sees. A client
+reconnecting with ``Last-Event-ID`` (or ``?last_event_id=``) gets the events
+it missed; if they are no longer kept, or the client reads too slowly to keep
+up, it gets a ``reset`` event and should reload the list instead.
+
+The stream is a plain ASGI application rather than a Django view: it holds
+neither a thread nor a database connection while idle, and it notices at
+once when the client disconnects.
+"""
+
+import asyncio
+import io
+import json
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+
+from . import caching, events
+from .authentication import AsyncJWTAuthentication
+
+PATH = "/api/consultations/stream/"
+
+
+class ConsultationStream:
+    authentication = AsyncJWTAuthentication()
+
+    def __init__(self, application, path=PATH):
+        self.application = application
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.application(scope, receive, send)
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            if request.method != "GET":
+                raise MethodNotAllowed(request.method)
+            async with ThreadSensitiveContext():
+                subscription_scope = await self.authorize(scope, request)
+        except APIException as exc:
+            return await self.send_error(send, exc)
+
+        broker = events.get_broker()
+        subscription = broker.subscribe(subscription_scope)
+        try:
+            streaming = asyncio.create_task(
+                self.stream(send, subscription, self.get_last_event_id(request))
+            )
+            disconnected = asyncio.create_task(self.wait_for_disconnect(receive))
+            done, pending = await asyncio.wait(
+                {streaming, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in pending:
+                task.cancel()
+            if disconnected not in done:
+                streaming.result()
+        finally:
+            subscription.close()
+
+    async def authorize(self, scope, request):
+        """The scope of consultations the caller sees."""
+        # Database work of the request is done here, as in a Django request.
+        await sync_to_async(signals.request_started.send)(
+            sender=self.__class__, scope=scope
+        )
+        try:
+            result = await self.authentication.aauthenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+            subscription_scope = await sync_to_async(caching.get_scope)(result[0])
+            if subscription_scope is None:
+                raise PermissionDenied()
+            return subscription_scope
+        finally:
+            await sync_to_async(signals.request_finished.send)(sender=self.__class__)
+
+    @staticmethod
+    def get_last_event_id(request):
+        return request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+
+    async def stream(self, send, subscription, last_event_id):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_200_OK,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    # Proxies must not buffer the stream.
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        broker, last = subscription.broker, None
+        if last_event_id:
+            for event in await broker.history(last_event_id):
+                if event.type == "reset" or subscription.scope in event.scopes:
+                    await self.send_event(send, event)
+                if event.id is not None:
+                    last = broker.sort_key(event.id)
+
+        while True:
+            event = await subscription.get(settings.EVENT_HEARTBEAT_SECONDS)
+            if event is None:
+                # Keeps proxies from closing an idle connection.
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": b": ping\n\n",
+                        "more_body": True,
+                    }
+                )
+                continue
+            if last is not None and broker.sort_key(event.id) <= last:
+                # Already sent from the history.
+                continue
+            await self.send_event(send, event)
+
+    @staticmethod
+    async def send_event(send, event):
+        await send(
+            {"type": "http.response.body", "body": event.encode(), "more_body": True}
+        )
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def send_error(self, send, exc):
+        detail = exc.detail
+        if not isinstance(detail, (dict, list)):
+            detail = {"detail": detail}
+        headers = [(b"content-type", b"application/json")]
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            value = self.authentication.authenticate_header(request=None)
+            headers.append((b"www-authenticate", value.encode()))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": exc.status_code,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": json.dumps(detail).encode()})
@@ -0,0 +1,126 @@
+"""
+Delta sync of consultations for offline clients.
+
+A sync returns the consultations changed (by ``updated_at``) and the ids of
+those deleted or moved out of the caller's view (by ``ConsultationTombstone``)
+after the positions in the client's token, each walked in ``(timestamp,
+id)`` order on the scoped indexes, plus the token to send next time.
+
+A transaction may commit after a later one, so the positions never move
+past ``CONSULTATION_SYNC_LAG_SECONDS`` ago once a client has caught up:
+changes of the last seconds are sent again and clients apply them by id.
+Tombstones are kept for ``CONSULTATION_TOMBSTONE_DAYS``; older tokens
+get 410 and the client downloads the list again. Archived consultations
+are not tombstoned: they stay on clients as history.
+"""
+
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .exceptions import SyncTokenExpired
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_token(changed, deleted):
+    """The token for the ``(timestamp, id)`` positions of both streams."""
+    values = [(changed[0] - EPOCH) // MICROSECOND, changed[1]]
+    values += [(deleted[0] - EPOCH) // MICROSECOND, deleted[1]]
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_token(token):
+    try:
+        data = urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        changed_at, changed_id, deleted_at, deleted_id = map(int, json.loads(data))
+        return (
+            (EPOCH + changed_at * MICROSECOND, changed_id),
+            (EPOCH + deleted_at * MICROSECOND, deleted_id),
+        )
+    except (TypeError, ValueError, OverflowError, binascii.Error):
+        raise ValidationError({"since": "Invalid sync token."})
+
+
+def read_after(queryset, field, position, columns, limit):
+    """
+    Up to ``limit`` rows after ``position`` in ``(field, id)`` order, and
+    whether there are more.
+    """
+    moment, pk = position
+    rows = list(
+        # The >= gives the planner a range on the (..., field, id) index.
+        queryset.filter(
+            Q(**{f"{field}__gte": moment}),
+            Q(**{f"{field}__gt": moment}) | Q(id__gt=pk),
+        )
+        .order_by(field, "id")
+        .values(*columns)[: limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+def advance(position, rows, field, has_more, horizon):
+    if rows:
+        position = (rows[-1][field], rows[-1]["id"])
+    if not has_more:
+        # Everything up to the horizon has been read. Moving a stream without
+        # new rows up keeps its position inside the tombstone retention.
+        position = (horizon, 0)
+    return position
+
+
+def changes(consultations, tombstones, token, values_serializer):
+    """
+    The sync response for the scoped ``consultations`` and ``tombstones``
+    querysets since ``token`` (``None`` for a first, full sync).
+    """
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settings.CONSULTATION_SYNC_LAG_SECONDS)
+    if token is None:
+        changed_at, deleted_at = (EPOCH, 0), (horizon, 0)
+    else:
+        changed_at, deleted_at = decode_token(token)
+        retention = timedelta(days=settings.CONSULTATION_TOMBSTONE_DAYS)
+        if deleted_at[0] < now - retention:
+            raise SyncTokenExpired()
+
+    limit = settings.CONSULTATION_SYNC_PAGE_SIZE
+    changed, more_changed = read_after(
+        consultations,
+        "updated_at",
+        changed_at,
+        sorted({*values_serializer.get_columns(), "updated_at"}),
+        limit,
+    )
+    deleted, more_deleted = read_after(
+        tombstones,
+        "deleted_at",
+        deleted_at,
+        ["id", "deleted_at", "consultation_id"],
+        limit,
+    )
+
+    ids = list(dict.fromkeys(row["consultation_id"] for row in deleted))
+    if ids:
+        # Gone from view, then back (reassigned again): not deleted.
+        visible = set(consultations.filter(id__in=ids).values_list("id", flat=True))
+        ids = [pk for pk in ids if pk not in visible]
+
+    return {
+        "changed": [values_serializer.to_representation(row) for row in changed],
+        "deleted": ids,
+        "next": encode_token(
+            advance(changed_at, changed, "updated_at", more_changed, horizon),
+            advance(deleted_at, deleted, "deleted_at", more_deleted, horizon),
+        ),
+        "has_more": more_changed or more_deleted,
+    }
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from appointments.authentication import user_cache
+from appointments.models import Clinic, Consultation, Doctor, Patient
+
+User = get_user_model()
+
+PASSWORD = "testpass123"
+START = datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(settings):
+    # The tests run in one process, so the local memory cache is shared.
+    settings.CACHE_SHARED = True
+    # Ids are reused across tests, so cached users must not outlive a test.
+    cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def clinic(db):
+    return Clinic.objects.create(name="Clinic")
+
+
+@pytest.fixture
+def admin(db):
+    return User.objects.create_user(
+        username="root",
+        password=PASSWORD,
+        role="admin",
+        is_staff=True,
+        is_superuser=True,
+    )
+
+
+@pytest.fixture
+def doctor(db):
+    user = User.objects.create_user(
+        username="house",
+        password=PASSWORD,
+        role="doctor",
+        first_name="Gregory",
+        last_name="House",
+    )
+    return Doctor.objects.create(user=user, specialization="Diagnostics")
+
+
+@pytest.fixture
+def patient(db):
+    user = User.objects.create_user(
+        username="jdoe",
+        password=PASSWORD,
+        role="patient",
+        first_name="John",
+        last_name="Doe",
+    )
+    return Patient.objects.create(user=user)
+
+
+@pytest.fixture
+def client_for(db):
+    def _client_for(user):
+        client = APIClient()
+        response = client.post(
+            reverse("token_obtain_pair"),
+            {"username": user.username, "password": PASSWORD},
+            format="json",
+        )
+        assert response.status_code == 200
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    return _client_for
+
+
+@pytest.fixture
+def make_consultation(doctor, patient, clinic):
+    """
+    Create a 30-minute consultation ``hours`` after ``START``; ``fields``
+    override the defaults, e.g. another ``doctor`` or ``status``.
+    """
+
+    def _make_consultation(hours=0, **fields):
+        start = START + timedelta(hours=hours)
+        defaults = {
+            "doctor": doctor,
+            "patient": patient,
+            "clinic": clinic,
+            "start_time": start,
+            "end_time": start + timedelta(minutes=30),
+        }
+        return Consultation.objects.create(**{**defaults, **fields})
+
+    return _make_consultation
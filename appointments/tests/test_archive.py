@@ -0,0 +1,177 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from appointments.models import (
+    ArchivedConsultation,
+    Consultation,
+    ConsultationStat,
+    Patient,
+    User,
+)
+
+OLD = timezone.now().replace(microsecond=0) - timedelta(days=800)
+
+
+def make(doctor, patient, clinic, days, status):
+    start = OLD + timedelta(days=days)
+    return Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        clinic=clinic,
+        status=status,
+        start_time=start,
+        end_time=start + timedelta(minutes=30),
+    )
+
+
+@pytest.fixture
+def other_patient(db):
+    user = User.objects.create_user(
+        username="cuddy", password="testpass123", role="patient"
+    )
+    return Patient.objects.create(user=user)
+
+
+@pytest.fixture
+def consultations(doctor, patient, other_patient, clinic):
+    return {
+        "paid": make(doctor, patient, clinic, 0, "paid"),
+        "completed": make(doctor, other_patient, clinic, 1, "completed"),
+        "confirmed": make(doctor, patient, clinic, 2, "confirmed"),
+        "recent": make(doctor, patient, clinic, 790, "paid"),
+    }
+
+
+def archive(*args):
+    call_command(
+        "archive_consultations", "--older-than-days=365", *args, stdout=StringIO()
+    )
+
+
+def stat_counts():
+    return sorted(ConsultationStat.objects.values_list("status", "count"))
+
+
+@pytest.mark.django_db
+def test_archives_old_terminal_consultations_in_chunks(consultations):
+    paid, completed = consultations["paid"], consultations["completed"]
+    before = stat_counts()
+
+    archive("--chunk-size=1")
+
+    assert set(ArchivedConsultation.objects.values_list("id", flat=True)) == {
+        paid.pk,
+        completed.pk,
+    }
+    assert set(Consultation.objects.values_list("id", flat=True)) == {
+        consultations["confirmed"].pk,
+        consultations["recent"].pk,
+    }
+    archived = ArchivedConsultation.objects.get(pk=paid.pk)
+    assert (archived.created_at, archived.start_time, archived.status) == (
+        paid.created_at,
+        paid.start_time,
+        "paid",
+    )
+    # Archived consultations still count.
+    assert stat_counts() == before
+    call_command("rebuild_consultation_stats", stdout=StringIO())
+    assert stat_counts() == before
+
+
+@pytest.mark.django_db
+def test_archiving_twice_is_a_no_op(consultations):
+    archive()
+    archive()
+
+    assert ArchivedConsultation.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_list_excludes_archived_by_default(client_for, admin, consultations):
+    archive()
+
+    response = client_for(admin).get(reverse("consultation-list"))
+
+    assert {row["id"] for row in response.data["results"]} == {
+        consultations["confirmed"].pk,
+        consultations["recent"].pk,
+    }
+
+
+@pytest.mark.django_db
+def test_include_archived(client_for, admin, consultations):
+    archive()
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    both = client.get(url, {"include_archived": "true", "ordering": "start_time"})
+    only = client.get(url, {"include_archived": "only", "fields": "id,status"})
+
+    assert [(row["id"], row["archived"]) for row in both.data["results"]] == [
+        (consultations["paid"].pk, True),
+        (consultations["completed"].pk, True),
+        (consultations["confirmed"].pk, False),
+        (consultations["recent"].pk, False),
+    ]
+    assert sorted(only.data["results"], key=lambda row: row["id"]) == [
+        {"id": consultations["paid"].pk, "status": "paid", "archived": True},
+        {"id": consultations["completed"].pk, "status": "completed", "archived": True},
+    ]
+
+
+@pytest.mark.django_db
+def test_include_archived_pages_across_both_tables(client_for, admin, consultations):
+    archive()
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    params = {"include_archived": "true", "ordering": "-start_time", "page_size": 1}
+
+    seen, response = [], client.get(url, params)
+    while True:
+        seen += [row["id"] for row in response.data["results"]]
+        if not response.data["next"]:
+            break
+        response = client.get(response.data["next"])
+
+    assert seen == [
+        consultations[name].pk for name in ("recent", "confirmed", "completed", "paid")
+    ]
+
+
+@pytest.mark.django_db
+def test_include_archived_is_scoped_to_user(client_for, patient, consultations):
+    archive()
+
+    response = client_for(patient.user).get(
+        reverse("consultation-list"), {"include_archived": "only"}
+    )
+
+    assert [row["id"] for row in response.data["results"]] == [consultations["paid"].pk]
+
+
+@pytest.mark.django_db
+def test_invalid_include_archived(client_for, admin):
+    response = client_for(admin).get(
+        reverse("consultation-list"), {"include_archived": "yes"}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_archiving_invalidates_cached_lists(client_for, admin, consultations):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    first = client.get(url)
+
+    archive()
+    second = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 200
+    assert len(second.data["results"]) == 2
@@ -0,0 +1,90 @@
+import pytest
+from django.urls import reverse
+
+from appointments.models import Consultation, Patient, User
+
+
+@pytest.fixture
+def consultations(make_consultation):
+    return [make_consultation(hours=i) for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_async_list_matches_sync_lean_list(client_for, admin, consultations):
+    client = client_for(admin)
+    params = {"page_size": 2, "ordering": "start_time", "expand": "doctor"}
+
+    sync = client.get(reverse("consultation-list"), params).json()
+    lean = client.get(reverse("async-consultation-list"), params).json()
+
+    assert lean["results"] == sync["results"]
+    assert [r["id"] for r in lean["results"]] == [c.id for c in consultations[:2]]
+    rest = client.get(lean["next"]).json()
+    assert [r["id"] for r in rest["results"]] == [consultations[2].id]
+
+
+@pytest.mark.django_db
+def test_async_list_is_scoped_and_filtered(client_for, patient, consultations):
+    Consultation.objects.filter(pk=consultations[0].pk).update(status="confirmed")
+    client = client_for(patient.user)
+
+    response = client.get(reverse("async-consultation-list"), {"status": "confirmed"})
+
+    assert [r["id"] for r in response.json()["results"]] == [consultations[0].id]
+
+
+@pytest.mark.django_db
+def test_async_requires_token(client):
+    response = client.get(reverse("async-consultation-list"))
+
+    assert response.status_code == 401
+    assert response["WWW-Authenticate"].startswith("Bearer")
+
+
+@pytest.mark.django_db
+def test_async_retrieve(client_for, admin, patient, consultations):
+    consultation = consultations[0]
+    url = reverse("async-consultation-detail", args=[consultation.pk])
+
+    response = client_for(admin).get(url)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == consultation.pk
+    assert response["ETag"] == consultation.etag
+
+
+@pytest.mark.django_db
+def test_async_retrieve_hides_other_patients(client_for, admin, consultations):
+    other = Patient.objects.create(
+        user=User.objects.create_user(
+            username="other", password="testpass123", role="patient"
+        )
+    )
+    url = reverse("async-consultation-detail", args=[consultations[0].pk])
+
+    assert client_for(other.user).get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_change_status(client_for, admin, consultations):
+    consultation = consultations[0]
+    client = client_for(admin)
+    url = reverse("async-consultation-change-status", args=[consultation.pk])
+
+    response = client.post(
+        url,
+        {"status": "confirmed"},
+        format="json",
+        HTTP_IF_MATCH=consultation.etag,
+    )
+    illegal = client.post(url, {"status": "paid"}, format="json")
+    stale = client.post(
+        url, {"status": "pending"}, format="json", HTTP_IF_MATCH=consultation.etag
+    )
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "confirmed"
+    assert response["ETag"] == Consultation.make_etag(consultation.pk, 2)
+    assert illegal.status_code == 409
+    assert stale.status_code == 412
+    assert Consultation.objects.get(pk=consultation.pk).status == "confirmed"
@@ -0,0 +1,232 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from appointments.authentication import UserCache, user_cache
+from appointments.models import Consultation, Doctor
+
+User = get_user_model()
+
+
+def user_queries(request):
+    table = User._meta.db_table
+    with CaptureQueriesContext(connection) as context:
+        response = request()
+    return response, [
+        q["sql"] for q in context.captured_queries if f'FROM "{table}"' in q["sql"]
+    ]
+
+
+@pytest.mark.django_db
+def test_warm_request_does_not_query_users(client_for, admin):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    _, cold = user_queries(lambda: client.get(url))
+    response, warm = user_queries(lambda: client.get(url))
+
+    assert response.status_code == 200
+    assert len(cold) == 1
+    assert warm == []
+
+
+@pytest.mark.django_db
+def test_async_view_uses_cache(client_for, admin):
+    client = client_for(admin)
+    client.get(reverse("consultation-list"))
+
+    response, queries = user_queries(
+        lambda: client.get(reverse("async-consultation-list"))
+    )
+
+    assert response.status_code == 200
+    assert queries == []
+
+
+@pytest.mark.django_db
+def test_role_change_invalidates_cache(
+    client_for, doctor, django_capture_on_commit_callbacks
+):
+    client = client_for(doctor.user)
+    url = reverse("consultation-stats")
+    assert client.get(url).status_code == 200
+
+    version = doctor.user.get_auth_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        doctor.user.role = "patient"
+        doctor.user.save()
+        # Until the commit, other requests still see the old row.
+        assert user_cache.get(doctor.user.pk, version).role == "doctor"
+
+    assert client.get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_deactivation_invalidates_cache(
+    client_for, admin, django_capture_on_commit_callbacks
+):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    assert client.get(url).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.is_active = False
+        admin.save(update_fields=["is_active"])
+
+    assert client.get(url).status_code == 401
+
+
+@pytest.mark.django_db
+def test_unrelated_update_keeps_cache(client_for, admin):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    client.get(url)
+
+    admin.first_name = "Root"
+    admin.save(update_fields=["first_name"])
+    _, queries = user_queries(lambda: client.get(url))
+
+    assert queries == []
+
+
+def test_local_cache_keeps_most_recently_used(settings):
+    settings.AUTH_USER_CACHE_LOCAL_SIZE = 2
+    local = UserCache()
+
+    local.set_local(1, "v", ())
+    local.set_local(2, "v", ())
+    local.get_local(1, "v")
+    local.set_local(3, "v", ())
+
+    assert list(local.local) == [(1, "v"), (3, "v")]
+
+
+@pytest.mark.django_db
+def test_process_local_cache_is_not_used_as_shared(settings, client_for, admin):
+    settings.CACHE_SHARED = False
+    client = client_for(admin)
+    client.get(reverse("consultation-list"))
+
+    version = admin.get_auth_version()
+    assert cache.get(UserCache.key(admin.pk, version)) is None
+    assert user_cache.get(admin.pk, version) == admin
+    _, queries = user_queries(lambda: client.get(reverse("consultation-list")))
+    assert queries == []
+
+
+@pytest.mark.django_db
+def test_new_tokens_skip_entries_cached_before_an_unsignalled_change(
+    client_for, doctor
+):
+    url = reverse("consultation-stats")
+    assert client_for(doctor.user).get(url).status_code == 200
+
+    User.objects.filter(pk=doctor.user.pk).update(role="patient")
+
+    assert client_for(doctor.user).get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_cache_holds_only_auth_fields(client_for, admin):
+    client_for(admin).get(reverse("consultation-list"))
+
+    values = cache.get(UserCache.key(admin.pk, admin.get_auth_version()))
+    assert admin.password not in values
+    first, second = (
+        user_cache.get(admin.pk, admin.get_auth_version()) for _ in range(2)
+    )
+    assert first is not second
+    assert first.get_deferred_fields() >= {"password", "email", "last_login"}
+    assert (first.pk, first.role, first.is_superuser) == (admin.pk, "admin", True)
+
+
+def login(user):
+    response = APIClient().post(
+        reverse("token_obtain_pair"),
+        {"username": user.username, "password": "testpass123"},
+        format="json",
+    )
+    return response.data
+
+
+@pytest.mark.django_db
+def test_tokens_carry_profile_claims(admin, doctor, patient):
+    tokens = {user.username: login(user) for user in (admin, doctor.user, patient.user)}
+
+    claims = {
+        name: {
+            key: AccessToken(data["access"]).get(key)
+            for key in ("role", "doctor_id", "patient_id")
+        }
+        for name, data in tokens.items()
+    }
+    assert claims == {
+        "root": {"role": "admin", "doctor_id": None, "patient_id": None},
+        "house": {"role": "doctor", "doctor_id": doctor.pk, "patient_id": None},
+        "jdoe": {"role": "patient", "doctor_id": None, "patient_id": patient.pk},
+    }
+
+    response = APIClient().post(
+        reverse("token_refresh"), {"refresh": tokens["house"]["refresh"]}
+    )
+    assert AccessToken(response.data["access"])["doctor_id"] == doctor.pk
+
+
+@pytest.mark.django_db
+def test_scoping_by_claims_needs_no_join(doctor, patient):
+    for user, role in ((doctor.user, "doctor"), (patient.user, "patient")):
+        assert "JOIN" in str(Consultation.objects.for_user(user).query)
+        setattr(user, f"{role}_id", getattr(user, f"{role}_profile").pk)
+        assert "JOIN" not in str(Consultation.objects.for_user(user).query)
+
+
+@pytest.mark.django_db
+def test_scoping_by_claims(client_for, doctor, patient, clinic):
+    start = timezone.now() + timedelta(days=1)
+    other = Doctor.objects.create(
+        user=User.objects.create_user(username="wilson", role="doctor")
+    )
+    for owner in (doctor, other):
+        Consultation.objects.create(
+            doctor=owner,
+            patient=patient,
+            clinic=clinic,
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+        )
+    mine, theirs = Consultation.objects.order_by("pk")
+    client = client_for(doctor.user)
+
+    response = client.get(reverse("consultation-list"))
+    assert [row["id"] for row in response.data["results"]] == [mine.pk]
+    assert client.get(reverse("consultation-detail", args=[mine.pk])).status_code == 200
+    url = reverse("consultation-change-status", args=[theirs.pk])
+    assert client.post(url, {"status": "confirmed"}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_tokens_without_claims_still_work(doctor, patient, clinic):
+    start = timezone.now() + timedelta(days=1)
+    consultation = Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        clinic=clinic,
+        start_time=start,
+        end_time=start + timedelta(minutes=30),
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(patient.user)}"
+    )
+
+    response = client.get(reverse("consultation-list"))
+
+    assert [row["id"] for row in response.data["results"]] == [consultation.pk]
@@ -0,0 +1,95 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments.models import Consultation
+
+
+def item(doctor, patient, clinic=None, hour=10, **extra):
+    data = {
+        "doctor_id": doctor.id,
+        "patient_id": patient.id,
+        "clinic": clinic.id if clinic else None,
+        "start_time": f"2030-01-01T{hour:02}:00:00Z",
+        "end_time": f"2030-01-01T{hour:02}:30:00Z",
+    }
+    data.update(extra)
+    return data
+
+
+@pytest.mark.django_db
+def test_bulk_create_inserts_valid_items(client_for, admin, doctor, patient, clinic):
+    items = [item(doctor, patient, clinic, hour=h) for h in range(8, 18)]
+
+    response = client_for(admin).post(
+        reverse("consultation-bulk-create"), items, format="json"
+    )
+
+    assert response.status_code == 201
+    assert response.data["errors"] == []
+    assert [c["index"] for c in response.data["created"]] == list(range(10))
+    assert set(Consultation.objects.values_list("id", flat=True)) == {
+        c["id"] for c in response.data["created"]
+    }
+
+
+@pytest.mark.django_db
+def test_bulk_create_reports_errors_per_item(client_for, admin, doctor, patient):
+    items = [
+        item(doctor, patient, hour=9),
+        item(doctor, patient, hour=10, end_time="2030-01-01T09:00:00Z"),
+        item(doctor, patient, hour=11, doctor_id=10**6),
+        item(doctor, patient, hour=12, status="unknown"),
+        item(doctor, patient, hour=13),
+    ]
+
+    response = client_for(admin).post(
+        reverse("consultation-bulk-create"), items, format="json"
+    )
+
+    assert response.status_code == 201
+    assert [c["index"] for c in response.data["created"]] == [0, 4]
+    errors = {e["index"]: e["errors"] for e in response.data["errors"]}
+    assert sorted(errors) == [1, 2, 3]
+    assert "doctor_id" in errors[2]
+    assert "status" in errors[3]
+    assert Consultation.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_create_resolves_relations_once_per_model(
+    client_for, admin, doctor, patient, clinic
+):
+    client = client_for(admin)
+    items = [item(doctor, patient, clinic, hour=h) for h in range(8, 18)]
+
+    with CaptureQueriesContext(connection) as context:
+        client.post(reverse("consultation-bulk-create"), items, format="json")
+
+    # auth user, doctors, patients, clinics, insert (+ savepoint statements)
+    selects = [q for q in context.captured_queries if q["sql"].startswith("SELECT")]
+    assert len(selects) == 4
+
+
+@pytest.mark.django_db
+def test_bulk_create_enforces_max_size(client_for, admin, doctor, patient, settings):
+    settings.CONSULTATION_BULK_MAX_SIZE = 2
+
+    response = client_for(admin).post(
+        reverse("consultation-bulk-create"),
+        [item(doctor, patient, hour=h) for h in range(3)],
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert not Consultation.objects.exists()
+
+
+@pytest.mark.django_db
+def test_doctor_cannot_bulk_create(client_for, doctor, patient):
+    response = client_for(doctor.user).post(
+        reverse("consultation-bulk-create"), [item(doctor, patient)], format="json"
+    )
+
+    assert response.status_code == 403
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments import stats
+from appointments.models import Consultation, ConsultationStat, Doctor
+
+User = get_user_model()
+
+
+@pytest.fixture
+def consultations(doctor, patient, clinic):
+    other = Doctor.objects.create(
+        user=User.objects.create_user(username="other", role="doctor")
+    )
+    return [
+        Consultation.objects.create(
+            doctor=d,
+            patient=patient,
+            clinic=clinic,
+            status=s,
+            start_time=f"2030-01-01T{10 + i}:00:00Z",
+            end_time=f"2030-01-01T{10 + i}:30:00Z",
+        )
+        for i, (d, s) in enumerate(
+            [
+                (doctor, "started"),
+                (doctor, "started"),
+                (doctor, "completed"),
+                (other, "started"),
+            ]
+        )
+    ]
+
+
+def post(client, data):
+    return client.post(reverse("consultation-bulk-change-status"), data, format="json")
+
+
+@pytest.mark.django_db
+def test_bulk_status_by_ids_reports_summary(client_for, doctor, consultations):
+    ids = [c.id for c in consultations]
+
+    response = post(client_for(doctor.user), {"status": "completed", "ids": ids})
+
+    assert response.status_code == 200
+    assert response.data == {
+        "updated": ids[:2],
+        "skipped": [ids[2]],
+        "forbidden": [ids[3]],
+    }
+    assert list(
+        Consultation.objects.order_by("id").values_list("status", flat=True)
+    ) == ["completed", "completed", "completed", "started"]
+
+
+@pytest.mark.django_db
+def test_bulk_status_runs_one_select_and_one_update(client_for, admin, consultations):
+    client = client_for(admin)
+
+    with CaptureQueriesContext(connection) as context:
+        post(client, {"status": "paid", "ids": [c.id for c in consultations]})
+
+    statements = [
+        q["sql"].split()[0]
+        for q in context.captured_queries
+        if ConsultationStat._meta.db_table not in q["sql"]
+        and not q["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+    ]
+    # auth user, current statuses, update (statistics are per group, not row)
+    assert statements == ["SELECT", "SELECT", "UPDATE"]
+
+
+def stat_counts():
+    return set(
+        ConsultationStat.objects.exclude(count=0).values_list(
+            "day", "doctor_id", "clinic_id", "status", "count"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_bulk_status_keeps_statistics(client_for, admin, consultations):
+    ids = [c.id for c in consultations]
+
+    response = post(client_for(admin), {"status": "completed", "ids": ids})
+
+    assert response.data["updated"] == [ids[0], ids[1], ids[3]]
+    incremental = stat_counts()
+    stats.rebuild()
+    assert stat_counts() == incremental
+
+
+@pytest.mark.django_db
+def test_bulk_status_by_filter(client_for, admin, doctor, consultations):
+    response = post(
+        client_for(admin),
+        {
+            "status": "completed",
+            "filter": {"doctor__id": doctor.id, "status": "started"},
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.data["updated"] == [consultations[0].id, consultations[1].id]
+    assert Consultation.objects.get(pk=consultations[3].pk).status == "started"
+
+
+@pytest.mark.django_db
+def test_bulk_status_rejects_unknown_filter(client_for, admin, consultations):
+    response = post(client_for(admin), {"status": "paid", "filter": {"doctr": 1}})
+
+    assert response.status_code == 400
+    assert not Consultation.objects.filter(status="paid").exists()
+
+
+@pytest.mark.django_db
+def test_bulk_status_requires_ids_or_filter(client_for, admin):
+    assert post(client_for(admin), {"status": "paid"}).status_code == 400
@@ -0,0 +1,324 @@
+import itertools
+import random
+import threading
+import time
+
+import psycopg2
+import pytest
+from django.db.backends.postgresql import base as postgresql
+
+from mis.db.backends.postgresql_pool import base
+from mis.db.pool import Pool, PoolTimeout
+
+IDLE = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+INTRANS = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+UNKNOWN = psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+
+
+class FakeInfo:
+    transaction_status = IDLE
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        connection = self.connection
+        if sql == "DISCARD ALL":
+            assert connection.autocommit
+            connection.session.clear()
+        else:
+            name, value = sql.removeprefix("SET ").split(" = ")
+            connection.session[name] = value
+
+
+class FakeConnection:
+    ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.closed = 0
+        self.rolled_back = 0
+        self.info = FakeInfo()
+        self.user = None
+        self.autocommit = False
+        self.session = {}
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.rolled_back += 1
+        self.info.transaction_status = IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeServer:
+    def __init__(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def open_connections(self):
+        return [c for c in self.opened if not c.closed]
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def make_pool(server, **options):
+    return Pool(server.connect, reset=base.reset_connection, **options)
+
+
+def test_released_connection_is_reused(server):
+    pool = make_pool(server)
+
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+
+    assert second is first
+    assert len(server.opened) == 1
+    assert pool.stats()["in_use"] == 1
+
+
+def test_fill_opens_min_size(server):
+    pool = make_pool(server, min_size=3, max_size=5)
+
+    pool.fill()
+
+    assert len(server.opened) == 3
+    assert pool.stats()["idle"] == 3
+
+
+def test_open_transaction_is_rolled_back_on_release(server):
+    pool = make_pool(server)
+    connection = pool.acquire()
+    connection.info.transaction_status = INTRANS
+
+    pool.release(connection)
+
+    assert connection.rolled_back == 1
+    assert pool.acquire() is connection
+
+
+def test_session_state_is_reset_on_release(server):
+    pool = make_pool(server)
+    connection = pool.acquire()
+    with connection.cursor() as cursor:
+        cursor.execute("SET statement_timeout = 10")
+
+    pool.release(connection)
+
+    assert pool.acquire() is connection
+    assert connection.session == {}
+    assert connection.autocommit is False
+
+
+def test_broken_connection_is_replaced(server):
+    pool = make_pool(server)
+    connection = pool.acquire()
+    connection.info.transaction_status = UNKNOWN
+
+    pool.release(connection)
+    replacement = pool.acquire()
+
+    assert connection.closed
+    assert replacement is not connection
+    assert pool.stats()["size"] == 1
+
+
+def test_failed_health_check_is_replaced(server):
+    pool = make_pool(
+        server,
+        check=lambda connection: connection is not server.opened[0],
+        check_interval=0,
+    )
+    pool.release(pool.acquire())
+
+    connection = pool.acquire()
+
+    assert server.opened[0].closed
+    assert connection is server.opened[1]
+    assert pool.stats()["failed_checks"] == 1
+
+
+def test_expired_connections_are_closed(server):
+    pool = make_pool(server, max_lifetime=0.01)
+    connection = pool.acquire()
+    time.sleep(0.02)
+
+    pool.release(connection)
+
+    assert connection.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_idle_connections_shrink_to_min_size(server):
+    pool = make_pool(server, min_size=1, max_size=3, max_idle=0)
+    connections = [pool.acquire() for _ in range(3)]
+
+    for connection in connections:
+        pool.release(connection)
+
+    assert len(server.open_connections()) == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_timeout_when_exhausted(server):
+    pool = make_pool(server, max_size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiters_get_released_connections(server):
+    pool = make_pool(server, max_size=1, timeout=5)
+    connection = pool.acquire()
+    threading.Timer(0.05, pool.release, [connection]).start()
+
+    assert pool.acquire() is connection
+
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["wait_ms_max"] >= 40
+
+
+def test_failed_connect_frees_the_slot(server):
+    def connect():
+        raise psycopg2.OperationalError("connection refused")
+
+    pool = Pool(connect, max_size=1)
+
+    for _ in range(2):
+        with pytest.raises(psycopg2.OperationalError):
+            pool.acquire()
+
+    assert pool.stats()["size"] == 0
+
+
+def test_closed_pool_closes_connections_on_release(server):
+    pool = make_pool(server)
+    idle, in_use = pool.acquire(), pool.acquire()
+    pool.release(idle)
+
+    pool.close()
+    pool.release(in_use)
+
+    assert server.open_connections() == []
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+
+def test_connection_churn(server):
+    """Many threads acquiring, breaking and releasing connections."""
+    pool = make_pool(server, min_size=2, max_size=4, timeout=5, max_idle=0.001)
+    lock = threading.Lock()
+    owners, peak, errors = {}, [0], []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(200):
+            connection = pool.acquire()
+            with lock:
+                if connection.id in owners or connection.closed:
+                    errors.append(connection.id)
+                owners[connection.id] = seed
+                peak[0] = max(peak[0], len(owners))
+            if rng.random() < 0.1:
+                connection.info.transaction_status = rng.choice([INTRANS, UNKNOWN])
+            time.sleep(rng.random() / 10000)
+            with lock:
+                del owners[connection.id]
+            pool.release(connection, discard=rng.random() < 0.05)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert errors == []
+    assert peak[0] <= 4
+    assert stats["in_use"] == 0
+    assert stats["acquired"] == 16 * 200
+    assert len(server.open_connections()) == stats["size"] == stats["idle"]
+    assert stats["opened"] - stats["closed"] == stats["size"]
+    assert stats["min_size"] <= stats["size"] <= 4
+
+
+@pytest.fixture
+def wrapper_factory(monkeypatch, server):
+    monkeypatch.setattr(
+        postgresql.DatabaseWrapper,
+        "get_new_connection",
+        lambda self, conn_params: server.connect(),
+    )
+    settings_dict = {
+        "ENGINE": "mis.db.backends.postgresql_pool",
+        "NAME": "mis_db",
+        "USER": "",
+        "PASSWORD": "",
+        "HOST": "",
+        "PORT": "",
+        "OPTIONS": {"pool": {"max_size": 2, "timeout": 0.05}},
+        "TIME_ZONE": None,
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": False,
+        "AUTOCOMMIT": True,
+        "ATOMIC_REQUESTS": False,
+    }
+    yield lambda: base.DatabaseWrapper(settings_dict, alias="pooltest")
+    base.close_pools("pooltest")
+
+
+def open_wrapper(wrapper):
+    wrapper.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+    return wrapper.connection
+
+
+def test_backend_returns_connections_to_the_pool(wrapper_factory, server):
+    first, second = wrapper_factory(), wrapper_factory()
+
+    connection = open_wrapper(first)
+    first.close()
+
+    assert open_wrapper(second) is connection
+    assert "pool" not in first.get_connection_params()
+    assert base.pool_stats()["pooltest"][0]["opened"] == 1
+
+
+def test_backend_discards_connection_closed_in_atomic(wrapper_factory, server):
+    wrapper = wrapper_factory()
+    connection = open_wrapper(wrapper)
+    wrapper.in_atomic_block = True
+
+    wrapper._close()
+
+    assert connection.closed
+
+
+def test_backend_exhausted_pool_is_operational_error(wrapper_factory):
+    for _ in range(2):
+        open_wrapper(wrapper_factory())
+
+    with pytest.raises(psycopg2.OperationalError):
+        open_wrapper(wrapper_factory())
@@ -0,0 +1,155 @@
+from importlib import import_module
+from types import SimpleNamespace
+
+import pytest
+from django.apps import apps
+from django.db import IntegrityError, connection
+from django.urls import reverse
+
+from appointments.models import Consultation, Patient
+
+
+@pytest.fixture
+def booked(doctor, patient):
+    return Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        start_time="2030-01-01T10:00:00Z",
+        end_time="2030-01-01T11:00:00Z",
+    )
+
+
+def book(client, doctor, patient, start, end):
+    return client.post(
+        reverse("consultation-list"),
+        {
+            "doctor_id": doctor.id,
+            "patient_id": patient.id,
+            "start_time": f"2030-01-01T{start}:00Z",
+            "end_time": f"2030-01-01T{end}:00Z",
+        },
+        format="json",
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "start, end", [("10:00", "11:00"), ("10:30", "11:30"), ("09:00", "12:00")]
+)
+def test_overlapping_booking_is_rejected(client_for, patient, booked, start, end):
+    response = book(client_for(patient.user), booked.doctor, patient, start, end)
+
+    assert response.status_code == 409
+    assert response.data["detail"].code == "double_booking"
+    assert Consultation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_adjacent_booking_is_allowed(client_for, patient, booked):
+    response = book(client_for(patient.user), booked.doctor, patient, "11:00", "12:00")
+
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_finished_consultation_does_not_block(client_for, patient, booked):
+    Consultation.objects.filter(pk=booked.pk).update(status="completed")
+
+    response = book(client_for(patient.user), booked.doctor, patient, "10:00", "11:00")
+
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_update_into_overlap_is_rejected(client_for, admin, patient, booked):
+    other = Consultation.objects.create(
+        doctor=booked.doctor,
+        patient=patient,
+        start_time="2030-01-01T12:00:00Z",
+        end_time="2030-01-01T13:00:00Z",
+    )
+
+    response = client_for(admin).patch(
+        reverse("consultation-detail", args=[other.pk]),
+        {"start_time": "2030-01-01T10:30:00Z"},
+        format="json",
+    )
+
+    assert response.status_code == 409
+    other.refresh_from_db()
+    assert other.version == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "field, value",
+    [("end_time", "2030-01-01T09:30:00Z"), ("start_time", "2030-01-01T11:30:00Z")],
+)
+def test_partial_update_checks_time_range_against_stored_bound(
+    client_for, admin, booked, field, value
+):
+    response = client_for(admin).patch(
+        reverse("consultation-detail", args=[booked.pk]),
+        {field: value},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    booked.refresh_from_db()
+    assert booked.version == 1
+
+
+@pytest.mark.django_db
+def test_guard_holds_at_database_level(booked):
+    with pytest.raises(IntegrityError):
+        Consultation.objects.create(
+            doctor=booked.doctor,
+            patient=Patient.objects.get(),
+            start_time="2030-01-01T10:15:00Z",
+            end_time="2030-01-01T10:45:00Z",
+        )
+
+
+@pytest.mark.django_db
+def test_migration_names_existing_overlaps(booked):
+    migration = import_module("appointments.migrations.0005_consultation_no_overlap")
+    # The SQLite schema editor cannot run inside the test's transaction.
+    schema_editor = SimpleNamespace(
+        connection=connection, execute=lambda sql: connection.cursor().execute(sql)
+    )
+    migration.remove_overlap_guard(apps, schema_editor)
+    clash = Consultation.objects.create(
+        doctor=booked.doctor,
+        patient=booked.patient,
+        start_time="2030-01-01T10:30:00Z",
+        end_time="2030-01-01T11:30:00Z",
+    )
+
+    with pytest.raises(IntegrityError, match=f"2 active .*: {booked.pk}, {clash.pk}"):
+        migration.check_existing_overlaps(apps, schema_editor)
+
+    Consultation.objects.filter(pk=clash.pk).update(status="completed")
+    migration.check_existing_overlaps(apps, schema_editor)
+    migration.add_overlap_guard(apps, schema_editor)
+
+
+@pytest.mark.django_db
+def test_bulk_create_rejects_only_overlapping_items(client_for, admin, patient, booked):
+    items = [
+        {
+            "doctor_id": booked.doctor_id,
+            "patient_id": patient.id,
+            "start_time": f"2030-01-01T{hour}:00:00Z",
+            "end_time": f"2030-01-01T{hour}:45:00Z",
+        }
+        for hour in (9, 10, 11, 11)
+    ]
+
+    response = client_for(admin).post(
+        reverse("consultation-bulk-create"), items, format="json"
+    )
+
+    assert response.status_code == 201
+    assert [c["index"] for c in response.data["created"]] == [0, 2]
+    assert [e["index"] for e in response.data["errors"]] == [1, 3]
+    assert Consultation.objects.count() == 3
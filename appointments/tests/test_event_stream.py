@@ -0,0 +1,248 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core import signals
+from django.db import close_old_connections
+
+from appointments import events
+from appointments.models import Doctor, User
+from appointments.streaming import PATH, ConsultationStream
+
+
+@pytest.fixture
+def broker(settings):
+    settings.EVENT_BROKER = "appointments.events.InProcessBroker"
+    events.get_broker.cache_clear()
+    yield events.get_broker()
+    events.get_broker.cache_clear()
+
+
+@pytest.fixture
+def request_signals():
+    # As Django's test client does: the test database connection must
+    # survive the end of the request.
+    signals.request_started.disconnect(close_old_connections)
+    signals.request_finished.disconnect(close_old_connections)
+    yield
+    signals.request_started.connect(close_old_connections)
+    signals.request_finished.connect(close_old_connections)
+
+
+@pytest.fixture
+def token(client_for):
+    def _token(user):
+        return client_for(user)._credentials["HTTP_AUTHORIZATION"].split()[1]
+
+    return _token
+
+
+async def not_found(scope, receive, send):
+    await send({"type": "http.response.start", "status": 404, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+class Stream:
+    """Drives ``ConsultationStream`` the way an ASGI server would."""
+
+    def __init__(self, token=None, method="GET", path=PATH, headers=()):
+        headers = [(name.lower().encode(), value.encode()) for name, value in headers]
+        if token:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "query_string": b"",
+            "headers": headers,
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+
+    async def __aenter__(self):
+        await self.incoming.put({"type": "http.request", "body": b""})
+        self.task = asyncio.create_task(
+            ConsultationStream(not_found)(
+                self.scope, self.incoming.get, self.outgoing.put
+            )
+        )
+        self.start = await self.receive()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.incoming.put({"type": "http.disconnect"})
+        await asyncio.wait_for(self.task, 2)
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outgoing.get(), 2)
+
+    async def next_event(self):
+        body = (await self.receive())["body"].decode()
+        fields = dict(line.split(": ", 1) for line in body.strip().splitlines())
+        if "data" in fields:
+            fields["data"] = json.loads(fields["data"])
+        return fields
+
+
+@pytest.mark.django_db
+def test_stream_is_scoped_to_the_caller(
+    broker,
+    request_signals,
+    token,
+    django_capture_on_commit_callbacks,
+    doctor,
+    make_consultation,
+):
+    other = Doctor.objects.create(
+        user=User.objects.create_user(username="wilson", role="doctor")
+    )
+    doctor_token = token(doctor.user)
+
+    @sync_to_async
+    def write():
+        with django_capture_on_commit_callbacks(execute=True):
+            make_consultation(doctor=other)
+            consultation = make_consultation(1)
+            consultation.transition("confirmed")
+        return consultation
+
+    async def run():
+        async with Stream(doctor_token) as stream:
+            assert stream.start["status"] == 200
+            assert (b"content-type", b"text/event-stream; charset=utf-8") in (
+                stream.start["headers"]
+            )
+            consultation = await write()
+            created = await stream.next_event()
+            changed = await stream.next_event()
+        assert broker.subscriptions == {}
+        return consultation, created, changed
+
+    consultation, created, changed = async_to_sync(run)()
+
+    assert created["event"] == "created"
+    assert created["data"]["id"] == consultation.pk
+    assert created["data"]["doctor_id"] == doctor.pk
+    assert changed["event"] == "status_changed"
+    assert changed["data"]["status"] == "confirmed"
+    assert changed["data"]["previous_status"] == "pending"
+    assert int(changed["id"]) > int(created["id"])
+
+
+@pytest.mark.django_db
+def test_resume_from_last_event_id(broker, request_signals, token, admin):
+    admin_token = token(admin)
+
+    def publish(consultation_id):
+        row = {"id": consultation_id, "doctor_id": 1, "patient_id": 2}
+        broker.publish([events.Event.for_consultation("updated", row)])
+
+    async def run():
+        publish(1)
+        first = broker.events[-1].id
+        publish(2)
+        publish(3)
+        headers = [("Last-Event-ID", str(first))]
+        async with Stream(admin_token, headers=headers) as stream:
+            missed = [await stream.next_event(), await stream.next_event()]
+            publish(4)
+            live = await stream.next_event()
+        headers = [("Last-Event-ID", "1")]
+        async with Stream(admin_token, headers=headers) as stream:
+            reset = await stream.next_event()
+        return missed, live, reset
+
+    missed, live, reset = async_to_sync(run)()
+
+    assert [event["data"]["id"] for event in missed] == [2, 3]
+    assert live["data"]["id"] == 4
+    # Events before the first kept one are lost: reload.
+    assert reset["event"] == "reset"
+    assert reset["id"] == live["id"]
+
+
+@pytest.mark.django_db
+def test_heartbeat(broker, request_signals, token, settings, patient):
+    settings.EVENT_HEARTBEAT_SECONDS = 0.01
+    patient_token = token(patient.user)
+
+    async def run():
+        async with Stream(patient_token) as stream:
+            return await stream.receive()
+
+    assert async_to_sync(run)()["body"] == b": ping\n\n"
+
+
+@pytest.mark.django_db
+def test_stream_requires_authentication(broker, request_signals):
+    async def run():
+        async with Stream() as stream:
+            body = await stream.receive()
+        return stream.start, body
+
+    start, body = async_to_sync(run)()
+
+    assert start["status"] == 401
+    assert json.loads(body["body"])["detail"]
+    assert broker.subscriptions == {}
+
+
+@pytest.mark.django_db
+def test_other_requests_pass_through(broker, request_signals, token, admin):
+    admin_token = token(admin)
+
+    async def run():
+        async with Stream(admin_token, method="POST") as stream:
+            post = stream.start
+        async with Stream(admin_token, path="/api/consultations/") as stream:
+            other = stream.start
+        return post, other
+
+    post, other = async_to_sync(run)()
+
+    assert post["status"] == 405
+    assert other["status"] == 404
+
+
+def test_slow_subscriber_gets_reset(settings):
+    settings.EVENT_QUEUE_SIZE = 3
+    broker = events.InProcessBroker()
+
+    async def run():
+        subscription = broker.subscribe(("doctor", 1))
+        for consultation_id in range(5):
+            row = {"id": consultation_id, "doctor_id": 1, "patient_id": 2}
+            broker.publish([events.Event.for_consultation("updated", row)])
+        # Let the deliveries scheduled on the loop run.
+        await asyncio.sleep(0)
+        received = [await subscription.get(0.1) for _ in range(3)]
+        subscription.close()
+        return received
+
+    received = asyncio.run(run())
+
+    reset, event, nothing = received
+    # Events 0-2 filled the queue, 3 made it overflow.
+    assert reset.type == "reset"
+    assert reset.id == broker.events[3].id
+    assert json.loads(event.data)["id"] == 4
+    assert nothing is None
+    assert broker.subscriptions == {}
+
+
+def test_incomplete_broker_cannot_be_created():
+    class NoHistory(events.Broker):
+        def publish(self, events):
+            pass
+
+        def sort_key(self, event_id):
+            return int(event_id)
+
+    with pytest.raises(TypeError, match="history"):
+        NoHistory()
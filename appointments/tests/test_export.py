@@ -0,0 +1,132 @@
+import csv
+import sys
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from appointments import archive
+from appointments.models import Clinic, Consultation
+from conftest import START
+
+
+@pytest.fixture
+def consultations(make_consultation, clinic):
+    other = Clinic.objects.create(name="Other")
+    return [
+        make_consultation(hours=24 * i, clinic=clinic if i % 2 else other)
+        for i in range(5)
+    ]
+
+
+def export(path, *args):
+    call_command("export_consultations", str(path), *args, stdout=StringIO())
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.django_db
+def test_export_writes_all_rows_in_chunks(tmp_path, consultations):
+    rows = export(tmp_path / "out.csv", "--chunk-size", "2")
+
+    assert [int(row["id"]) for row in rows] == [c.id for c in consultations]
+    assert rows[0]["start_time"] == "2030-01-01T09:00:00+00:00"
+    assert not list(tmp_path.glob("*.part"))
+
+
+@pytest.mark.django_db
+def test_export_includes_archived_rows(tmp_path, consultations):
+    for consultation in consultations[:2]:
+        consultation.status = "paid"
+        consultation.save()
+    list(archive.archive(START + timedelta(days=30)))
+
+    rows = export(tmp_path / "out.csv")
+
+    assert sorted(int(row["id"]) for row in rows) == [c.id for c in consultations]
+    assert Consultation.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_export_filters(tmp_path, consultations, clinic):
+    rows = export(
+        tmp_path / "out.csv",
+        "--date-from",
+        "2030-01-02",
+        "--date-to",
+        "2030-01-04",
+        "--clinic",
+        str(clinic.id),
+    )
+
+    assert [int(row["id"]) for row in rows] == [
+        consultations[1].id,
+        consultations[3].id,
+    ]
+
+
+@pytest.mark.django_db
+def test_export_since_watermark(tmp_path, settings, consultations, make_consultation):
+    settings.CONSULTATION_SYNC_LAG_SECONDS = 0
+    watermark = tmp_path / "watermark.json"
+
+    first = export(tmp_path / "1.csv", "--watermark", str(watermark))
+    again = export(tmp_path / "2.csv", "--watermark", str(watermark))
+    added = make_consultation(hours=1)
+    last = export(tmp_path / "3.csv", "--watermark", str(watermark))
+
+    assert len(first) == 5
+    assert again == []
+    assert [int(row["id"]) for row in last] == [added.id]
+
+
+@pytest.mark.django_db
+def test_export_since_watermark_includes_changed_rows(
+    tmp_path, settings, consultations
+):
+    settings.CONSULTATION_SYNC_LAG_SECONDS = 0
+    watermark = tmp_path / "watermark.json"
+    export(tmp_path / "1.csv", "--watermark", str(watermark))
+
+    consultations[1].transition("confirmed")
+    rows = export(tmp_path / "2.csv", "--watermark", str(watermark))
+
+    assert [(int(row["id"]), row["status"]) for row in rows] == [
+        (consultations[1].id, "confirmed")
+    ]
+
+
+@pytest.mark.django_db
+def test_export_watermark_stays_behind_late_commits(tmp_path, consultations):
+    watermark = tmp_path / "watermark.json"
+
+    export(tmp_path / "1.csv", "--watermark", str(watermark))
+    again = export(tmp_path / "2.csv", "--watermark", str(watermark))
+
+    # Written in the last CONSULTATION_SYNC_LAG_SECONDS: exported again.
+    assert [int(row["id"]) for row in again] == [c.id for c in consultations]
+
+
+@pytest.mark.django_db
+def test_parquet_requires_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    with pytest.raises(CommandError, match="parquet extra"):
+        call_command("export_consultations", str(tmp_path / "out.parquet"))
+
+
+@pytest.mark.django_db
+def test_parquet_export(tmp_path, consultations):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    call_command(
+        "export_consultations",
+        str(tmp_path / "out.parquet"),
+        "--chunk-size",
+        "2",
+        stdout=StringIO(),
+    )
+
+    table = pq.read_table(tmp_path / "out.parquet")
+    assert table.column("id").to_pylist() == [c.id for c in consultations]
@@ -0,0 +1,125 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments.models import Consultation, Doctor
+from appointments.slots import free_slots, slot_grid, working_windows
+
+User = get_user_model()
+
+HALF_HOUR = timedelta(minutes=30)
+
+
+def at(hour, minute=0, day=1):
+    return datetime(2030, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+def grid(start, end, not_before=None):
+    windows = working_windows(date(2030, 1, 1), date(2030, 1, 1), start, end)
+    return slot_grid(windows, HALF_HOUR, not_before=not_before)
+
+
+def test_free_slots_skip_busy_intervals():
+    slots = free_slots([(at(9, 10), at(9, 40))], grid(time(9), time(11)))
+
+    assert slots == [(at(10), at(10, 30)), (at(10, 30), at(11))]
+
+
+def test_free_slots_merge_overlapping_busy_intervals():
+    busy = [(at(9), at(10)), (at(9, 30), at(10, 15)), (at(10, 20), at(10, 25))]
+
+    slots = free_slots(busy, grid(time(9), time(11, 30)))
+
+    assert slots == [(at(10, 30), at(11)), (at(11), at(11, 30))]
+
+
+def test_free_slots_start_after_not_before():
+    slots = free_slots([], grid(time(9), time(11), not_before=at(10, 5)))
+
+    assert slots == [(at(10, 30), at(11))]
+
+
+@pytest.mark.django_db
+def test_free_slots_for_doctor(client_for, patient, doctor):
+    Consultation.objects.create(
+        doctor=doctor, patient=patient, start_time=at(9), end_time=at(10)
+    )
+    Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        start_time=at(10),
+        end_time=at(10, 30),
+        status="completed",
+    )
+
+    response = client_for(patient.user).get(
+        reverse("consultation-free-slots"),
+        {
+            "doctor": doctor.id,
+            "date_from": "2030-01-01",
+            "date_to": "2030-01-01",
+            "day_start": "09:00",
+            "day_end": "11:00",
+            "duration": 30,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.data["doctors"] == [
+        {
+            "doctor": doctor.id,
+            "slots": [
+                {"start": "2030-01-01T10:00:00Z", "end": "2030-01-01T10:30:00Z"},
+                {"start": "2030-01-01T10:30:00Z", "end": "2030-01-01T11:00:00Z"},
+            ],
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_free_slots_for_clinic_reads_intervals_once(client_for, patient, clinic):
+    doctors = []
+    for n in range(5):
+        user = User.objects.create_user(username=f"doc{n}", role="doctor")
+        doctors.append(Doctor.objects.create(user=user))
+        doctors[-1].clinics.add(clinic)
+        Consultation.objects.create(
+            doctor=doctors[-1],
+            patient=patient,
+            start_time=at(9 + n, day=2),
+            end_time=at(10 + n, day=2),
+        )
+    client = client_for(patient.user)
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(
+            reverse("consultation-free-slots"),
+            {"clinic": clinic.id, "date_from": "2030-01-01", "date_to": "2030-01-07"},
+        )
+
+    assert response.status_code == 200
+    # auth user, clinic doctors, busy intervals
+    assert len(context.captured_queries) == 3
+    assert [d["doctor"] for d in response.data["doctors"]] == [d.id for d in doctors]
+    # 7 days * 18 half-hour slots, minus one booked hour (two slots) each
+    assert all(len(d["slots"]) == 7 * 18 - 2 for d in response.data["doctors"])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"date_from": "2030-01-01", "date_to": "2030-01-02"},
+        {"doctor": 1, "clinic": 1, "date_from": "2030-01-01", "date_to": "2030-01-02"},
+        {"doctor": 1, "date_from": "2030-01-02", "date_to": "2030-01-01"},
+        {"doctor": 1, "date_from": "2030-01-01", "date_to": "2031-01-01"},
+    ],
+)
+def test_free_slots_validates_params(client_for, patient, params):
+    response = client_for(patient.user).get(reverse("consultation-free-slots"), params)
+
+    assert response.status_code == 400
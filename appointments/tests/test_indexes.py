@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+
+from appointments import export
+from appointments.models import Consultation
+from appointments.views import ConsultationViewSet
+from conftest import START
+
+
+@pytest.fixture
+def consultations(make_consultation):
+    for i in range(50):
+        make_consultation(hours=i, status=Consultation.STATUS_CHOICES[i % 5][0])
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE appointments_consultation")
+            # A 50-row table is always cheaper to scan sequentially.
+            cursor.execute("SET enable_seqscan = off")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "lookup, ordering, index",
+    [
+        ("doctor", ("-created_at", "-id"), "consult_doctor_created_idx"),
+        ("doctor", ("start_time", "id"), "consult_doctor_start_idx"),
+        ("patient", ("-created_at", "-id"), "consult_patient_created_idx"),
+        ("patient", ("start_time", "id"), "consult_patient_start_idx"),
+        ("clinic", ("-created_at", "-id"), "consult_clinic_created_idx"),
+        ("doctor", ("updated_at", "id"), "consult_doctor_updated_idx"),
+        ("patient", ("updated_at", "id"), "consult_patient_updated_idx"),
+    ],
+)
+def test_scoped_list_uses_composite_index(
+    consultations, doctor, patient, clinic, lookup, ordering, index
+):
+    value = {"doctor": doctor, "patient": patient, "clinic": clinic}[lookup]
+    queryset = ConsultationViewSet.queryset.filter(**{lookup: value}).order_by(
+        *ordering
+    )
+
+    assert index in queryset[:51].explain()
+
+
+@pytest.mark.django_db
+def test_status_filter_uses_composite_index(consultations):
+    queryset = ConsultationViewSet.queryset.filter(status="pending").order_by(
+        "-created_at", "-id"
+    )
+
+    assert "consult_status_created_idx" in queryset[:51].explain()
+
+
+@pytest.mark.django_db
+def test_admin_list_uses_ordering_index(consultations):
+    queryset = ConsultationViewSet.queryset.order_by("-created_at", "-id")
+
+    assert "consult_created_idx" in queryset[:51].explain()
+
+
+@pytest.mark.django_db
+def test_incremental_export_uses_updated_indexes(consultations):
+    plan = export.export_queryset(since=(START, 0)).explain()
+
+    assert "consult_updated_idx" in plan
+    assert "archive_updated_idx" in plan
+
+
+@pytest.mark.django_db
+def test_active_schedule_uses_partial_index(consultations, doctor):
+    # SQLite only matches a partial index against literal predicates, so the
+    # status list is inlined rather than bound as parameters.
+    prefix = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            {prefix} SELECT start_time, end_time FROM appointments_consultation
+            WHERE doctor_id = %s
+              AND status IN ('pending', 'confirmed', 'started')
+              AND start_time < %s AND end_time > %s
+            """,
+            [doctor.pk, START + timedelta(days=1), START],
+        )
+        plan = " ".join(str(col) for row in cursor.fetchall() for col in row)
+
+    assert "consult_doctor_active_idx" in plan
+
+
+def test_partial_conditions_use_active_statuses():
+    meta = Consultation._meta
+    conditions = [
+        item.condition
+        for item in [*meta.indexes, *meta.constraints]
+        if item.condition is not None
+    ]
+
+    assert conditions
+    assert all(
+        condition.children == [("status__in", list(Consultation.ACTIVE_STATUSES))]
+        for condition in conditions
+    )
+    assert Consultation.ACTIVE_STATUSES == (
+        Consultation.STATUS_PENDING,
+        Consultation.STATUS_CONFIRMED,
+        Consultation.STATUS_STARTED,
+    )
@@ -0,0 +1,82 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.utils import timezone
+
+from appointments.models import (
+    Clinic,
+    Consultation,
+    ConsultationStat,
+    Doctor,
+    Patient,
+    User,
+)
+
+
+def generate(*args):
+    call_command(
+        "generate_load_data",
+        "--clinics=2",
+        "--doctors=3",
+        "--patients=5",
+        "--consultations=200",
+        "--days=30",
+        "--batch-size=64",
+        *args,
+        stdout=StringIO(),
+    )
+
+
+@pytest.mark.django_db
+def test_generates_requested_volume():
+    generate()
+
+    assert Clinic.objects.count() == 2
+    assert Doctor.objects.count() == 3
+    assert Patient.objects.count() == 5
+    assert Consultation.objects.count() == 200
+    assert ConsultationStat.objects.aggregate(total=Sum("count"))["total"] == 200
+    patient = Patient.objects.select_related("user").first()
+    assert patient.search_name == patient.user.get_search_name()
+    assert User.objects.get(username="load_doctor_0").check_password("loadtest")
+
+
+@pytest.mark.django_db
+def test_consultations_are_realistic():
+    generate()
+
+    now = timezone.now()
+    for consultation in Consultation.objects.all():
+        assert consultation.created_at <= consultation.start_time
+        assert consultation.created_at <= consultation.updated_at <= now
+        if consultation.end_time <= now:
+            assert consultation.updated_at == consultation.end_time
+        assert consultation.clinic.doctors.filter(pk=consultation.doctor_id).exists()
+    assert set(Consultation.objects.values_list("status", flat=True)) <= {
+        status for status, _ in Consultation.STATUS_CHOICES
+    }
+
+
+@pytest.mark.django_db
+def test_seed_is_deterministic():
+    def snapshot(prefix):
+        generate(f"--prefix={prefix}", "--seed=7")
+        rows = Consultation.objects.filter(doctor__user__username__startswith=prefix)
+        return list(rows.order_by("id").values_list("start_time", "status"))
+
+    assert snapshot("a") == snapshot("b")
+
+
+@pytest.mark.django_db
+def test_rejects_more_consultations_than_slots():
+    with pytest.raises(CommandError, match="free slots"):
+        generate("--consultations=100000")
+
+
+@pytest.mark.django_db
+def test_rejects_negative_consultations():
+    with pytest.raises(CommandError, match="must not be negative"):
+        generate("--consultations=-1")
+    assert not User.objects.exists()
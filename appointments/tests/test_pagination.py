@@ -0,0 +1,159 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments.models import Consultation
+from appointments.pagination import ConsultationCursorPagination
+
+
+@pytest.fixture
+def consultations(make_consultation):
+    # Repeated start times; completed so the double-booking guard allows it.
+    return [make_consultation(hours=i % 3, status="completed") for i in range(7)]
+
+
+def walk(client, url, **params):
+    ids, response = [], client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        ids.extend(row["id"] for row in response.data["results"])
+        if not response.data["next"]:
+            return ids, response
+        response = client.get(response.data["next"])
+
+
+@pytest.mark.django_db
+def test_list_is_paginated_without_count(client_for, admin, consultations):
+    response = client_for(admin).get(reverse("consultation-list"), {"page_size": 3})
+
+    assert response.status_code == 200
+    assert "count" not in response.data
+    assert response.data["has_next"] is True
+    assert len(response.data["results"]) == 3
+    assert response.data["previous"] is None
+    assert response.data["next"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ordering", ["-created_at", "start_time", "-start_time"])
+def test_cursor_walk_visits_each_row_once(client_for, admin, consultations, ordering):
+    ids, _ = walk(
+        client_for(admin),
+        reverse("consultation-list"),
+        page_size=2,
+        ordering=ordering,
+    )
+
+    field = ordering.lstrip("-")
+    expected = sorted(
+        consultations,
+        key=lambda c: (getattr(c, field), c.id),
+        reverse=ordering.startswith("-"),
+    )
+    assert ids == [c.id for c in expected]
+
+
+@pytest.mark.django_db
+def test_previous_link_returns_preceding_page(client_for, admin, consultations):
+    client = client_for(admin)
+    first = client.get(reverse("consultation-list"), {"page_size": 3})
+    second = client.get(first.data["next"])
+    back = client.get(second.data["previous"])
+
+    assert [r["id"] for r in back.data["results"]] == [
+        r["id"] for r in first.data["results"]
+    ]
+    assert back.data["previous"] is None
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(client_for, admin, consultations, monkeypatch):
+    monkeypatch.setattr(ConsultationCursorPagination, "max_page_size", 4)
+
+    response = client_for(admin).get(reverse("consultation-list"), {"page_size": 100})
+
+    assert len(response.data["results"]) == 4
+
+
+@pytest.mark.django_db
+def test_pagination_respects_filters(client_for, admin, consultations):
+    Consultation.objects.filter(pk=consultations[0].pk).update(status="confirmed")
+
+    ids, _ = walk(
+        client_for(admin), reverse("consultation-list"), page_size=1, status="confirmed"
+    )
+
+    assert ids == [consultations[0].id]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_returns_404(client_for, admin):
+    response = client_for(admin).get(reverse("consultation-list"), {"cursor": "junk"})
+
+    assert response.status_code == 404
+
+
+def consultation_counts(client, **params):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse("consultation-list"), params)
+    counts = [
+        q["sql"]
+        for q in context.captured_queries
+        if "COUNT(" in q["sql"] and 'FROM "appointments_consultation"' in q["sql"]
+    ]
+    return response, counts
+
+
+@pytest.mark.django_db
+def test_exact_count(client_for, admin, consultations):
+    Consultation.objects.filter(pk=consultations[0].pk).update(status="confirmed")
+
+    response, counts = consultation_counts(
+        client_for(admin), count="exact", status="completed", page_size=2
+    )
+
+    assert response.data["count"] == 6
+    assert len(counts) == 1
+
+
+@pytest.mark.django_db
+def test_estimated_count_from_statistics(client_for, doctor, admin, consultations):
+    client = client_for(admin)
+
+    response, counts = consultation_counts(client, count="estimate")
+    filtered, _ = consultation_counts(
+        client, count="estimate", status="confirmed", doctor__id=doctor.pk
+    )
+
+    assert response.data["count"] == 7
+    assert counts == []
+    assert filtered.data["count"] == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("params", [{"search": "doe"}, {"patient__id": 1}])
+def test_estimate_falls_back_to_counting(client_for, admin, consultations, params):
+    response, counts = consultation_counts(
+        client_for(admin), count="estimate", **params
+    )
+
+    assert response.data["count"] == 7
+    assert len(counts) == 1
+
+
+@pytest.mark.django_db
+def test_async_list_count(client_for, patient, consultations):
+    response = client_for(patient.user).get(
+        reverse("async-consultation-list"), {"count": "estimate", "page_size": 7}
+    )
+
+    assert response.json()["count"] == 7
+    assert response.json()["has_next"] is False
+
+
+@pytest.mark.django_db
+def test_invalid_count_mode(client_for, admin):
+    response = client_for(admin).get(reverse("consultation-list"), {"count": "all"})
+
+    assert response.status_code == 400
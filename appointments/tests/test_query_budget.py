@@ -0,0 +1,143 @@
+"""
+Query budgets: the number of queries an endpoint runs must not depend on
+how many rows, doctors or clinics it touches.
+"""
+
+import itertools
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments.models import Clinic, Doctor
+
+User = get_user_model()
+
+_seq = itertools.count()
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(settings):
+    # Budgets are about building responses, not serving cached ones.
+    settings.CONSULTATION_CACHE_TTL = 0
+
+
+@pytest.fixture
+def add_consultations(make_consultation):
+    def _add_consultations(count):
+        created = []
+        for _ in range(count):
+            n = next(_seq)
+            user = User.objects.create_user(
+                username=f"doctor{n}", role="doctor", last_name=f"Doctor{n}"
+            )
+            doctor = Doctor.objects.create(user=user)
+            doctor.clinics.add(
+                *(Clinic.objects.create(name=f"C{n}-{i}") for i in range(2))
+            )
+            created.append(
+                make_consultation(n, doctor=doctor, clinic=doctor.clinics.first())
+            )
+        return created
+
+    return _add_consultations
+
+
+def count_queries(request):
+    with CaptureQueriesContext(connection) as context:
+        response = request()
+    assert response.status_code < 300, response.data
+    # Savepoints only show up because each test runs inside a transaction.
+    return sum(
+        not q["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        for q in context.captured_queries
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"status": "pending"},
+        {"search": "doctor"},
+        {"ordering": "start_time"},
+        {"fields": "id,doctor", "expand": "doctor,patient"},
+    ],
+)
+def test_list_query_count_is_constant(client_for, admin, add_consultations, params):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    add_consultations(1)
+    client.get(url, params)  # warm the authentication cache
+    small = count_queries(lambda: client.get(url, params))
+    add_consultations(10)
+    large = count_queries(lambda: client.get(url, params))
+
+    assert small == large
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ["admin", "patient"])
+def test_scoped_list_query_count_is_constant(
+    client_for, admin, patient, add_consultations, role
+):
+    client = client_for(admin if role == "admin" else patient.user)
+    url = reverse("consultation-list")
+
+    add_consultations(1)
+    client.get(url)  # warm the authentication cache
+    small = count_queries(lambda: client.get(url))
+    add_consultations(10)
+
+    assert count_queries(lambda: client.get(url)) == small
+
+
+@pytest.mark.django_db
+def test_retrieve_query_budget(client_for, admin, add_consultations):
+    client = client_for(admin)
+    consultation = add_consultations(1)[0]
+    consultation.doctor.clinics.add(
+        *(Clinic.objects.create(name=str(i)) for i in range(5))
+    )
+    url = reverse("consultation-detail", args=[consultation.pk])
+
+    # auth user + consultation with joins + doctor clinics
+    assert count_queries(lambda: client.get(url)) <= 3
+
+
+@pytest.mark.django_db
+def test_change_status_query_budget(client_for, admin, add_consultations):
+    client = client_for(admin)
+    consultation = add_consultations(1)[0]
+    url = reverse("consultation-change-status", args=[consultation.pk])
+
+    queries = count_queries(lambda: client.post(url, {"status": "confirmed"}))
+
+    # 4 for the status change itself, then statistics: decrement the old
+    # group, increment (or insert) the new one
+    assert queries <= 7
+
+
+@pytest.mark.django_db
+def test_create_query_budget(client_for, patient, clinic, add_consultations):
+    doctor = add_consultations(1)[0].doctor
+    client = client_for(patient.user)
+    data = {
+        "doctor_id": doctor.id,
+        "patient_id": patient.id,
+        "clinic": clinic.id,
+        "start_time": "2031-01-01T10:00:00Z",
+        "end_time": "2031-01-01T11:00:00Z",
+    }
+
+    queries = count_queries(
+        lambda: client.post(reverse("consultation-list"), data, format="json")
+    )
+
+    # auth user, doctor (+ clinics), patient, clinic, insert,
+    # statistics update (or insert)
+    assert queries <= 8
@@ -0,0 +1,170 @@
+import pytest
+from django.db import transaction
+from django.urls import reverse
+
+from appointments.models import Consultation
+from mis.db import routers
+
+
+@pytest.fixture
+def consultation(make_consultation):
+    return make_consultation()
+
+
+@pytest.fixture
+def replica_reads(settings, monkeypatch):
+    """
+    Record, for every read of a consultation, whether it went to a replica.
+    The only local database stands in for the replica.
+    """
+    settings.DATABASE_REPLICAS = ["default"]
+    reads = []
+    db_for_read = routers.PrimaryReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        if model is Consultation:
+            reads.append(routers.reading_from_replica())
+        return db_for_read(self, model, **hints)
+
+    monkeypatch.setattr(routers.PrimaryReplicaRouter, "db_for_read", spy)
+    return reads
+
+
+def test_router_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    router = routers.PrimaryReplicaRouter()
+
+    with routers.replica_reads():
+        assert router.db_for_read(Consultation) == "default"
+
+
+def test_router_without_shared_cache(settings):
+    # Pins in a process-local cache would not reach the other workers.
+    settings.DATABASE_REPLICAS = ["replica1"]
+    settings.CACHE_SHARED = False
+    router = routers.PrimaryReplicaRouter()
+
+    with routers.replica_reads():
+        assert router.db_for_read(Consultation) == "default"
+
+
+@pytest.mark.django_db
+def test_no_replica_reads_without_shared_cache(
+    client_for, admin, consultation, replica_reads, settings
+):
+    settings.CACHE_SHARED = False
+
+    client_for(admin).get(reverse("consultation-list"))
+
+    assert replica_reads and not any(replica_reads)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_router(settings):
+    settings.DATABASE_REPLICAS = ["replica1", "replica2"]
+    router = routers.PrimaryReplicaRouter()
+
+    assert router.db_for_read(Consultation) == "default"
+    with routers.replica_reads():
+        assert router.db_for_read(Consultation) in ["replica1", "replica2"]
+        assert router.db_for_write(Consultation) == "default"
+        with transaction.atomic():
+            assert router.db_for_read(Consultation) == "default"
+    assert router.db_for_read(Consultation) == "default"
+
+
+@pytest.mark.django_db
+def test_list_and_retrieve_read_from_replica(
+    client_for, admin, consultation, replica_reads
+):
+    client = client_for(admin)
+
+    client.get(reverse("consultation-list"))
+    client.get(reverse("consultation-detail", args=[consultation.pk]))
+
+    assert replica_reads and all(replica_reads)
+
+
+@pytest.mark.django_db
+def test_writes_use_primary(client_for, admin, consultation, replica_reads):
+    client = client_for(admin)
+
+    response = client.post(
+        reverse("consultation-change-status", args=[consultation.pk]),
+        {"status": "confirmed"},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert replica_reads and not any(replica_reads)
+
+
+@pytest.mark.django_db
+def test_writer_is_pinned_to_primary(
+    client_for, doctor, admin, consultation, replica_reads
+):
+    writer, other = client_for(doctor.user), client_for(admin)
+    writer.post(
+        reverse("consultation-change-status", args=[consultation.pk]),
+        {"status": "confirmed"},
+        format="json",
+    )
+
+    replica_reads.clear()
+    response = writer.get(reverse("consultation-list"))
+    assert response.data["results"][0]["status"] == "confirmed"
+    assert not any(replica_reads)
+
+    replica_reads.clear()
+    other.get(reverse("consultation-list"))
+    assert all(replica_reads)
+
+
+@pytest.mark.django_db
+def test_pin_expires(client_for, doctor, consultation, replica_reads, settings):
+    settings.REPLICA_PIN_SECONDS = 0
+    client = client_for(doctor.user)
+    client.post(
+        reverse("consultation-change-status", args=[consultation.pk]),
+        {"status": "confirmed"},
+        format="json",
+    )
+
+    replica_reads.clear()
+    client.get(reverse("consultation-list"))
+
+    assert all(replica_reads)
+
+
+@pytest.mark.django_db
+def test_async_list_reads_from_replica_unless_pinned(
+    client_for, doctor, consultation, replica_reads
+):
+    client = client_for(doctor.user)
+
+    client.get(reverse("async-consultation-list"))
+    assert replica_reads and all(replica_reads)
+
+    client.post(
+        reverse("async-consultation-change-status", args=[consultation.pk]),
+        {"status": "confirmed"},
+        format="json",
+    )
+    replica_reads.clear()
+    client.get(reverse("async-consultation-detail", args=[consultation.pk]))
+    assert replica_reads and not any(replica_reads)
+
+
+@pytest.mark.django_db
+def test_fresh_replica_reads_are_not_cached(
+    client_for, admin, consultation, replica_reads, settings
+):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    fresh = client.get(url)
+    settings.REPLICA_PIN_SECONDS = 0
+    settled = client.get(url)
+
+    assert not fresh.has_header("ETag")
+    assert settled.has_header("ETag")
@@ -0,0 +1,149 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments.models import Doctor, User
+
+
+@pytest.fixture
+def other_doctor(db):
+    user = User.objects.create_user(
+        username="wilson", password="testpass123", role="doctor"
+    )
+    return Doctor.objects.create(user=user, specialization="Oncology")
+
+
+@pytest.fixture
+def consultation(make_consultation):
+    return make_consultation()
+
+
+def get(client, url, **headers):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, **headers)
+    return response, len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_unchanged_list_is_not_modified(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    second, queries = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second["ETag"] == first["ETag"]
+    assert queries == 0
+
+
+@pytest.mark.django_db
+def test_cached_list_is_served_without_queries(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    second, queries = get(client, url)
+
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert queries == 0
+
+
+@pytest.mark.django_db
+def test_process_local_cache_is_not_used(settings, client_for, admin, consultation):
+    settings.CACHE_SHARED = False
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    get(client, url)
+
+    response, queries = get(client, url, HTTP_IF_NONE_MATCH="*")
+
+    assert response.status_code == 200
+    assert "ETag" not in response
+    assert queries > 0
+
+
+@pytest.mark.django_db
+def test_if_modified_since(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    second, _ = get(client, url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+    assert second.status_code == 304
+
+
+@pytest.mark.django_db
+def test_consultation_change_invalidates(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    consultation.transition("confirmed")
+    second, _ = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 200
+    assert second["ETag"] != first["ETag"]
+    assert second.data["results"][0]["status"] == "confirmed"
+
+
+@pytest.mark.django_db
+def test_other_doctors_changes_keep_cache(
+    client_for, doctor, other_doctor, consultation, make_consultation
+):
+    client = client_for(doctor.user)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    make_consultation(doctor=other_doctor, clinic=None)
+    second, _ = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 304
+
+
+@pytest.mark.django_db
+def test_scopes_are_not_shared(client_for, doctor, other_doctor, consultation):
+    url = reverse("consultation-list")
+
+    own, _ = get(client_for(doctor.user), url)
+    other, _ = get(client_for(other_doctor.user), url)
+
+    assert [row["id"] for row in own.data["results"]] == [consultation.id]
+    assert other.data["results"] == []
+
+
+@pytest.mark.django_db
+def test_doctor_rename_invalidates(client_for, patient, doctor, consultation):
+    client = client_for(patient.user)
+    url = reverse("consultation-list")
+    first, _ = get(client, url)
+
+    doctor.user.last_name = "Wilson"
+    doctor.user.save()
+    second, _ = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 200
+    assert second.data["results"][0]["doctor"]["last_name"] == "Wilson"
+
+
+@pytest.mark.django_db
+def test_retrieve_conditional_get_and_if_match(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-detail", args=[consultation.pk])
+    first, _ = get(client, url)
+
+    second, queries = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+    patch = client.patch(
+        url, {"notes": "x"}, format="json", HTTP_IF_MATCH=first["ETag"]
+    )
+    third, _ = get(client, url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 304
+    assert queries == 0
+    assert patch.status_code == 200
+    assert third.status_code == 200
+    assert third.data["notes"] == "x"
@@ -0,0 +1,156 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from appointments.models import Patient, User
+from appointments.roster import RosterImport, read_roster
+
+CSV = (
+    "username,first_name,last_name,email,phone,password\n"
+    "ivanov,Иван,Иванов,ivanov@example.com,+79000000001,\n"
+    "petrov,Пётр,Петров,,,Secret-pass-42\n"
+    "bad name,,,,,\n"
+    "ivanov,,,,,\n"
+    "jdoe,,,,,\n"
+    "sidorov,,,not-an-email,,\n"
+    "short,,,,,abc\n"
+)
+
+
+def run_import(text, fmt="csv", **kwargs):
+    return RosterImport(**kwargs).run(read_roster(StringIO(text), fmt))
+
+
+@pytest.mark.django_db
+def test_csv_import(patient):
+    importer = run_import(CSV, batch_size=3)
+
+    assert importer.created == 2
+    errors = {error["line"]: set(error["errors"]) for error in importer.errors}
+    assert errors == {
+        4: {"username"},
+        5: {"username"},
+        6: {"username"},
+        7: {"email"},
+        8: {"password"},
+    }
+
+    ivanov = Patient.objects.get(user__username="ivanov")
+    assert ivanov.phone == "+79000000001"
+    assert ivanov.email == "ivanov@example.com"
+    assert ivanov.search_name == "иванов иван"
+    assert ivanov.user.role == "patient"
+    assert not ivanov.user.has_usable_password()
+    assert User.objects.get(username="petrov").check_password("Secret-pass-42")
+    assert [invite["username"] for invite in importer.invites] == ["ivanov"]
+
+
+@pytest.mark.django_db
+def test_ndjson_import():
+    rows = [{"username": "a1", "last_name": "A"}, {"username": "a2"}]
+    text = "\n".join(map(json.dumps, rows)) + "\n\nnot json\n[1]\n"
+
+    importer = run_import(text, "ndjson")
+
+    assert importer.created == 2
+    assert [error["line"] for error in importer.errors] == [4, 5]
+    assert len(importer.invites) == 2
+
+
+@pytest.mark.django_db
+def test_password_validators_apply():
+    importer = run_import("username,password\nmallory,mallory1\nbob,12345678\n")
+
+    assert importer.created == 0
+    assert [set(error["errors"]) for error in importer.errors] == [{"password"}] * 2
+
+
+@pytest.mark.django_db
+def test_passwords_hashed_in_workers():
+    rows = "".join(f"user{i},Secret-pass-{i}\n" for i in range(4))
+
+    importer = run_import("username,password\n" + rows, workers=2)
+
+    assert importer.created == 4
+    assert User.objects.get(username="user3").check_password("Secret-pass-3")
+
+
+@pytest.mark.django_db
+def test_accept_invite():
+    invite = run_import("username\nivanov\n").invites[0]
+    url = reverse("register-accept-invite")
+    client = APIClient()
+    data = {"uid": invite["uid"], "token": invite["token"]}
+
+    response = client.post(url, {**data, "password": "Another-pass-7"})
+    assert response.status_code == 200
+    assert User.objects.get(username="ivanov").check_password("Another-pass-7")
+
+    # The token depends on the password, so it works only once.
+    response = client.post(url, {**data, "password": "Third-pass-77"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_accept_invite_rejects_bad_token(patient):
+    invite = run_import("username\nivanov\n").invites[0]
+    response = APIClient().post(
+        reverse("register-accept-invite"),
+        {"uid": invite["uid"], "token": "1-abc", "password": "Another-pass-7"},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_import_endpoint(admin, client_for):
+    url = reverse("patient-import-roster")
+    client = client_for(admin)
+
+    response = client.generic("POST", url, CSV, content_type="text/csv")
+    assert response.status_code == 201
+    assert response.data["created"] == 3
+    assert len(response.data["errors"]) == 4
+    assert len(response.data["invites"]) == 2
+
+    response = client.generic("POST", url, CSV, content_type="text/csv")
+    assert response.status_code == 400
+    assert response.data["created"] == 0
+
+    response = client.post(url, {"username": "x"}, format="json")
+    assert response.status_code == 415
+
+
+@pytest.mark.django_db
+def test_import_endpoint_is_admin_only(doctor, client_for):
+    response = client_for(doctor.user).generic(
+        "POST",
+        reverse("patient-import-roster"),
+        "username\nivanov\n",
+        content_type="text/csv",
+    )
+    assert response.status_code == 403
+    assert not User.objects.filter(username="ivanov").exists()
+
+
+@pytest.mark.django_db
+def test_import_command(tmp_path):
+    path = tmp_path / "roster.ndjson"
+    path.write_text('{"username": "ivanov"}\n{"username": "petrov"}\n')
+    invites = tmp_path / "invites.csv"
+    stdout = StringIO()
+
+    call_command(
+        "import_patients",
+        str(path),
+        "--workers=0",
+        f"--invites={invites}",
+        stdout=stdout,
+    )
+
+    assert "Imported 2 patients" in stdout.getvalue()
+    assert invites.read_text().splitlines()[0] == "line,username,uid,token"
+    assert len(invites.read_text().splitlines()) == 3
@@ -0,0 +1,73 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from appointments.models import Consultation, Doctor
+
+User = get_user_model()
+
+
+@pytest.fixture
+def consultations(doctor, patient, clinic):
+    other_user = User.objects.create_user(
+        username="petrov",
+        role="doctor",
+        first_name="Пётр",
+        last_name="Петров",
+        middle_name="Ильич",
+    )
+    other = Doctor.objects.create(user=other_user)
+    return [
+        Consultation.objects.create(
+            doctor=d,
+            patient=patient,
+            clinic=clinic,
+            start_time="2030-01-01T10:00:00Z",
+            end_time="2030-01-01T11:00:00Z",
+        )
+        for d in (doctor, other)
+    ]
+
+
+def search(client, term):
+    response = client.get(reverse("consultation-list"), {"search": term})
+    assert response.status_code == 200
+    return [row["id"] for row in response.data["results"]]
+
+
+@pytest.mark.django_db
+def test_search_name_is_normalized(consultations):
+    assert consultations[1].doctor.search_name == "петров петр ильич"
+
+
+@pytest.mark.django_db
+def test_search_matches_doctor_name_case_insensitively(
+    client_for, admin, consultations
+):
+    client = client_for(admin)
+
+    assert search(client, "HOUSE") == [consultations[0].id]
+    assert search(client, "пётр") == [consultations[1].id]
+
+
+@pytest.mark.django_db
+def test_search_matches_patient_name(client_for, admin, consultations):
+    assert sorted(search(client_for(admin), "doe")) == sorted(
+        c.id for c in consultations
+    )
+
+
+@pytest.mark.django_db
+def test_every_term_must_match(client_for, admin, consultations):
+    client = client_for(admin)
+
+    assert search(client, "петров doe") == [consultations[1].id]
+    assert search(client, "петров house") == []
+
+
+@pytest.mark.django_db
+def test_renaming_user_updates_search_name(client_for, admin, doctor, consultations):
+    doctor.user.last_name = "Wilson"
+    doctor.user.save()
+
+    assert search(client_for(admin), "wilson") == [consultations[0].id]
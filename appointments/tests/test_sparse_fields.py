@@ -0,0 +1,91 @@
+import pytest
+from django.urls import reverse
+
+from appointments.models import Consultation
+
+
+@pytest.fixture
+def consultation(doctor, patient, clinic):
+    return Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        clinic=clinic,
+        start_time="2030-01-01T10:00:00Z",
+        end_time="2030-01-01T11:00:00Z",
+    )
+
+
+@pytest.mark.django_db
+def test_fields_limits_row_keys(client_for, admin, consultation):
+    response = client_for(admin).get(
+        reverse("consultation-list"), {"fields": "id,status,start_time"}
+    )
+
+    assert response.status_code == 200
+    assert response.data["results"] == [
+        {
+            "id": consultation.id,
+            "status": "pending",
+            "start_time": "2030-01-01T10:00:00Z",
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_relations_are_ids_unless_expanded(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    row = client.get(url, {"fields": "doctor,patient,clinic"}).data["results"][0]
+    assert row == {
+        "doctor": consultation.doctor_id,
+        "patient": consultation.patient_id,
+        "clinic": consultation.clinic_id,
+    }
+
+    row = client.get(url, {"expand": "doctor"}).data["results"][0]
+    assert row["doctor"] == {
+        "id": consultation.doctor_id,
+        "first_name": "Gregory",
+        "last_name": "House",
+        "middle_name": "",
+        "specialization": "Diagnostics",
+    }
+    assert row["patient"] == consultation.patient_id
+
+
+@pytest.mark.django_db
+def test_lean_rows_match_full_serializer(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-list")
+
+    full = client.get(url).data["results"][0]
+    lean = client.get(url, {"fields": "id,created_at,end_time,notes"}).data["results"]
+
+    assert lean == [{k: full[k] for k in ("id", "created_at", "end_time", "notes")}]
+
+
+@pytest.mark.django_db
+def test_unknown_field_is_rejected(client_for, admin):
+    response = client_for(admin).get(reverse("consultation-list"), {"fields": "secret"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_lean_rows_are_paginated(client_for, admin, consultation):
+    Consultation.objects.create(
+        doctor=consultation.doctor,
+        patient=consultation.patient,
+        start_time="2030-01-02T10:00:00Z",
+        end_time="2030-01-02T11:00:00Z",
+    )
+    client = client_for(admin)
+
+    first = client.get(reverse("consultation-list"), {"fields": "id", "page_size": 1})
+    second = client.get(first.data["next"])
+
+    assert first.data["results"] + second.data["results"] == [
+        {"id": c.id} for c in Consultation.objects.order_by("-created_at", "-id")
+    ]
+    assert second.data["next"] is None
@@ -0,0 +1,136 @@
+from io import StringIO
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from appointments import bulk
+from appointments.models import Consultation, ConsultationStat, Doctor, User
+from conftest import START
+
+
+def counts():
+    return {
+        (stat.day, stat.doctor_id, stat.clinic_id, stat.status): stat.count
+        for stat in ConsultationStat.objects.exclude(count=0)
+    }
+
+
+@pytest.mark.django_db
+def test_incremental_counts_match_rebuild(doctor, patient, clinic, make_consultation):
+    first = make_consultation()
+    second = make_consultation(1)
+    make_consultation(26, clinic=None)
+
+    first.transition("confirmed")
+    second.status = "confirmed"
+    second.save()
+    bulk.change_status(Consultation.objects.all(), "confirmed")
+    bulk.create_consultations(
+        [
+            {
+                "doctor_id": doctor.pk,
+                "patient_id": patient.pk,
+                "clinic": clinic.pk,
+                "start_time": START + timedelta(hours=5),
+                "end_time": START + timedelta(hours=5, minutes=30),
+            }
+        ]
+    )
+    first.delete()
+
+    incremental = counts()
+    call_command("rebuild_consultation_stats", stdout=StringIO())
+    assert (
+        counts()
+        == incremental
+        == {
+            (date(2030, 1, 1), doctor.pk, clinic.pk, "confirmed"): 1,
+            (date(2030, 1, 1), doctor.pk, clinic.pk, "pending"): 1,
+            (date(2030, 1, 2), doctor.pk, None, "confirmed"): 1,
+        }
+    )
+
+
+@pytest.mark.django_db
+def test_deleted_clinic_counts_move_to_no_clinic(
+    client_for, admin, clinic, make_consultation
+):
+    make_consultation()
+    make_consultation(1, clinic=None)
+    make_consultation(2, status="confirmed")
+
+    clinic.delete()
+
+    response = client_for(admin).get(
+        reverse("consultation-stats"), {"group_by": "clinic,status"}
+    )
+    assert response.data["results"] == [
+        {"clinic": None, "status": "confirmed", "total": 1},
+        {"clinic": None, "status": "pending", "total": 2},
+    ]
+    incremental = counts()
+    call_command("rebuild_consultation_stats", stdout=StringIO())
+    assert counts() == incremental
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_groups(client_for, admin, make_consultation):
+    make_consultation()
+    make_consultation(1, status="completed")
+    make_consultation(25, status="completed")
+
+    response = client_for(admin).get(
+        reverse("consultation-stats"), {"group_by": "day,status"}
+    )
+
+    assert response.status_code == 200
+    assert response.data["results"] == [
+        {"day": date(2030, 1, 1), "status": "completed", "total": 1},
+        {"day": date(2030, 1, 1), "status": "pending", "total": 1},
+        {"day": date(2030, 1, 2), "status": "completed", "total": 1},
+    ]
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_filters_by_date(client_for, admin, doctor, make_consultation):
+    make_consultation()
+    make_consultation(25)
+
+    response = client_for(admin).get(
+        reverse("consultation-stats"),
+        {"group_by": "doctor", "date_from": "2030-01-02"},
+    )
+
+    assert response.data["results"] == [{"doctor": doctor.pk, "total": 1}]
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_is_scoped_to_doctor(client_for, doctor, make_consultation):
+    user = User.objects.create_user(username="wilson", role="doctor")
+    other = Doctor.objects.create(user=user, specialization="Oncology")
+    make_consultation(doctor=other)
+    make_consultation(2)
+
+    response = client_for(doctor.user).get(
+        reverse("consultation-stats"), {"group_by": "doctor"}
+    )
+
+    assert response.data["results"] == [{"doctor": doctor.pk, "total": 1}]
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_forbidden_for_patient(client_for, patient):
+    response = client_for(patient.user).get(reverse("consultation-stats"))
+
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_rejects_unknown_group(client_for, admin):
+    response = client_for(admin).get(
+        reverse("consultation-stats"), {"group_by": "patient"}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,126 @@
+import pytest
+from django.urls import reverse
+
+from appointments.models import Consultation
+
+
+@pytest.fixture
+def consultation(doctor, patient, clinic):
+    return Consultation.objects.create(
+        doctor=doctor,
+        patient=patient,
+        clinic=clinic,
+        start_time="2030-01-01T10:00:00Z",
+        end_time="2030-01-01T11:00:00Z",
+    )
+
+
+def change_status(client, consultation, new_status, **headers):
+    return client.post(
+        reverse("consultation-change-status", args=[consultation.pk]),
+        {"status": new_status},
+        format="json",
+        **headers,
+    )
+
+
+@pytest.mark.django_db
+def test_status_follows_transition_graph(client_for, doctor, consultation):
+    client = client_for(doctor.user)
+
+    for new_status in ["confirmed", "started", "completed", "paid"]:
+        response = change_status(client, consultation, new_status)
+        assert response.status_code == 200
+        assert response.data["status"] == new_status
+
+    response = change_status(client, consultation, "pending")
+    assert response.status_code == 409
+    assert Consultation.objects.get(pk=consultation.pk).status == "paid"
+
+
+@pytest.mark.django_db
+def test_change_status_bumps_version_and_etag(client_for, doctor, consultation):
+    response = change_status(client_for(doctor.user), consultation, "confirmed")
+
+    assert response.data["version"] == 2
+    assert response["ETag"] == f'"{consultation.pk}-2"'
+
+
+@pytest.mark.django_db
+def test_stale_if_match_is_rejected(client_for, doctor, consultation):
+    client = client_for(doctor.user)
+    etag = client.get(reverse("consultation-detail", args=[consultation.pk]))["ETag"]
+    change_status(client, consultation, "confirmed", HTTP_IF_MATCH=etag)
+
+    response = change_status(client, consultation, "started", HTTP_IF_MATCH=etag)
+
+    assert response.status_code == 412
+    assert Consultation.objects.get(pk=consultation.pk).status == "confirmed"
+
+
+@pytest.mark.django_db
+def test_transition_is_compare_and_set(consultation):
+    stale = Consultation.objects.get(pk=consultation.pk)
+    assert consultation.transition("confirmed")
+
+    assert not stale.transition("confirmed")
+    assert Consultation.objects.get(pk=consultation.pk).version == 2
+
+
+@pytest.mark.django_db
+def test_update_with_stale_version_conflicts(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-detail", args=[consultation.pk])
+    etag = client.get(url)["ETag"]
+
+    first = client.patch(url, {"notes": "first"}, format="json", HTTP_IF_MATCH=etag)
+    second = client.patch(url, {"notes": "second"}, format="json", HTTP_IF_MATCH=etag)
+
+    assert first.status_code == 200
+    assert first["ETag"] == f'"{consultation.pk}-2"'
+    assert second.status_code == 412
+    assert Consultation.objects.get(pk=consultation.pk).notes == "first"
+
+
+@pytest.mark.django_db
+def test_save_outside_the_api_invalidates_if_match(client_for, admin, consultation):
+    client = client_for(admin)
+    url = reverse("consultation-detail", args=[consultation.pk])
+    stale = Consultation.objects.get(pk=consultation.pk)
+    etag = client.get(url)["ETag"]
+
+    consultation.notes = "from the shell"
+    consultation.save()
+    response = client.patch(url, {"notes": "api"}, format="json", HTTP_IF_MATCH=etag)
+    assert response.status_code == 412
+
+    # A save from an instance loaded before that one still moves it on.
+    etag = client.get(url)["ETag"]
+    stale.notes = "from a command"
+    stale.save(update_fields=["notes"])
+    response = client.patch(url, {"notes": "api"}, format="json", HTTP_IF_MATCH=etag)
+    assert response.status_code == 412
+    assert Consultation.objects.get(pk=consultation.pk).version == 3
+
+
+@pytest.mark.django_db
+def test_update_cannot_skip_transitions(client_for, admin, consultation):
+    response = client_for(admin).patch(
+        reverse("consultation-detail", args=[consultation.pk]),
+        {"status": "paid"},
+        format="json",
+    )
+
+    assert response.status_code == 409
+
+
+@pytest.mark.django_db
+def test_bulk_status_skips_illegal_transitions(client_for, admin, consultation):
+    response = client_for(admin).post(
+        reverse("consultation-bulk-change-status"),
+        {"status": "paid", "ids": [consultation.pk]},
+        format="json",
+    )
+
+    assert response.data["updated"] == []
+    assert response.data["skipped"] == [consultation.pk]
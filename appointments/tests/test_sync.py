@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from appointments import sync
+from appointments.models import ConsultationTombstone, Doctor, Patient, User
+from conftest import START
+
+URL = reverse("consultation-sync")
+
+
+@pytest.fixture(autouse=True)
+def no_lag(settings):
+    settings.CONSULTATION_SYNC_LAG_SECONDS = 0
+
+
+@pytest.fixture
+def other_doctor(db):
+    user = User.objects.create_user(
+        username="wilson", password="testpass123", role="doctor"
+    )
+    return Doctor.objects.create(user=user)
+
+
+def ids(data):
+    return sorted(row["id"] for row in data["changed"])
+
+
+@pytest.mark.django_db
+def test_sync_returns_only_changes(client_for, doctor, other_doctor, make_consultation):
+    mine = [make_consultation(i) for i in range(3)]
+    theirs = make_consultation(5, doctor=other_doctor)
+    client = client_for(doctor.user)
+
+    first = client.get(URL).json()
+    assert ids(first) == [c.pk for c in mine]
+    assert first["deleted"] == []
+    assert first["has_more"] is False
+
+    assert client.get(URL, {"since": first["next"]}).json()["changed"] == []
+
+    mine[1].transition("confirmed")
+    theirs.transition("confirmed")
+    deleted = mine[2].pk
+    mine[2].delete()
+    theirs.delete()
+    second = client.get(URL, {"since": first["next"]}).json()
+
+    assert [row["id"] for row in second["changed"]] == [mine[1].pk]
+    assert second["changed"][0]["status"] == "confirmed"
+    assert second["deleted"] == [deleted]
+
+    third = client.get(URL, {"since": second["next"]}).json()
+    assert third["changed"] == [] and third["deleted"] == []
+
+
+@pytest.mark.django_db
+def test_reassigned_consultation_is_deleted_for_the_old_doctor(
+    client_for, doctor, other_doctor, patient, make_consultation
+):
+    consultation = make_consultation()
+    clients = [client_for(user) for user in (doctor.user, other_doctor.user)]
+    clients.append(client_for(patient.user))
+    tokens = [client.get(URL).json()["next"] for client in clients]
+
+    consultation.doctor = other_doctor
+    consultation.save()
+
+    old, new, own = (
+        client.get(URL, {"since": token}).json()
+        for client, token in zip(clients, tokens)
+    )
+    assert old["changed"] == [] and old["deleted"] == [consultation.pk]
+    assert ids(new) == [consultation.pk] and new["deleted"] == []
+    assert ids(own) == [consultation.pk] and own["deleted"] == []
+
+
+@pytest.mark.django_db
+def test_sync_pages(client_for, settings, admin, doctor, make_consultation):
+    settings.CONSULTATION_SYNC_PAGE_SIZE = 2
+    created = [make_consultation(i) for i in range(5)]
+    client = client_for(admin)
+
+    seen, params = [], {"fields": "id,status"}
+    while True:
+        data = client.get(URL, params).json()
+        seen += [row["id"] for row in data["changed"]]
+        params["since"] = data["next"]
+        if not data["has_more"]:
+            break
+
+    assert seen == [c.pk for c in created]
+    assert set(data["changed"][0]) == {"id", "status"}
+
+
+@pytest.mark.django_db
+def test_recent_changes_are_sent_again(
+    client_for, settings, patient, doctor, make_consultation
+):
+    # A transaction committing late may have written an earlier updated_at.
+    settings.CONSULTATION_SYNC_LAG_SECONDS = 60
+    consultation = make_consultation()
+    client = client_for(patient.user)
+
+    first = client.get(URL).json()
+    second = client.get(URL, {"since": first["next"]}).json()
+
+    assert ids(first) == ids(second) == [consultation.pk]
+
+
+@pytest.mark.django_db
+def test_invalid_and_expired_tokens(client_for, settings, patient):
+    client = client_for(patient.user)
+    assert client.get(URL, {"since": "garbage"}).status_code == 400
+
+    old = START.replace(year=2000)
+    token = sync.encode_token((old, 0), (old, 0))
+    response = client.get(URL, {"since": token})
+    assert response.status_code == 410
+
+
+@pytest.mark.django_db
+def test_daily_sync_without_deletes_does_not_expire(
+    client_for, monkeypatch, settings, doctor, make_consultation
+):
+    make_consultation()
+    client = client_for(doctor.user)
+    today = [datetime.now(timezone.utc)]
+    monkeypatch.setattr(sync.timezone, "now", lambda: today[0])
+
+    token = client.get(URL).json()["next"]
+    for _ in range(settings.CONSULTATION_TOMBSTONE_DAYS + 2):
+        today[0] += timedelta(days=1)
+        response = client.get(URL, {"since": token})
+        assert response.status_code == 200
+        token = response.json()["next"]
+
+
+@pytest.mark.django_db
+def test_warm_sync_is_small(client_for, doctor, make_consultation):
+    for i in range(20):
+        make_consultation(i)
+    client = client_for(doctor.user)
+    token = client.get(URL).json()["next"]
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(URL, {"since": token})
+
+    # consultations and tombstones; the user comes from the cache and the
+    # profile id from the token.
+    assert len(context.captured_queries) == 2
+    assert len(response.content) < 200
+
+
+@pytest.mark.django_db
+def test_tombstones_are_pruned(doctor, settings, make_consultation):
+    from appointments import archive
+
+    make_consultation().delete()
+    ConsultationTombstone.objects.update(deleted_at=START.replace(year=2000))
+    make_consultation(1).delete()
+
+    assert archive.prune_tombstones(settings.CONSULTATION_TOMBSTONE_DAYS) == 1
+    assert ConsultationTombstone.objects.count() == 1
+    assert Patient.objects.count() == 1
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.utils.crypto import constant_time_compare
+from django.utils.http import base36_to_int
+
+
+class InviteTokenGenerator(PasswordResetTokenGenerator):
+    """
+    Tokens for patients imported without a password.
+
+    Like password reset tokens they depend on the password hash, so a token
+    stops working once the patient has set a password; they stay valid for
+    ``PATIENT_INVITE_TIMEOUT`` seconds rather than ``PASSWORD_RESET_TIMEOUT``.
+    """
+
+    key_salt = "appointments.tokens.InviteTokenGenerator"
+
+    def check_token(self, user, token):
+        if not (user and token):
+            return False
+        try:
+            ts = base36_to_int(token.split("-")[0])
+        except ValueError:
+            return False
+        if self._num_seconds(self._now()) - ts > settings.PATIENT_INVITE_TIMEOUT:
+            return False
+        return any(
+            constant_time_compare(
+                self._make_token_with_timestamp(user, ts, secret), token
+            )
+            for secret in [self.secret, *self.secret_fallbacks]
+        )
+
+
+invite_tokens = InviteTokenGenerator()
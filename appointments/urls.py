@@ -1,15 +1,36 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import ConsultationViewSet, RegistrationViewSet
+from .async_views import (
+    ConsultationChangeStatusView,
+    ConsultationDetailView,
+    ConsultationListView,
+)
+from .views import ConsultationViewSet, PatientViewSet, RegistrationViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 router = DefaultRouter()
 router.register(r"consultations", ConsultationViewSet, basename="consultation")
 router.register(r"auth/register", RegistrationViewSet, basename="register")
+router.register(r"patients", PatientViewSet, basename="patient")
 
 urlpatterns = [
     path("api/", include(router.urls)),
+    path(
+        "api/async/consultations/",
+        ConsultationListView.as_view(),
+        name="async-consultation-list",
+    ),
+    path(
+        "api/async/consultations/<int:pk>/",
+        ConsultationDetailView.as_view(),
+        name="async-consultation-detail",
+    ),
+    path(
+        "api/async/consultations/<int:pk>/change_status/",
+        ConsultationChangeStatusView.as_view(),
+        name="async-consultation-change-status",
+    ),
     path("api/auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -1,16 +1,41 @@
+import codecs
+from datetime import timedelta
+
 from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.db import DatabaseError
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q, Sum, Value
+from django.utils import timezone
+
+from mis.db import routers
 
-from .models import Consultation
+from . import archive, bulk, caching, roster, slots, sync
+from .exceptions import Conflict, PreconditionFailed
+from .filters import IndexedSearchFilter
+from .models import (
+    ArchivedConsultation,
+    Consultation,
+    ConsultationStat,
+    ConsultationTombstone,
+    Doctor,
+)
+from .pagination import ConsultationCursorPagination
 from .serializers import (
+    AcceptInviteSerializer,
+    ConsultationBulkStatusSerializer,
     ConsultationSerializer,
+    ConsultationStatsQuerySerializer,
+    ConsultationValuesSerializer,
+    FreeSlotsQuerySerializer,
+    RosterPatientSerializer,
     UserCreateSerializer,
 )
-from .permissions import ConsultationPermission
+from .permissions import ConsultationPermission, IsAdmin
 
 
 class RegistrationViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -33,44 +58,205 @@ class RegistrationViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="accept-invite",
+        serializer_class=AcceptInviteSerializer,
+    )
+    def accept_invite(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response({"detail": "Password set"})
+
+
+class PatientViewSet(viewsets.GenericViewSet):
+    serializer_class = RosterPatientSerializer
+    permission_classes = [IsAdmin]
+    roster_formats = {"text/csv": "csv", "application/x-ndjson": "ndjson"}
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_roster(self, request):
+        """
+        Import a CSV or NDJSON roster of patients, streamed from the request
+        body; rows failing validation are reported, the others imported.
+        """
+        fmt = self.roster_formats.get(request.content_type.split(";")[0].strip())
+        if fmt is None:
+            raise UnsupportedMediaType(request.content_type)
+        lines = codecs.iterdecode(request.stream or [], "utf-8-sig")
+        importer = roster.RosterImport(workers=settings.PATIENT_IMPORT_WORKERS)
+        importer.run(roster.read_roster(lines, fmt))
+        return Response(
+            {
+                "created": importer.created,
+                "errors": importer.errors,
+                "invites": importer.invites,
+            },
+            status=(
+                status.HTTP_201_CREATED
+                if importer.created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
 
 class ConsultationViewSet(viewsets.ModelViewSet):
     queryset = Consultation.objects.select_related(
         "doctor__user", "patient__user", "clinic"
-    ).all()
+    ).prefetch_related("doctor__clinics")
     serializer_class = ConsultationSerializer
     permission_classes = [IsAuthenticated, ConsultationPermission]
+    pagination_class = ConsultationCursorPagination
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        IndexedSearchFilter,
         filters.OrderingFilter,
     ]
 
     filterset_fields = ["status", "clinic__id", "doctor__id", "patient__id"]
 
-    search_fields = [
-        "doctor__user__first_name",
-        "doctor__user__last_name",
-        "doctor__user__middle_name",
-        "patient__user__first_name",
-        "patient__user__last_name",
-        "patient__user__middle_name",
-    ]
+    search_fields = ["doctor__search_name", "patient__search_name"]
 
     ordering_fields = ["created_at", "start_time"]
     ordering = ["-created_at"]
 
+    # Served from a read replica unless the user has just written something.
+    replica_actions = ["list", "retrieve", "stats"]
+
     def get_queryset(self):
-        user = self.request.user
-        qs = super().get_queryset()
+        return super().get_queryset().for_user(self.request.user)
+
+    def dispatch(self, request, *args, **kwargs):
+        with routers.replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not routers.is_pinned(
+            request.user.pk
+        ):
+            routers.use_replica()
+
+    def list(self, request, *args, **kwargs):
+        return caching.cached_read(
+            request,
+            lambda: self.build_list(request, *args, **kwargs),
+            lambda key, versions, data: caching.key_etag(key),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return caching.cached_read(
+            request,
+            lambda: super(ConsultationViewSet, self).retrieve(request, *args, **kwargs),
+            self.get_retrieve_etag,
+        )
 
-        if user.is_admin():
-            return qs
+    def get_retrieve_etag(self, key, versions, data):
+        """The row's ETag, qualified by the version of the nested directory."""
+        if data is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            try:
+                data = queryset.filter(pk=self.kwargs["pk"]).values("id", "version")
+                data = data.first()
+            except (TypeError, ValueError):
+                data = None
+            if data is None:
+                return None
+        return Consultation.make_etag(data["id"], data["version"], versions[1])
+
+    def build_list(self, request, *args, **kwargs):
+        values_serializer = ConsultationValuesSerializer.from_query_params(
+            request.query_params
+        )
+        archive_mode = self.get_archive_mode()
+        if archive_mode is not None:
+            return self.build_archive_list(
+                archive_mode, values_serializer or ConsultationValuesSerializer()
+            )
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values(*values_serializer.get_columns())
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            [values_serializer.to_representation(row) for row in page]
+        )
+
+    def estimate_count(self):
+        """
+        The number of listed consultations according to the statistics
+        table, or ``None`` if the filters go beyond what it records.
+        """
+        params, user = self.request.query_params, self.request.user
+        if params.get("search") or params.get("patient__id"):
+            return None
+        queryset = ConsultationStat.objects.all()
         if user.is_doctor():
-            return qs.filter(doctor__user=user)
-        if user.is_patient():
-            return qs.filter(patient__user=user)
-        return Consultation.objects.none()
+            queryset = queryset.filter(**user.profile_lookup("doctor"))
+        elif not user.is_admin():
+            return None
+        lookups = {"status": "status", "doctor__id": "doctor", "clinic__id": "clinic"}
+        for param, lookup in lookups.items():
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: params[param]})
+        # The statistics include archived consultations; assume everything
+        # old enough has been archived.
+        archived = Q(
+            status__in=Consultation.ARCHIVE_STATUSES,
+            day__lt=timezone.localdate(
+                archive.cutoff(settings.CONSULTATION_ARCHIVE_AFTER_DAYS)
+            ),
+        )
+        mode = self.get_archive_mode()
+        if mode is None:
+            queryset = queryset.exclude(archived)
+        elif mode == "only":
+            queryset = queryset.filter(archived)
+        return queryset.aggregate(total=Sum("count"))["total"] or 0
+
+    def get_archive_mode(self):
+        """``?include_archived=``: ``None`` (the default), "true" or "only"."""
+        mode = self.request.query_params.get("include_archived", "false").lower()
+        if mode not in ("false", "true", "only"):
+            raise ValidationError(
+                {"include_archived": "Expected one of: false, true, only"}
+            )
+        return None if mode == "false" else mode
+
+    def build_archive_list(self, mode, values_serializer):
+        """
+        List archived consultations, alone or together with live ones, in
+        the lean representation plus an ``archived`` flag.
+        """
+        columns = values_serializer.get_columns()
+        querysets = [
+            self.filter_queryset(
+                ArchivedConsultation.objects.for_user(self.request.user)
+            ).values(*columns, archived=Value(True))
+        ]
+        if mode == "true":
+            querysets.insert(
+                0,
+                self.filter_queryset(self.get_queryset())
+                .prefetch_related(None)
+                .values(*columns, archived=Value(False)),
+            )
+        page = self.paginate_queryset(querysets)
+        return self.get_paginated_response(
+            [
+                {
+                    **values_serializer.to_representation(row),
+                    "archived": row["archived"],
+                }
+                for row in page
+            ]
+        )
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -81,6 +267,192 @@ class ConsultationViewSet(viewsets.ModelViewSet):
 
             raise PermissionDenied("Only patients or admins can create consultations.")
 
+    def perform_update(self, serializer):
+        consultation = serializer.instance
+        self.check_if_match(consultation)
+        with transaction.atomic():
+            # Claim the version first: a concurrent writer that loaded the
+            # same version now fails here instead of overwriting this save.
+            claimed = Consultation.objects.filter(
+                pk=consultation.pk, version=consultation.version
+            ).update(version=F("version") + 1)
+            if not claimed:
+                raise Conflict()
+            serializer.save(version=consultation.version + 1)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a list of consultations"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_size = settings.CONSULTATION_BULK_MAX_SIZE
+        if len(items) > max_size:
+            return Response(
+                {"detail": f"At most {max_size} consultations per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created, errors = bulk.create_consultations(items)
+        return Response(
+            {"created": created, "errors": errors},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-status",
+        permission_classes=[IsAuthenticated],
+        serializer_class=ConsultationBulkStatusSerializer,
+    )
+    def bulk_change_status(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = self.get_queryset()
+        if "filter" in data:
+            queryset = self.filter_by(queryset, data["filter"])
+
+        summary = bulk.change_status(queryset, data["status"], ids=data.get("ids"))
+        return Response(summary, status=status.HTTP_200_OK)
+
+    def filter_by(self, queryset, params):
+        filterset_class = DjangoFilterBackend().get_filterset_class(self, queryset)
+        unknown = set(params) - set(filterset_class.base_filters)
+        if unknown:
+            raise ValidationError(
+                {"filter": f"Unknown filter(s): {', '.join(sorted(unknown))}"}
+            )
+        filterset = filterset_class(
+            data=params, queryset=queryset, request=self.request
+        )
+        if not filterset.is_valid():
+            raise ValidationError({"filter": filterset.errors})
+        return filterset.qs
+
+    @action(detail=False, methods=["get"], pagination_class=None, filter_backends=[])
+    def sync(self, request):
+        """
+        Consultations changed and ids of those deleted since ``?since=``, the
+        ``next`` token of the previous sync; everything without it. Rows are
+        in the lean representation, ``?fields=``/``?expand=`` apply.
+        """
+        values_serializer = ConsultationValuesSerializer.from_query_params(
+            request.query_params
+        )
+        return Response(
+            sync.changes(
+                self.get_queryset().prefetch_related(None),
+                ConsultationTombstone.objects.for_user(request.user),
+                request.query_params.get("since"),
+                values_serializer or ConsultationValuesSerializer(),
+            )
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="free-slots",
+        permission_classes=[IsAuthenticated],
+        serializer_class=FreeSlotsQuerySerializer,
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def free_slots(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        doctors = Doctor.objects.order_by("pk")
+        if "doctor" in params:
+            doctors = doctors.filter(pk=params["doctor"])
+        else:
+            doctors = doctors.filter(clinics=params["clinic"])
+        doctor_ids = list(doctors.values_list("pk", flat=True))
+
+        windows = list(
+            slots.working_windows(
+                params["date_from"],
+                params["date_to"],
+                params["day_start"],
+                params["day_end"],
+            )
+        )
+        busy = slots.busy_intervals(doctor_ids, windows[0][0], windows[-1][1])
+
+        grid = slots.slot_grid(
+            windows,
+            timedelta(minutes=params["duration"]),
+            not_before=timezone.now(),
+        )
+        # Every doctor's slots come from the same grid, so it is formatted once.
+        formatted = {
+            slot: {"start": slots.isoformat(slot[0]), "end": slots.isoformat(slot[1])}
+            for slot in grid
+        }
+        return Response(
+            {
+                "duration": params["duration"],
+                "doctors": [
+                    {
+                        "doctor": doctor_id,
+                        "slots": [
+                            formatted[slot]
+                            for slot in slots.free_slots(doctor_busy, grid)
+                        ],
+                    }
+                    for doctor_id, doctor_busy in busy.items()
+                ],
+            }
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        serializer_class=ConsultationStatsQuerySerializer,
+        pagination_class=None,
+        filter_backends=[],
+    )
+    def stats(self, request):
+        """Consultation counts from the summary table, one row per group."""
+        user = request.user
+        if not (user.is_admin() or user.is_doctor()):
+            return Response(
+                {"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = ConsultationStat.objects.all()
+        if user.is_doctor():
+            queryset = queryset.filter(**user.profile_lookup("doctor"))
+        lookups = {
+            "date_from": "day__gte",
+            "date_to": "day__lte",
+            "doctor": "doctor_id",
+            "clinic": "clinic_id",
+            "status": "status",
+        }
+        for param, lookup in lookups.items():
+            if param in params:
+                queryset = queryset.filter(**{lookup: params[param]})
+
+        group_by = params["group_by"]
+        rows = (
+            queryset.values(*group_by)
+            .annotate(total=Sum("count"))
+            .filter(total__gt=0)
+            .order_by(*group_by)
+        )
+        return Response({"group_by": group_by, "results": list(rows)})
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def change_status(self, request, pk=None):
         consultation = self.get_object()
@@ -98,17 +470,43 @@ class ConsultationViewSet(viewsets.ModelViewSet):
 
         user = request.user
 
-        if not (
-            user.is_admin()
-            or (user.is_doctor() and consultation.doctor.user_id == user.id)
-            or (user.is_patient() and consultation.patient.user_id == user.id)
-        ):
+        if not consultation.is_visible_to(user):
             return Response(
                 {"detail": "Permission denied"}, status=status.HTTP_403_FORBIDDEN
             )
 
-        consultation.status = new_status
-        consultation.save()
+        expected_version = self.check_if_match(consultation)
+        if new_status != consultation.status:
+            if not Consultation.can_transition(consultation.status, new_status):
+                detail = (
+                    f"Cannot change status from {consultation.status} to {new_status}"
+                )
+                return Response({"detail": detail}, status=status.HTTP_409_CONFLICT)
+            if not consultation.transition(new_status, expected_version):
+                raise Conflict()
         return Response(
             self.get_serializer(consultation).data, status=status.HTTP_200_OK
         )
+
+    def check_if_match(self, consultation):
+        """Return the version required by ``If-Match``, or ``None``."""
+        if_match = self.request.headers.get("If-Match")
+        if not if_match or if_match.strip() == "*":
+            return None
+        etags = {Consultation.row_etag(tag) for tag in if_match.split(",")}
+        if consultation.etag not in etags:
+            raise PreconditionFailed()
+        return consultation.version
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            self.action in ["retrieve", "update", "partial_update", "change_status"]
+            and status.is_success(response.status_code)
+            and isinstance(response.data, dict)
+            and not response.has_header("ETag")
+        ):
+            response["ETag"] = Consultation.make_etag(
+                response.data["id"], response.data["version"]
+            )
+        return response
@@ -0,0 +1,44 @@
+"""
+Stand-alone performance benchmarks.
+
+Each module is runnable with ``python -m benchmarks.<name>`` from the project
+root. Benchmarks run against a throwaway test database created from the
+configured ``DATABASES["default"]``, so they never touch real data.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis.settings")
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, keepdb=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def best_of(func, repeat=5):
+    """Return the fastest wall-clock time of ``repeat`` calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
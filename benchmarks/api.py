@@ -0,0 +1,343 @@
+"""
+Latency, query count and memory of the API hot paths at several data sizes.
+
+    python -m benchmarks.api --sizes 1000,100000 --output results.json
+    python -m benchmarks.api --sizes 1000,100000 --baseline results.json
+
+For every size a fresh test database is seeded with ``generate_load_data``
+and each case is requested ``--iterations`` times through the full Django
+stack (in process, no HTTP server). Reported per case: p50/p90/p99/max
+latency, SQL queries per request and the peak Python memory allocated
+while serving one request.
+
+With ``--baseline`` the run is compared against an earlier ``--output``
+file. A case regresses if its p50 grows by more than ``--tolerance`` or it
+makes more queries; the exit status is then 1.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from benchmarks import setup, test_database
+
+# How the number of consultations maps to the rest of the dataset.
+DOCTORS_PER_CONSULTATION = 1 / 500
+PATIENTS_PER_CONSULTATION = 1 / 5
+
+
+def seed(size, prefix):
+    from django.core.management import call_command
+
+    from appointments.models import User
+
+    call_command(
+        "generate_load_data",
+        f"--consultations={size}",
+        f"--doctors={max(10, int(size * DOCTORS_PER_CONSULTATION))}",
+        f"--patients={max(10, int(size * PATIENTS_PER_CONSULTATION))}",
+        "--clinics=10",
+        "--seed=1",
+        f"--prefix={prefix}",
+        stdout=StringIO(),
+    )
+    return User.objects.create_user(
+        username=f"{prefix}_admin", password="loadtest", role="admin", is_staff=True
+    )
+
+
+class Cases:
+    """
+    Each ``case_*`` method returns the callable that issues one request;
+    its responses must have the status in ``statuses`` (default 200).
+    Settings in ``overrides`` apply while a case is built and measured.
+    """
+
+    statuses = {"create": 201}
+    # All rows were written just now: with the default lag every sync would
+    # send them again.
+    overrides = {"sync": {"CONSULTATION_SYNC_LAG_SECONDS": 0}}
+
+    def __init__(self, admin):
+        from django.urls import reverse
+        from rest_framework.test import APIClient
+
+        from appointments.models import Consultation
+        from appointments.serializers import ProfileTokenObtainPairSerializer
+
+        self.reverse = reverse
+        self.admin = admin
+        # With the claims of a login, so the user cache applies as in production.
+        token = ProfileTokenObtainPairSerializer.get_token(admin)
+        self.refresh = str(token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        self.anonymous = APIClient()
+        self.consultation = (
+            Consultation.objects.filter(status__in=["pending", "confirmed"])
+            .order_by("id")
+            .first()
+        )
+        self.sample = Consultation.objects.order_by("id")[
+            Consultation.objects.count() // 2
+        ]
+        self.patient_name = self.sample.patient.user.last_name
+        self.doctor_id = self.sample.doctor_id
+        self.patient_id = self.sample.patient_id
+        self.clinic_id = self.sample.clinic_id
+        # Far enough in the future not to collide with generated consultations.
+        self.next_start = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+    def all(self):
+        """The ``case_*`` methods by name, not called yet: some set data up."""
+        return {
+            name[len("case_") :]: getattr(self, name)
+            for name in dir(self)
+            if name.startswith("case_")
+        }
+
+    def list(self, **params):
+        url = self.reverse("consultation-list")
+        return lambda: self.client.get(url, params)
+
+    def case_list(self):
+        return self.list()
+
+    def case_list_filtered(self):
+        return self.list(status="confirmed", doctor__id=self.doctor_id)
+
+    def case_list_search(self):
+        return self.list(search=self.patient_name)
+
+    def case_list_ordered(self):
+        return self.list(ordering="start_time")
+
+    def case_list_count_exact(self):
+        return self.list(count="exact")
+
+    def case_list_count_estimate(self):
+        return self.list(count="estimate")
+
+    def case_list_lean(self):
+        return self.list(fields="id,status,start_time", expand="doctor")
+
+    def case_sync(self):
+        url = self.reverse("consultation-sync")
+        data = self.client.get(url, {"fields": "id"}).data
+        while data["has_more"]:
+            data = self.client.get(url, {"since": data["next"], "fields": "id"}).data
+        return lambda: self.client.get(url, {"since": data["next"]})
+
+    def case_retrieve(self):
+        url = self.reverse("consultation-detail", args=[self.sample.pk])
+        return lambda: self.client.get(url)
+
+    def case_create(self):
+        url = self.reverse("consultation-list")
+
+        def request():
+            start, self.next_start = self.next_start, self.next_start + timedelta(
+                hours=1
+            )
+            data = {
+                "doctor_id": self.doctor_id,
+                "patient_id": self.patient_id,
+                "clinic": self.clinic_id,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=30)).isoformat(),
+            }
+            return self.client.post(url, data, format="json")
+
+        return request
+
+    def case_change_status(self):
+        url = self.reverse("consultation-change-status", args=[self.consultation.pk])
+        statuses = {"pending": "confirmed", "confirmed": "pending"}
+        current = [self.consultation.status]
+
+        def request():
+            current[0] = statuses[current[0]]
+            return self.client.post(url, {"status": current[0]}, format="json")
+
+        return request
+
+    def case_login(self):
+        url = self.reverse("token_obtain_pair")
+        data = {"username": self.admin.username, "password": "loadtest"}
+        return lambda: self.anonymous.post(url, data, format="json")
+
+    def case_refresh(self):
+        url = self.reverse("token_refresh")
+
+        def request():
+            response = self.anonymous.post(url, {"refresh": self.refresh})
+            # Refresh tokens rotate: keep the chain going.
+            self.refresh = response.data.get("refresh", self.refresh)
+            return response
+
+        return request
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def check(response, expected):
+    if response.status_code != expected:
+        raise RuntimeError(
+            f"Expected {expected}, got {response.status_code}: "
+            f"{response.content[:200]}"
+        )
+
+
+def measure(request, iterations, expected=200, warmup=3):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        check(request(), expected)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = request()
+        timings.append(time.perf_counter() - started)
+        # An error response is fast: it must not pass for a fast request.
+        check(response, expected)
+
+    # Queries and memory are measured separately: both slow requests down.
+    # The query log is a bounded deque, so it must not be full already.
+    reset_queries()
+    with CaptureQueriesContext(connection) as context:
+        check(request(), expected)
+    tracemalloc.start()
+    response = request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    check(response, expected)
+
+    return {
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p90_ms": round(percentile(timings, 0.9) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "queries": len(context.captured_queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    previous = {(r["size"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["size"], result["case"]))
+        if old is None:
+            continue
+        name = f"{result['case']}@{result['size']}"
+        if result["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {old['p50_ms']} -> {result['p50_ms']} ms")
+        if result["queries"] > old["queries"]:
+            regressions.append(
+                f"{name}: queries {old['queries']} -> {result['queries']}"
+            )
+    return regressions
+
+
+def run(args):
+    from django.db import connection
+    from django.test import override_settings
+
+    results = []
+    header = f"{'case':<20} {'size':>8} {'p50':>8} {'p90':>8} {'p99':>8} "
+    print(header + f"{'queries':>8} {'peak KiB':>10}")
+    for size in args.sizes:
+        with test_database():
+            admin = seed(size, prefix=f"bench{size}")
+            cases = Cases(admin)
+            for name, case in cases.all().items():
+                if args.cases and name not in args.cases:
+                    continue
+                iterations = args.iterations
+                if name == "login":
+                    # Password hashing dominates; fewer rounds are enough.
+                    iterations = max(5, iterations // 10)
+                expected = cases.statuses.get(name, 200)
+                with override_settings(**cases.overrides.get(name, {})):
+                    result = {
+                        "case": name,
+                        "size": size,
+                        **measure(case(), iterations, expected),
+                    }
+                results.append(result)
+                print(
+                    f"{name:<20} {size:>8} {result['p50_ms']:>8.2f} "
+                    f"{result['p90_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                    f"{result['queries']:>8} {result['peak_kib']:>10.1f}"
+                )
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[1000, 10000],
+        help="Comma-separated numbers of consultations",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--cases",
+        type=lambda value: value.split(","),
+        help="Comma-separated subset of cases to run",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Serve repeated reads from the response cache, as in production",
+    )
+    args = parser.parse_args()
+
+    setup()
+    if not args.response_cache:
+        from django.conf import settings
+
+        # Otherwise every read after the warmup is a cache hit.
+        settings.CONSULTATION_CACHE_TTL = 0
+    report = run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
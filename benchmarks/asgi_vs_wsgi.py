@@ -0,0 +1,163 @@
+"""
+Requests/second and latency percentiles of the consultation list under load.
+
+    python -m benchmarks.asgi_vs_wsgi --rows 2000 --concurrency 200
+
+Starts uvicorn against a throwaway test database three times and hits the
+list endpoint with ``--concurrency`` simultaneous clients for ``--duration``
+seconds each:
+
+* ``wsgi``: ``mis.wsgi`` under uvicorn's WSGI interface, sync DRF view;
+* ``asgi+sync``: ``mis.asgi``, sync DRF view (one thread hop per request);
+* ``asgi+async``: ``mis.asgi``, the async view under ``/api/async/``.
+
+The servers run in separate processes, so this needs the PostgreSQL database
+from the settings, and ``uvicorn`` and ``httpx``, which are not project
+dependencies.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import setup, test_database
+from benchmarks.serialization import seed
+
+# ?expand= puts the sync view on the same lean representation as the async one.
+PARAMS = {"page_size": 50, "expand": "doctor,patient"}
+
+CASES = (
+    ("wsgi", "mis.wsgi:application", ["--interface", "wsgi"], "/api/consultations/"),
+    ("asgi+sync", "mis.asgi:application", [], "/api/consultations/"),
+    ("asgi+async", "mis.asgi:application", [], "/api/async/consultations/"),
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, extra_args, port, workers):
+    from django.db import connection
+
+    env = dict(os.environ, POSTGRES_DB=connection.settings_dict["NAME"])
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+            *extra_args,
+        ],
+        env=env,
+    )
+
+
+async def wait_until_up(client, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def load(url, token, concurrency, duration):
+    import httpx
+
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(limits=limits, headers=headers, timeout=60) as client:
+        await wait_until_up(client, url)
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(url, params=PARAMS)
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(args):
+    from appointments.models import User
+    from appointments.serializers import ProfileTokenObtainPairSerializer
+
+    User.objects.filter(username="bench_doctor").update(role="admin")
+    user = User.objects.get(username="bench_doctor")
+    token = str(ProfileTokenObtainPairSerializer.get_token(user).access_token)
+
+    print(f"{'server':<12} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for name, app, extra_args, path in CASES:
+        port = free_port()
+        server = start_server(app, extra_args, port, args.workers)
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                load(
+                    f"http://127.0.0.1:{port}{path}",
+                    token,
+                    args.concurrency,
+                    args.duration,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        print(
+            f"{name:<12} {len(latencies) / elapsed:>10,.0f} "
+            f"{percentile(latencies, 0.5) * 1000:>10.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>10.1f} {errors:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+        import uvicorn  # noqa: F401
+    except ImportError as e:
+        sys.exit(f"{e.name} is required: pip install uvicorn httpx")
+
+    setup()
+    with test_database():
+        seed(args.rows)
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
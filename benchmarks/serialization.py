@@ -0,0 +1,89 @@
+"""
+Rows/second of the consultation list representations.
+
+    python -m benchmarks.serialization --rows 5000
+
+Compares the default nested ``ConsultationSerializer`` against the
+``.values()`` based ``ConsultationValuesSerializer`` with and without
+expansion. Query and serialization time are both included.
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import best_of, setup, test_database
+
+
+def seed(rows):
+    from appointments.models import Clinic, Consultation, Doctor, Patient, User
+
+    clinic = Clinic.objects.create(name="Bench clinic")
+    doctor = Doctor.objects.create(
+        user=User.objects.create(username="bench_doctor", role="doctor")
+    )
+    patient = Patient.objects.create(
+        user=User.objects.create(username="bench_patient", role="patient")
+    )
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    Consultation.objects.bulk_create(
+        (
+            Consultation(
+                doctor=doctor,
+                patient=patient,
+                clinic=clinic,
+                start_time=start + timedelta(minutes=30 * i),
+                end_time=start + timedelta(minutes=30 * i + 30),
+            )
+            for i in range(rows)
+        ),
+        batch_size=1000,
+    )
+
+
+def run(rows, repeat):
+    from appointments.serializers import (
+        ConsultationSerializer,
+        ConsultationValuesSerializer,
+    )
+    from appointments.views import ConsultationViewSet
+
+    queryset = ConsultationViewSet.queryset
+
+    def nested():
+        ConsultationSerializer(queryset.all(), many=True).data
+
+    def lean(**kwargs):
+        serializer = ConsultationValuesSerializer(**kwargs)
+        rows = queryset.values(*serializer.get_columns())
+        [serializer.to_representation(row) for row in rows]
+
+    cases = [
+        ("nested ConsultationSerializer", nested),
+        ("values, all fields", lambda: lean()),
+        ("values, expand=doctor,patient", lambda: lean(expand=["doctor", "patient"])),
+        (
+            "values, fields=id,status,start_time",
+            lambda: lean(fields=["id", "status", "start_time"]),
+        ),
+    ]
+    baseline = None
+    for name, func in cases:
+        rate = rows / best_of(func, repeat)
+        baseline = baseline or rate
+        print(f"{name:<40} {rate:>12,.0f} rows/s  x{rate / baseline:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        seed(args.rows)
+        run(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
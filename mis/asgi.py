@@ -5,3 +5,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mis.settings")
 
 application = get_asgi_application()
+
+# Imported once Django is set up.
+from appointments.streaming import ConsultationStream  # noqa: E402
+
+application = ConsultationStream(application)
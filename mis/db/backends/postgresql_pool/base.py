@@ -0,0 +1,156 @@
+"""
+Django's PostgreSQL backend with connections kept in a per-process pool.
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "mis.db.backends.postgresql_pool",
+            ...
+            "OPTIONS": {"pool": {"min_size": 2, "max_size": 20, "timeout": 10}},
+        }
+    }
+
+``OPTIONS["pool"]`` takes the keyword arguments of ``mis.db.pool.Pool``;
+without it the backend behaves like ``django.db.backends.postgresql``.
+Keep ``CONN_MAX_AGE`` at 0: closing a connection at the end of a request is
+what gives it back to the pool.
+"""
+
+import os
+import threading
+
+import psycopg2.extensions
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from mis.db.pool import Pool, PoolTimeout
+
+from .creation import DatabaseCreation
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias, conn_params, connect, options):
+    """The pool of ``alias``, one per set of connection parameters."""
+    global _pools_pid
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked worker: the parent's connections must not be shared.
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = Pool(
+                connect, check=check_connection, reset=reset_connection, **options
+            )
+            created = True
+        else:
+            created = False
+    if created:
+        pool.fill()
+    return pool
+
+
+def close_pools(alias=None):
+    with _pools_lock:
+        keys = [key for key in _pools if alias is None or key[0] == alias]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Statistics of every pool in this process, keyed by database alias."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for (alias, _), pool in pools:
+        stats.setdefault(alias, []).append(pool.stats())
+    return stats
+
+
+def check_connection(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    connection.rollback()
+    return True
+
+
+def reset_connection(connection):
+    """
+    Roll back what a request left open and reset the session (``SET``
+    parameters, temporary tables, advisory locks, held cursors) so nothing
+    carries over to the next borrower; broken connections are dropped.
+    """
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status in (
+        psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+        psycopg2.extensions.TRANSACTION_STATUS_INERROR,
+    ):
+        connection.rollback()
+    elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        return False
+    autocommit = connection.autocommit
+    try:
+        # DISCARD ALL cannot run inside a transaction block.
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("DISCARD ALL")
+        connection.autocommit = autocommit
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict["OPTIONS"].get("pool")
+        # Test database creation connects to the "postgres" database.
+        if not options or self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+
+        self.pool = get_pool(
+            self.alias,
+            conn_params,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            options,
+        )
+        # Set by the parent's get_new_connection(), which reused connections
+        # skip.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # Closed inside atomic(), the wrapper keeps a reference to the
+            # connection, so it must not go to another thread.
+            self.pool.release(self.connection, discard=self.in_atomic_block)
+
+    def close_pool(self):
+        self.close()
+        close_pools(self.alias)
@@ -0,0 +1,263 @@
+"""
+A thread-safe pool of database connections.
+
+The pool does not know what a connection is: it is given callables to open,
+check, reset and close one. ``mis.db.backends.postgresql_pool`` plugs it
+into Django's PostgreSQL backend, which then takes connections from the pool
+instead of opening one per request and gives them back instead of closing
+them. Both the WSGI and the ASGI handler close connections at the end of
+every request, so both benefit the same way.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's ``timeout``."""
+
+
+class Entry:
+    __slots__ = ("connection", "created", "last_used")
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.last_used = now
+
+
+class Pool:
+    """
+    Keep between ``min_size`` and ``max_size`` connections open.
+
+    ``acquire()`` hands out an idle connection, opens a new one while fewer
+    than ``max_size`` are open, and otherwise waits up to ``timeout``
+    seconds for one to be released. Connections older than
+    ``max_lifetime`` are closed rather than reused, idle ones above
+    ``min_size`` are closed after ``max_idle`` seconds, and a connection
+    idle for longer than ``check_interval`` is passed to ``check`` before it
+    is handed out. ``reset`` is called on release and returns whether the
+    connection may be reused.
+    """
+
+    def __init__(
+        self,
+        connect,
+        *,
+        check=None,
+        reset=None,
+        close=None,
+        min_size=0,
+        max_size=10,
+        timeout=30.0,
+        max_lifetime=3600.0,
+        max_idle=600.0,
+        check_interval=30.0,
+    ):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.close_connection = close or (lambda connection: connection.close())
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.pid = os.getpid()
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        # Open connections, idle and in use, plus those being opened.
+        self._size = 0
+        self._closed = False
+        self._stats = dict.fromkeys(
+            (
+                "opened",
+                "closed",
+                "acquired",
+                "failed_checks",
+                "waits",
+                "wait_ms_total",
+                "wait_ms_max",
+                "timeouts",
+            ),
+            0,
+        )
+
+    def fill(self):
+        """Open connections until ``min_size`` are open."""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            entry = self._open()
+            with self._lock:
+                self._idle.append(entry)
+                self._lock.notify()
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._lock:
+            entry, waited = self._take(started + self.timeout)
+        if entry is not None and not self._usable(entry):
+            entry = None
+        if entry is None:
+            entry = self._open()
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._in_use[id(entry.connection)] = entry
+            self._stats["acquired"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_ms_total"] += waited_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+        return entry.connection
+
+    def release(self, connection, discard=False):
+        """Give ``connection`` back, or close it if ``discard`` or unusable."""
+        with self._lock:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            # Not ours, e.g. acquired before the pool was closed or forked.
+            self._close(connection)
+            return
+        now = time.monotonic()
+        if not discard:
+            discard = (
+                self._closed
+                or now - entry.created > self.max_lifetime
+                or not self._reset(connection)
+            )
+        if discard:
+            self._close(connection)
+            with self._lock:
+                self._size -= 1
+                self._stats["closed"] += 1
+                self._lock.notify()
+            return
+        entry.last_used = now
+        with self._lock:
+            self._idle.append(entry)
+            expired = self._expire_idle(now)
+            self._lock.notify()
+        for connection in expired:
+            self._close(connection)
+
+    def close(self):
+        """Close idle connections now and the ones in use when released."""
+        with self._lock:
+            self._closed = True
+            idle = [entry.connection for entry in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats["closed"] += len(idle)
+            self._lock.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+    def _take(self, deadline):
+        """
+        Pop an idle entry, or reserve a slot for a new connection and return
+        ``None`` for it, along with whether the caller had to wait. Called
+        with the lock held.
+        """
+        waited = False
+        while True:
+            if self._closed:
+                raise PoolTimeout("The connection pool is closed")
+            if self._idle:
+                # The most recently used connection is the least likely to
+                # have been dropped by the server or a firewall.
+                return self._idle.pop(), waited
+            if self._size < self.max_size:
+                self._size += 1
+                return None, waited
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats["timeouts"] += 1
+                raise PoolTimeout(
+                    f"No connection available within {self.timeout} seconds "
+                    f"({self.max_size} in use)"
+                )
+            waited = True
+            self._lock.wait(remaining)
+
+    def _usable(self, entry):
+        """
+        Whether an idle entry may be handed out. An unusable one is closed;
+        its slot stays reserved for the replacement.
+        """
+        now = time.monotonic()
+        usable = now - entry.created <= self.max_lifetime
+        if usable and self.check and now - entry.last_used >= self.check_interval:
+            try:
+                usable = self.check(entry.connection)
+            except Exception:
+                usable = False
+            if not usable:
+                with self._lock:
+                    self._stats["failed_checks"] += 1
+        if not usable:
+            self._close(entry.connection)
+            with self._lock:
+                self._stats["closed"] += 1
+        return usable
+
+    def _open(self):
+        """Open a connection for an already reserved slot."""
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._stats["opened"] += 1
+        return Entry(connection, time.monotonic())
+
+    def _reset(self, connection):
+        if self.reset is None:
+            return True
+        try:
+            return self.reset(connection)
+        except Exception:
+            return False
+
+    def _expire_idle(self, now):
+        """Drop idle entries above ``min_size`` unused for ``max_idle``."""
+        expired = []
+        while (
+            self._size > self.min_size
+            and self._idle
+            and now - self._idle[0].last_used > self.max_idle
+        ):
+            expired.append(self._idle.popleft().connection)
+            self._size -= 1
+            self._stats["closed"] += 1
+        return expired
+
+    def _close(self, connection):
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
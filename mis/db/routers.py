@@ -0,0 +1,99 @@
+"""
+Send selected reads to read replicas, everything else to the primary.
+
+Reads go to a replica only inside ``replica_reads()``, which views enter
+for endpoints that tolerate replication lag, and never for a user who wrote
+something within the last ``REPLICA_PIN_SECONDS``: ``PrimaryPinMiddleware``
+pins the author of every successful unsafe request to the primary, so they
+read their own writes. Replicas are the aliases in
+``settings.DATABASE_REPLICAS``; without any, everything uses ``default``.
+Pins live in the cache, so replicas are only used with a shared cache
+(``settings.CACHE_SHARED``): with a process-local one a write in one worker
+would not pin its author's reads in the others.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replicas():
+    """The replica aliases reads may use."""
+    return settings.DATABASE_REPLICAS if settings.CACHE_SHARED else []
+
+
+def pin_key(user_id):
+    return f"primary-pin:{user_id}"
+
+
+def pin(user_id):
+    """Read from the primary on behalf of ``user_id`` for a while."""
+    if replicas():
+        cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(replicas()) and bool(cache.get(pin_key(user_id)))
+
+
+async def ais_pinned(user_id):
+    return bool(replicas()) and bool(await cache.aget(pin_key(user_id)))
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_replica():
+    """Let reads go to a replica until the enclosing ``replica_reads()`` ends."""
+    _replica_reads.set(True)
+
+
+def reading_from_replica():
+    return _replica_reads.get() and bool(replicas())
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reading_from_replica():
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        # DRF sets request.user once it has authenticated the token.
+        user = getattr(request, "user", None)
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin(user.pk)
+        return response
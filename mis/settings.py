@@ -1,5 +1,6 @@
-from datetime import timedelta
+from datetime import time, timedelta
 from pathlib import Path
+from urllib.parse import urlsplit
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +37,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "mis.db.routers.PrimaryPinMiddleware",
 ]
 
 ROOT_URLCONF = "mis.urls"
@@ -72,15 +74,48 @@ WSGI_APPLICATION = "mis.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "mis.db.backends.postgresql_pool",
         "NAME": os.environ.get("POSTGRES_DB", "mis_db"),
         "USER": os.environ.get("POSTGRES_USER", "mis_user"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "mis_pass"),
         "HOST": os.environ.get("POSTGRES_HOST", "db"),
         "PORT": os.environ.get("DB_PORT", "5432"),
+        # Connections are returned to the pool at the end of every request.
+        "OPTIONS": {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 20)),
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+                "max_lifetime": 3600,
+                "max_idle": 600,
+                "check_interval": 30,
+            }
+        },
     }
 }
 
+# Read replicas, "host[:port][/name]" separated by commas. List, retrieve and
+# stats reads go to them (see mis.db.routers); a user who wrote something
+# reads from the primary for REPLICA_PIN_SECONDS. The pins are kept in the
+# cache, so replicas are only used with a shared cache (CACHE_SHARED).
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICAS", "").split(",")), 1
+):
+    url = urlsplit(f"//{replica.strip()}")
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": url.hostname or DATABASES["default"]["HOST"],
+        "PORT": str(url.port or DATABASES["default"]["PORT"]),
+        "NAME": url.path.strip("/") or DATABASES["default"]["NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["mis.db.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -118,7 +153,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "appointments.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_FILTER_BACKENDS": (
@@ -133,7 +168,83 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": (
+        "appointments.serializers.ProfileTokenObtainPairSerializer"
+    ),
+}
+
+
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+        if os.environ.get("REDIS_URL")
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    )
 }
+# Whether every process sees the same cache. A process-local cache cannot
+# carry invalidations between processes, so the shared layer of the user
+# cache, the consultation response cache and read replicas are only used
+# when this is set.
+CACHE_SHARED = bool(os.environ.get("REDIS_URL"))
+
+# Seconds an authenticated user is reused from the shared cache and from
+# process memory; see appointments.authentication.UserCache.
+AUTH_USER_CACHE_TTL = 300
+AUTH_USER_CACHE_LOCAL_TTL = 5
+# Users kept in process memory, least recently used dropped first.
+AUTH_USER_CACHE_LOCAL_SIZE = 10000
+
+# Seconds cached consultation list/detail responses are kept, 0 disables the
+# cache (as does a process-local cache); see appointments.caching.
+CONSULTATION_CACHE_TTL = 300
+
+
+# Largest list accepted by POST /api/consultations/bulk/.
+CONSULTATION_BULK_MAX_SIZE = int(os.environ.get("CONSULTATION_BULK_MAX_SIZE", 1000))
+
+# Completed and paid consultations that started longer ago than this are
+# moved to the archive table by the archive_consultations command.
+CONSULTATION_ARCHIVE_AFTER_DAYS = int(
+    os.environ.get("CONSULTATION_ARCHIVE_AFTER_DAYS", 365)
+)
+
+# GET /api/consultations/sync/: rows per response, how far back positions are
+# kept to pick up late commits, and how long tombstones of deleted
+# consultations are kept (archive_consultations removes older ones).
+CONSULTATION_SYNC_PAGE_SIZE = 500
+CONSULTATION_SYNC_LAG_SECONDS = 30
+CONSULTATION_TOMBSTONE_DAYS = 90
+
+# Seconds an invite of a patient imported without a password stays valid, and
+# processes hashing roster passwords in POST /api/patients/import/ (0 hashes
+# in the request's process); see appointments.roster.
+PATIENT_INVITE_TIMEOUT = 30 * 24 * 60 * 60
+PATIENT_IMPORT_WORKERS = int(os.environ.get("PATIENT_IMPORT_WORKERS", 0))
+
+# Pub/sub behind the consultation event stream, see appointments.events. The
+# in-process broker only serves a single process; RedisBroker shares events
+# between processes and servers through a Redis stream.
+EVENT_BROKER = (
+    "appointments.events.RedisBroker"
+    if os.environ.get("REDIS_URL")
+    else "appointments.events.InProcessBroker"
+)
+EVENT_BROKER_URL = os.environ.get("REDIS_URL")
+EVENT_BROKER_STREAM = "consultation-events"
+# Events kept for clients resuming with Last-Event-ID.
+EVENT_HISTORY_SIZE = 10000
+# Events a subscriber may fall behind by before it is told to reload.
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+
+
+# Defaults for GET /api/consultations/free-slots/.
+WORKING_DAY_START = time(9, 0)
+WORKING_DAY_END = time(18, 0)
+FREE_SLOTS_MAX_DAYS = 31
 
 
 SPECTACULAR_SETTINGS = {